@@ -4,13 +4,20 @@ import hashlib
 import smtplib
 import io
 import segno
-import re
 import random
 import string
+from contextlib import closing
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from supabase import create_client
+from base_donnees import client_supabase, comptes, definir_page, mesures
+from chargement_edt import lire_excel, signature_fichiers
+from espace_etudiant import GrillesEtudiants, IndexEtudiants, couleur_seance
+from journal_absences import (EN_ATTENTE, EN_ERREUR, FICHIER_JOURNAL, SYNCHRONISE, compteurs, connecter, demarrer_synchro,
+                              fiches_en_erreur, journaliser)
+from modele_creneaux import IndexEnseignants
+from registre_absences import (COLONNES_CUMUL, TAILLE_PAGE, archiver, compter, cumul_absences, fiches_seance, page,
+                               tableau_registre, toutes)
 
 # --- 1. CONFIGURATION ET TITRE OFFICIEL ---
 st.set_page_config(page_title="Plateforme EDT UDL", layout="wide")
@@ -35,12 +42,18 @@ def init_connection():
     try:
         url = st.secrets["SUPABASE_URL"]
         key = st.secrets["SUPABASE_KEY"]
-        return create_client(url, key)
+        return client_supabase(url, key)
     except Exception as e:
         st.error("⚠️ Configuration Supabase manquante dans les secrets.")
         return None
 
 supabase = init_connection()
+# Comptes lus à travers le cache du processus (voir base_donnees.CacheComptes)
+comptes_ens = comptes(supabase, "enseignants_auth") if supabase else None
+comptes_etu = comptes(supabase, "etudiants_auth") if supabase else None
+# Fiches d'absence : journal local, poussé vers archives_absences en arrière-plan
+# (exiger_cle : sans l'index de sql/archives_cle_seance.sql, un lot rejoué serait dupliqué)
+synchro_journal = demarrer_synchro(FICHIER_JOURNAL, lambda fiches: archiver(supabase, fiches, exiger_cle=True)) if supabase else None
 
 # --- 3. FONCTIONS TECHNIQUES ---
 def hash_pw(password):
@@ -71,12 +84,14 @@ def send_email_rapport(destinataires, sujet, corps):
     except Exception as e:
         return False
 
+# La signature (mtime, taille) des fichiers invalide le cache dès qu'un classeur change ;
+# la lecture passe par les instantanés colonnaires de chargement_edt.
 @st.cache_data
-def load_data():
+def load_data(signature):
     try:
-        df_e = pd.read_excel(FICHIER_EDT)
-        df_s = pd.read_excel(FICHIER_ETUDIANTS)
-        df_staff = pd.read_excel(FICHIER_STAFF)
+        df_e = lire_excel(FICHIER_EDT)
+        df_s = lire_excel(FICHIER_ETUDIANTS)
+        df_staff = lire_excel(FICHIER_STAFF)
         for df in [df_e, df_s, df_staff]:
             df.columns = [str(c).strip() for c in df.columns]
             for col in df.select_dtypes(include=['object']):
@@ -85,21 +100,36 @@ def load_data():
     except Exception as e:
         st.error(f"Erreur de lecture Excel : {e}"); st.stop()
 
-df_edt, df_etudiants, df_staff = load_data()
+# Index inversé enseignant → séances, partagé avec edt_app (une construction par version)
+@st.cache_resource
+def load_index_enseignants(signature, _df_edt):
+    return IndexEnseignants(_df_edt['Enseignants'])
+
+# Index (promotion, groupe, sous-groupe) → séances de l'Espace Étudiant (voir espace_etudiant.py)
+@st.cache_resource
+def load_index_etudiants(signature, _df_edt, _df_etudiants):
+    return IndexEtudiants(_df_edt, _df_etudiants)
+
+signature_donnees = signature_fichiers(FICHIER_EDT, FICHIER_ETUDIANTS, FICHIER_STAFF)
+df_edt, df_etudiants, df_staff = load_data(signature_donnees)
+index_enseignants = load_index_enseignants(signature_donnees, df_edt)
+index_etudiants = load_index_etudiants(signature_donnees, df_edt, df_etudiants)
 df_etudiants['Full_N'] = (df_etudiants['Nom'] + " " + df_etudiants['Prénom']).str.upper().str.strip()
 
-def color_edt(val):
-    if not val or val == "": return ""
-    if "Cours" in val: return 'background-color: #d1e7dd; color: #084298; font-weight: bold;'
-    if "Td" in val or "TD" in val: return 'background-color: #fff3cd; color: #856404; font-weight: bold;'
-    if "TP" in val: return 'background-color: #cfe2ff; color: #004085; font-weight: bold;'
-    return ''
+# Grilles de tous les étudiants (une par promotion / groupe / sous-groupe), HTML et
+# Excel compris : reconstruites seulement quand l'EDT ou la liste des étudiants change
+@st.cache_resource
+def load_grilles_etudiants(signature, _df_edt, _df_etudiants, _index):
+    return GrillesEtudiants(_df_edt, _df_etudiants, _index)
+
+grilles_etudiants = load_grilles_etudiants(signature_donnees, df_edt, df_etudiants, index_etudiants)
 
 # --- 4. AUTHENTIFICATION & ESPACES PUBLICS ---
 if "user_data" not in st.session_state:
     st.session_state["user_data"] = None
 
 if not st.session_state["user_data"]:
+    definir_page("Connexion")
     st.markdown(f"<h2 style='text-align:center; color:#003366;'>🔑 {TITRE_PLATEFORME}</h2>", unsafe_allow_html=True)
     t_login, t_signup, t_forgot, t_student = st.tabs(["🔐 Connexion", "📝 Inscription", "❓ Code oublié", "🎓 Espace Étudiant"])
     
@@ -107,9 +137,9 @@ if not st.session_state["user_data"]:
         e_log = st.text_input("Email Professionnel :", key="main_log_e")
         p_log = st.text_input("Code Unique :", type="password", key="main_log_p")
         if st.button("Se connecter", use_container_width=True, key="btn_login"):
-            res = supabase.table("enseignants_auth").select("*").eq("email", e_log).execute()
-            if res.data and res.data[0]['password_hash'] == hash_pw(p_log):
-                st.session_state["user_data"] = res.data[0]
+            compte = comptes_ens.verifier(e_log, hash_pw(p_log))
+            if compte:
+                st.session_state["user_data"] = compte
                 st.rerun()
             else: st.error("Email ou code incorrect.")
 
@@ -141,11 +171,8 @@ if not st.session_state["user_data"]:
                             "nom_officiel": inf['NOM'], "prenom_officiel": inf['PRÉNOM'],
                             "statut_enseignant": inf['Qualité'], "grade_enseignant": inf['Grade']
                         }
-                        check_exist = supabase.table("enseignants_auth").select("*").eq("email", reg_e).execute()
-                        if check_exist.data:
-                            supabase.table("enseignants_auth").update(data_user).eq("email", reg_e).execute()
-                        else:
-                            supabase.table("enseignants_auth").insert(data_user).execute()
+                        # Création ou mise à jour en une requête
+                        comptes_ens.enregistrer(data_user)
                         st.success(f"✅ Code enseignant envoyé à {reg_e} !")
                     else:
                         st.error("❌ Erreur d'envoi d'email.")
@@ -170,12 +197,8 @@ if not st.session_state["user_data"]:
                             "full_name": reg_st_name,
                             "password_hash": hash_pw(code_st)
                         }
-                        # Mise à jour ou insertion dans la nouvelle table etudiants_auth
-                        check_st = supabase.table("etudiants_auth").select("*").eq("email", reg_st_email).execute()
-                        if check_st.data:
-                            supabase.table("etudiants_auth").update(data_st).eq("email", reg_st_email).execute()
-                        else:
-                            supabase.table("etudiants_auth").insert(data_st).execute()
+                        # Mise à jour ou insertion dans etudiants_auth, en une requête
+                        comptes_etu.enregistrer(data_st)
                         st.success(f"✅ Code étudiant envoyé à {reg_st_email} !")
                     else:
                         st.error("❌ Erreur lors de l'envoi de l'email.")
@@ -190,12 +213,11 @@ if not st.session_state["user_data"]:
         
         if st.button("Générer un nouveau code", key="btn_forgot_action"):
             # Choix de la table selon le rôle
-            target_table = "enseignants_auth" if role_f == "Enseignant" else "etudiants_auth"
+            cache = comptes_ens if role_f == "Enseignant" else comptes_etu
             
-            res = supabase.table(target_table).select("*").eq("email", f_email).execute()
-            if res.data:
+            if cache.compte(f_email):
                 new_c = ''.join(random.choices(string.digits, k=6))
-                supabase.table(target_table).update({"password_hash": hash_pw(new_c)}).eq("email", f_email).execute()
+                cache.modifier({"password_hash": hash_pw(new_c)}, [f_email])
                 send_email_rapport([f_email], "Réinitialisation Code - UDL SBA", f"Votre nouveau code est : {new_c}")
                 st.success("Un nouveau code a été envoyé dans votre boîte mail.")
             else: 
@@ -210,57 +232,20 @@ if not st.session_state["user_data"]:
             profil = df_etudiants[df_etudiants['Full_N'] == nom_st].iloc[0]
             st.warning(f"📋 **{profil['Promotion']}** | Groupe: **{profil['Groupe']}** | Sous-Groupe: **{profil['Sous groupe']}**")
             
-            # Algorithme de filtrage de l'EDT dynamique
-            def filter_st_edt(row):
-                if str(row['Promotion']).upper() != str(profil['Promotion']).upper(): return False
-                ens, code = str(row['Enseignements']).upper(), str(row['Code']).upper()
-                if "COURS" in ens: return True
-                num_g = re.findall(r'\d+', str(profil['Groupe']))[0] if re.findall(r'\d+', str(profil['Groupe'])) else ""
-                if "TD" in ens:
-                    if str(profil['Groupe']).upper() in code or (num_g == "1" and "-A" in code) or (num_g == "2" and "-B" in code): return True
-                num_sg = re.findall(r'\d+', str(profil['Sous groupe']))[0] if re.findall(r'\d+', str(profil['Sous groupe'])) else ""
-                if "TP" in ens:
-                    suff = "A" if num_sg == "1" else "B" if num_sg == "2" else "C" if num_sg == "3" else ""
-                    if suff and f"-{suff}" in code: return True
-                return False
-
-            edt_st = df_edt[df_edt.apply(filter_st_edt, axis=1)].copy()
+            # Grille précalculée du groupe / sous-groupe (mêmes règles que l'ancien filtre)
+            grid_final = grilles_etudiants.grille(nom_st)
             
-            if not edt_st.empty:
+            if grid_final is not None:
                 st.markdown("#### 📅 Votre Emploi du Temps Hebdomadaire")
-                
-                # 1. Liste mise à jour selon VOTRE format (tiret collé)
-                ordre_horaires = [
-                    "8h-9h30", 
-                    "9h30-11h", 
-                    "11h-12h30", 
-                    "12h30-14h", 
-                    "14h-15h30", 
-                    "15h30-17h"
-                ]
-                
-                # 2. Ordre des jours
-                jours_ordre = ["Dimanche", "Lundi", "Mardi", "Mercredi", "Jeudi"]
-                
-                # 3. Création du pivot table
-                grid = edt_st.pivot_table(
-                    index='Horaire', 
-                    columns='Jours', 
-                    values='Enseignements', 
-                    aggfunc=lambda x: ' / '.join(x)
-                ).fillna("")
-
-                # 4. Extraction des index présents pour éviter les erreurs
-                index_existants = [h for h in ordre_horaires if h in grid.index]
-                # Sécurité : si un horaire n'est pas dans la liste ordre_horaires, on l'ajoute à la fin
-                autres_horaires = [h for h in grid.index if h not in ordre_horaires]
-                index_complet = index_existants + autres_horaires
-                
-                colonnes_existantes = [j for j in jours_ordre if j in grid.columns]
-
-                # 5. Réindexation et affichage
-                grid_final = grid.reindex(index=index_complet, columns=colonnes_existantes)
-                st.dataframe(grid_final.style.applymap(color_edt), use_container_width=True)
+                st.dataframe(grid_final.style.map(couleur_seance), use_container_width=True)
+
+                cle_st = grilles_etudiants.cle_de[nom_st]
+                d1, d2 = st.columns(2)
+                d1.download_button("📥 Emploi du temps (Excel)", grilles_etudiants.xlsx[cle_st], f"EDT_{nom_st}.xlsx",
+                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                   use_container_width=True, key="dl_edt_st_xlsx")
+                d2.download_button("📥 Emploi du temps (HTML)", grilles_etudiants.html[cle_st], f"EDT_{nom_st}.html",
+                                   mime="text/html", use_container_width=True, key="dl_edt_st_html")
             
             else:
                 st.info(f"ℹ️ Aucun cours trouvé pour {nom_st}. Vérifiez la correspondance des groupes dans le fichier EDT.")
@@ -279,6 +264,7 @@ if not st.session_state["user_data"]:
     st.stop()
 
 # --- 5. ESPACE ENSEIGNANT CONNECTÉ ---
+definir_page("Espace Enseignant")
 user = st.session_state["user_data"]
 is_admin = (user['email'] == EMAIL_ADMIN_TECH)
 grade_fix = user.get('grade_enseignant', 'Enseignant')
@@ -346,9 +332,7 @@ with st.sidebar:
             if hash_pw(old_p) == user['password_hash']:
                 if new_p == conf_p and len(new_p) >= 4:
                     try:
-                        supabase.table("enseignants_auth").update({
-                            "password_hash": hash_pw(new_p)
-                        }).eq("email", user['email']).execute()
+                        comptes_ens.modifier({"password_hash": hash_pw(new_p)}, [user['email']])
                         st.session_state["user_data"]['password_hash'] = hash_pw(new_p)
                         st.success("✅ Code mis à jour !")
                     except Exception as e:
@@ -368,6 +352,7 @@ t_saisie, t_suivi, t_admin = st.tabs(["📝 Saisie Rapport", "🔍 Suivi Étudia
 
 # --- ONGLET SAISIE ---
 with t_saisie:
+    definir_page("Saisie Rapport")
     st.markdown("### ⚙️ Paramètres de la Séance")
     charge = st.radio("Régime :", ["Charge Normale", "Heures Supplémentaires"], horizontal=True, key="saisie_regime")
     
@@ -375,7 +360,7 @@ with t_saisie:
     type_seance = c1.selectbox("Type :", ["Cours", "TD", "TP", "Examen", "Rattrapage"], key="saisie_type")
     date_s = c3.date_input("Date réelle :", value=datetime.now(), key="saisie_date")
     
-    mask = df_edt['Enseignants'].str.contains(ens_actif, na=False, case=False)
+    mask = df_edt.index.isin(df_edt.index[index_enseignants.positions(ens_actif)])
     p_sel = st.selectbox("🎓 Promotion :", sorted(df_edt[mask]['Promotion'].unique()) if any(mask) else sorted(df_edt['Promotion'].unique()), key="saisie_promo")
     
     df_p = df_etudiants[df_etudiants['Promotion'] == p_sel]
@@ -430,35 +415,30 @@ with t_saisie:
                 liste_absents_reelle.remove(etudiant_note)
                 st.warning(f"🔄 **Note :** {etudiant_note} a été retiré de la liste des absences car il/elle a reçu une évaluation.")
 
-            # 1. Archivage Absences (via la liste corrigée)
-            for name in liste_absents_reelle:
-                supabase.table("archives_absences").insert({
-                    "promotion": p_sel, 
-                    "matiere": m_sel, 
-                    "enseignant": f"{grade_fix} {user['nom_officiel']}",
-                    "date_seance": str(date_s), 
-                    "etudiant_nom": name, 
-                    "note_evaluation": type_abs,
-                    "observations": f"{charge} | {type_seance}", 
-                    "categorie_seance": charge,
-                    "groupe": g_sel,         # Important pour l'affichage Suivi
-                    "sous_groupe": sg_sel    # Important pour l'affichage Suivi
-                }).execute()
-            
-            # 2. Archivage Note
-            if etudiant_note != "Aucun":
-                supabase.table("archives_absences").insert({
-                    "promotion": p_sel, 
-                    "matiere": m_sel, 
+            # 1. et 2. Archivage des absences (liste corrigée) et de la note : journal local
+            # (une transaction, retour immédiat), synchronisé en arrière-plan par lots
+            fiches = fiches_seance(
+                {
+                    "promotion": p_sel, "matiere": m_sel,
                     "enseignant": f"{grade_fix} {user['nom_officiel']}",
-                    "date_seance": str(date_s), 
-                    "etudiant_nom": etudiant_note, 
-                    "note_evaluation": f"{critere}: {valeur}",
-                    "observations": obs, 
-                    "categorie_seance": charge,
-                    "groupe": g_sel,
-                    "sous_groupe": sg_sel
-                }).execute()
+                    "date_seance": date_s, "categorie_seance": charge,
+                    "groupe": g_sel, "sous_groupe": sg_sel,  # Important pour l'affichage Suivi
+                    "observations": f"{charge} | {type_seance}",
+                },
+                liste_absents_reelle, type_abs,
+                (etudiant_note, f"{critere}: {valeur}", obs) if etudiant_note != "Aucun" else None,
+            )
+            try:
+                with closing(connecter()) as conn:
+                    nouvelles = journaliser(conn, fiches)
+                archive_ok = True
+                if synchro_journal:
+                    synchro_journal.reveiller()
+            except Exception as e:
+                st.error(f"❌ Archivage impossible, aucune fiche enregistrée : {e}")
+                archive_ok = False
+            # Double clic : fiches déjà journalisées → pas de second email
+            deja_envoye = archive_ok and bool(fiches) and nouvelles == 0
             # --- 3. GÉNÉRATION DU RAPPORT HTML ET ENVOI ---
             # Préparation de la liste des noms des absents en format HTML
             noms_absents_html = "".join([f"<li style='color: #cc0000;'>{n}</li>" for n in liste_absents_reelle])
@@ -518,30 +498,53 @@ with t_saisie:
             </html>
             """
             
-            # --- CORRECTION DU NOM DE LA FONCTION ICI ---
-            success_mail = send_email_rapport([EMAIL_CHEF_DEPT, EMAIL_ADJOINT], f"Rapport de séance - {m_sel} - {p_sel}", html_corps)
-            
-            if success_mail:
-                st.success("✅ Archivage réussi et rapport HTML envoyé aux responsables !"); st.balloons()
-            else:
-                st.warning("✅ Archivage réussi, mais l'envoi de l'email a échoué (vérifiez vos identifiants SMTP).")
+            if archive_ok and deja_envoye:
+                st.info("ℹ️ Cette séance est déjà archivée et son rapport déjà envoyé.")
+            elif archive_ok:
+                # --- CORRECTION DU NOM DE LA FONCTION ICI ---
+                success_mail = send_email_rapport([EMAIL_CHEF_DEPT, EMAIL_ADJOINT], f"Rapport de séance - {m_sel} - {p_sel}", html_corps)
+                
+                if success_mail:
+                    st.success("✅ Archivage réussi et rapport HTML envoyé aux responsables !"); st.balloons()
+                else:
+                    st.warning("✅ Archivage réussi, mais l'envoi de l'email a échoué (vérifiez vos identifiants SMTP).")
         else: 
             st.error("Code de validation incorrect.")
 
+    # État du journal local (rafraîchi sans relancer toute la page)
+    @st.fragment(run_every=10)
+    def etat_synchro():
+        with closing(connecter()) as conn:
+            etat = compteurs(conn)
+            ecartees = fiches_en_erreur(conn) if etat[EN_ERREUR] else []
+        if etat[EN_ATTENTE]:
+            st.caption(f"🔄 {etat[EN_ATTENTE]} fiche(s) en attente de synchronisation, {etat[SYNCHRONISE]} synchronisée(s)")
+            if etat["message"]:
+                st.caption(f"⚠️ Échec de la synchronisation, nouvel essai automatique : {etat['message']}")
+        else:
+            st.caption(f"☁️ Toutes les fiches sont synchronisées ({etat[SYNCHRONISE]} récente(s)).")
+        if ecartees:
+            with st.expander(f"❌ {etat[EN_ERREUR]} fiche(s) refusée(s) par la base, non synchronisée(s)"):
+                st.dataframe(pd.DataFrame(ecartees)[["etudiant_nom", "matiere", "date_seance", "note_evaluation", "erreur"]],
+                             use_container_width=True, hide_index=True)
+
+    etat_synchro()
+
 # --- ONGLET SUIVI ÉTUDIANT (VERSION PRATIQUE AVEC EXPORT GLOBAL) ---
 with t_suivi:
+    definir_page("Suivi Étudiant")
     st.markdown("### 🔍 Dossier Pédagogique & Assiduité")
     
     # Chargement de la source Excel pour enrichir les données
     @st.cache_data
-    def get_source_data():
+    def get_source_data(signature):
         try:
-            df_src = pd.read_excel("DATA-ASSUIDUITE-2026.xlsx")
+            df_src = lire_excel("DATA-ASSUIDUITE-2026.xlsx")
             return df_src[['Enseignements', 'Enseignants', 'Horaire']]
         except:
             return None
 
-    df_info_suivi = get_source_data()
+    df_info_suivi = get_source_data(signature_fichiers("DATA-ASSUIDUITE-2026.xlsx"))
 
     # Récupération des noms existants dans la base
     res_noms = supabase.table("archives_absences").select("etudiant_nom").execute()
@@ -631,13 +634,11 @@ with t_suivi:
 # Assiduité globale des étudiants-Département d'Électrotechnique-Faculté de génie électrique-UDL-SBA
 
 with t_admin:
+    definir_page("Panneau Admin")
     if is_admin:
         st.header("🛡️ Panneau d'Administration")
         st.subheader("Assiduité globale des étudiants-Département d'Électrotechnique-Faculté de génie électrique-UDL-SBA")
         
-        # 1. Récupération des données depuis Supabase
-        res = supabase.table("archives_absences").select("*").execute()
-        
         # Création des onglets pour organiser les outils admin
         t_reg, t_assid, t_sync, t_danger = st.tabs([
             "📋 Registre Global", 
@@ -647,56 +648,77 @@ with t_admin:
         ])
 
         # --- ONGLET 1 : REGISTRE GLOBAL ---
+        # Filtré et paginé côté serveur (registre_absences.py) : seule la page affichée est transférée
         with t_reg:
-            if res.data:
-                df_all = pd.DataFrame(res.data)
-                
-                # Disposition demandée : Enseignements, Code, Enseignants, Horaire, Jours, Lieu, Promotion
-                # (Adaptation selon les colonnes disponibles dans ton archive)
-                col_ordre = ['etudiant_nom', 'promotion', 'groupe', 'matiere', 'note_evaluation', 'date_seance', 'enseignant']
-                df_registre = df_all[[c for c in col_ordre if c in df_all.columns]].copy()
-                df_registre.columns = ["Étudiant", "Promotion", "Groupe", "Matière", "Nature/Note", "Date", "Enseignant"]
-
-                st.markdown("### 📄 Journal des Enseignements")
-                st.metric("Total des fiches saisies", len(df_all))
-                st.dataframe(df_registre.sort_values(by="Date", ascending=False), use_container_width=True)
-                
-                # Export Registre
-                buf_r = io.BytesIO()
-                df_registre.to_excel(buf_r, index=False, engine='xlsxwriter')
-                st.download_button("📥 Télécharger Registre (.xlsx)", buf_r.getvalue(), "Registre_Global_UDL_2026.xlsx")
+            st.markdown("### 📄 Journal des Enseignements")
+            f1, f2, f3, f4 = st.columns(4)
+            f_promo = f1.selectbox("Promotion :", ["Toutes"] + sorted(df_edt['Promotion'].astype(str).unique()), key="reg_promo")
+            f_matiere = f2.selectbox("Matière :", ["Toutes"] + sorted(df_edt['Enseignements'].astype(str).unique()), key="reg_matiere")
+            f_ens = f3.text_input("Enseignant :", key="reg_ens").strip()
+            f_periode = f4.date_input("Période :", value=(), key="reg_periode")
+            filtres = {
+                "promotion": None if f_promo == "Toutes" else f_promo,
+                "matiere": None if f_matiere == "Toutes" else f_matiere,
+                "enseignant": f_ens or None,
+                "debut": f_periode[0] if len(f_periode) > 0 else None,
+                "fin": f_periode[1] if len(f_periode) > 1 else None,
+            }
+
+            # Curseurs des pages parcourues, remis à zéro quand les filtres changent
+            if st.session_state.get("reg_filtres") != filtres:
+                st.session_state.reg_filtres = filtres
+                st.session_state.reg_curseurs = [None]
+            curseurs = st.session_state.reg_curseurs
+
+            total = compter(supabase, **filtres)
+            st.metric("Total des fiches saisies", total)
+            if total:
+                lignes, suivant = page(supabase, curseurs[-1], **filtres)
+                st.dataframe(tableau_registre(lignes), use_container_width=True, hide_index=True)
+
+                n1, n2, n3 = st.columns([1, 3, 1])
+                if n1.button("⬅️ Précédent", disabled=len(curseurs) == 1, key="reg_prec", use_container_width=True):
+                    curseurs.pop()
+                    st.rerun()
+                n2.caption(f"Page {len(curseurs)} / {-(-total // TAILLE_PAGE)}")
+                if n3.button("Suivant ➡️", disabled=suivant is None, key="reg_suiv", use_container_width=True):
+                    curseurs.append(suivant)
+                    st.rerun()
+
+                # Export Registre : toutes les fiches filtrées, lues page par page au clic
+                def excel_registre(filtres=filtres):
+                    buf_r = io.BytesIO()
+                    tableau_registre(list(toutes(supabase, **filtres))).to_excel(buf_r, index=False, engine='xlsxwriter')
+                    return buf_r.getvalue()
+
+                st.download_button("📥 Télécharger Registre (.xlsx)", excel_registre, "Registre_Global_UDL_2026.xlsx")
             else:
                 st.info("Aucune donnée dans le registre.")
 
         # --- ONGLET 2 : CUMUL DES ABSENCES ---
         with t_assid:
-            if res.data:
-                df_all = pd.DataFrame(res.data)
-                df_abs_only = df_all[df_all['note_evaluation'].str.contains("Absence", na=False)].copy()
+            # Regroupement fait par la base (fonction cumul_absences) : seuls les totaux arrivent
+            recap = pd.DataFrame(cumul_absences(supabase), columns=COLONNES_CUMUL)
+
+            st.markdown("### ❌ État de l'Assiduité par Module")
+            if not recap.empty:
+                recap.columns = ["Nom & Prénom", "Promotion", "Matière", "Nombre d'Absences"]
+
+                def highlight_exclusion(val):
+                    color = '#ffcccc' if isinstance(val, int) and val >= 3 else ''
+                    return f'background-color: {color}'
+
+                st.write("⚠️ *Les cellules en rouge indiquent un seuil d'exclusion (>= 3 absences).*")
+                st.dataframe(
+                    recap.style.map(highlight_exclusion, subset=["Nombre d'Absences"]),
+                    use_container_width=True
+                )
                 
-                st.markdown("### ❌ État de l'Assiduité par Module")
-                if not df_abs_only.empty:
-                    recap = df_abs_only.groupby(['etudiant_nom', 'promotion', 'matiere']).size().reset_index(name='Total Absences')
-                    recap = recap.sort_values(by='Total Absences', ascending=False)
-                    recap.columns = ["Nom & Prénom", "Promotion", "Matière", "Nombre d'Absences"]
-
-                    def highlight_exclusion(val):
-                        color = '#ffcccc' if isinstance(val, int) and val >= 3 else ''
-                        return f'background-color: {color}'
-
-                    st.write("⚠️ *Les cellules en rouge indiquent un seuil d'exclusion (>= 3 absences).*")
-                    st.dataframe(
-                        recap.style.applymap(highlight_exclusion, subset=["Nombre d'Absences"]),
-                        use_container_width=True
-                    )
-                    
-                    buf_a = io.BytesIO()
-                    recap.to_excel(buf_a, index=False, engine='xlsxwriter')
-                    st.download_button("📥 Télécharger État des Absences", buf_a.getvalue(), "Recap_Assiduite_ELT.xlsx")
-                else:
-                    st.info("Aucune absence enregistrée pour le moment.")
+                buf_a = io.BytesIO()
+                recap.to_excel(buf_a, index=False, engine='xlsxwriter')
+                st.download_button("📥 Télécharger État des Absences", buf_a.getvalue(), "Recap_Assiduite_ELT.xlsx")
             else:
-                st.info("La base de données est vide.")
+                st.info("Aucune absence enregistrée pour le moment.")
 
         # --- ONGLET 3 : COLLECTE DES EMAILS (NOUVEAU) ---
         with t_sync:
@@ -752,6 +774,8 @@ with t_admin:
         # --- ONGLET 4 : MAINTENANCE (RESET) ---
         with t_danger:
             st.markdown("### 🚨 Zone de Maintenance")
+            with st.expander("🗄️ Requêtes base de données (depuis le démarrage)"):
+                st.dataframe(mesures(), hide_index=True, use_container_width=True)
             st.error("Attention : La suppression des archives est définitive.")
             
             with st.expander("🗑️ Réinitialiser les Archives"):
@@ -0,0 +1,98 @@
+import numpy as np
+
+from modele_creneaux import intervalle_horaire
+
+# --- ASSISTANT DE RÉSOLUTION : INDEX D'OCCUPATION ---
+# Pour chaque (jour, créneau proposé), les salles et enseignants occupés sont calculés
+# une seule fois par version de l'EDT, en tenant compte des chevauchements (une séance
+# 8h - 10h occupe aussi le créneau 9h30 - 11h). Les salles compatibles sont classées
+# une fois par profil (TP / amphi / salle) : une suggestion ne coûte plus qu'une
+# recherche dans des ensembles, au lieu de deux filtrages du DataFrame par créneau.
+
+TOUS_HORAIRES = ["8h - 9h30", "9h30 - 11h", "11h - 12h30", "12h30 - 14h", "14h - 15h30", "15h30 - 17h"]
+
+# Heuristiques de l'assistant : le lieu d'origine détermine le genre de salle proposé
+MOTS_TP_ORIGINE = ["LABO", "TP", "ATELIER", "CC", "MICRO"]
+MOTS_TP = ["LABO", "TP", "CC", "MICRO"]
+
+SANS_VERIFICATION = ["ND", "Multi-enseignants"]
+
+
+def profil_lieu(lieu):
+    """(est_tp, est_amphi) du lieu d'origine d'un conflit."""
+    lieu = str(lieu).upper()
+    est_tp = any(mot in lieu for mot in MOTS_TP_ORIGINE)
+    est_amphi = "AMPHI" in lieu or "A0" in lieu
+    return est_tp, est_amphi
+
+
+def est_compatible(salle, profil):
+    est_tp, est_amphi = profil
+    salle = str(salle).upper()
+    if est_tp and any(mot in salle for mot in MOTS_TP):
+        return True
+    if est_amphi and ("AMPHI" in salle or "A0" in salle):
+        return True
+    return not est_tp and not est_amphi and ("S" in salle or "SALLE" in salle)
+
+
+class IndexOccupation:
+    def __init__(self, df, modele, horaires=TOUS_HORAIRES):
+        m = modele
+        self.horaires = list(horaires)
+        self.lieux = sorted(l for l in df['Lieu'].unique() if str(l) != "nan" and l != "Non défini")
+        self._compatibles = {}
+        self._suggestions = {}
+
+        # (jour, horaire) → salles occupées / identifiants des enseignants occupés
+        self._salles = {}
+        self._enseignants = {}
+        self._index_enseignants = m.index_enseignants
+        salles = np.array(m.salles, dtype=object)
+        for horaire in self.horaires:
+            debut, fin = intervalle_horaire(horaire)
+            actives = (m.debut < fin) & (m.fin > debut) & (m.jour >= 0)
+            for j, jour in enumerate(m.jours):
+                du_jour = actives & (m.jour == j)
+                self._salles[(jour, horaire)] = set(salles[m.salle[du_jour & (m.salle >= 0)]])
+                self._enseignants[(jour, horaire)] = set(m.ens_id[du_jour[m.ens_seance]].tolist())
+
+    def lieux_compatibles(self, lieu_initial):
+        profil = profil_lieu(lieu_initial)
+        if profil not in self._compatibles:
+            self._compatibles[profil] = [l for l in self.lieux if est_compatible(l, profil)]
+        return self._compatibles[profil]
+
+    def salle_libre(self, jour, horaire, salle):
+        return salle not in self._salles.get((jour, horaire), ())
+
+    def enseignant_libre(self, jour, horaire, enseignant):
+        if enseignant in SANS_VERIFICATION:
+            return True
+        occupes = self._enseignants.get((jour, horaire), ())
+        return not any(code in occupes for code in self._index_enseignants.codes(enseignant))
+
+    def suggestions(self, jour, enseignant, horaire_initial, lieu_initial, limite=30):
+        """'<horaire> en <salle>' où l'enseignant et une salle du même genre sont libres."""
+        cle = (jour, enseignant, horaire_initial, lieu_initial, limite)
+        if cle in self._suggestions:
+            return self._suggestions[cle]
+
+        compatibles = self.lieux_compatibles(lieu_initial)
+        resultat = []
+        for horaire in self.horaires:
+            if not self.enseignant_libre(jour, horaire, enseignant):
+                continue
+            occupees = self._salles.get((jour, horaire), ())
+            for salle in compatibles:
+                if salle in occupees:
+                    continue
+                # Éviter de proposer l'option qui est déjà en conflit
+                if not (horaire == horaire_initial and salle in lieu_initial):
+                    resultat.append(f"{horaire} en {salle}")
+                    if len(resultat) >= limite:
+                        break
+            if len(resultat) >= limite:
+                break
+        self._suggestions[cle] = resultat
+        return resultat
@@ -0,0 +1,265 @@
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+import pandas as pd
+from postgrest.exceptions import APIError
+from supabase import ClientOptions, create_client
+
+# --- ACCÈS À LA BASE (SUPABASE) ---
+# Un seul client par processus et par projet, partagé par edt_app et assiduite_app :
+# sa session HTTP (httpx) garde les connexions ouvertes d'un rerun à l'autre. Les
+# appels passent par le même chemin qu'avant (client.table(...).select(...).execute())
+# mais execute() applique un délai maximal, reprend les erreurs passagères (réseau,
+# 5xx, 429) avec attente croissante, et mesure le temps de chaque aller-retour par
+# (page, table, opération).
+# Les comptes (enseignants_auth, etudiants_auth) sont lus à travers un cache du
+# processus (CacheComptes) : durée de vie limitée, et mise à jour immédiate après
+# chaque écriture faite par l'application elle-même. L'enregistrement d'un compte est
+# un upsert sur l'email (index unique : sql/comptes_email_unique.sql) ; sans l'index,
+# il revient à la lecture puis insertion / mise à jour.
+
+DELAI_REQUETE = 10.0        # secondes, par appel
+DELAI_CONNEXION = 5.0
+NB_TENTATIVES = 3
+ATTENTE_INITIALE = 0.3      # doublée à chaque reprise
+OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+# Opérations rejouables sans risque de doublon quand la réponse a été perdue
+IDEMPOTENTES = {"select", "update", "upsert", "delete"}
+PAGE_PAR_DEFAUT = "—"
+DUREE_COMPTES = 300.0       # secondes avant relecture d'un compte
+# Aucun index unique sur email (sql/comptes_email_unique.sql pas encore installé)
+CODES_EMAIL_NON_UNIQUE = {"42P10"}
+
+_verrou = threading.Lock()
+_clients = {}
+_caches = {}
+_contexte = threading.local()
+# (page, table, opération) → [appels, erreurs, reprises, durée totale, durée max]
+_mesures = defaultdict(lambda: [0, 0, 0, 0.0, 0.0])
+
+
+def definir_page(page):
+    """Page courante (thread du script) à laquelle sont imputés les appels suivants."""
+    _contexte.page = page
+
+
+def est_temporaire(erreur, operation):
+    # Connexion jamais établie : la requête n'est pas partie, on peut toujours rejouer
+    if isinstance(erreur, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    if operation not in IDEMPOTENTES:
+        return False
+    if isinstance(erreur, httpx.TransportError):
+        return True
+    if isinstance(erreur, APIError):
+        code = str(erreur.code or "")
+        return code == "429" or code.startswith("5")
+    return False
+
+
+def executer(requete, table, operation):
+    """requete.execute() avec reprises sur erreur passagère et mesure du temps."""
+    cle = (getattr(_contexte, "page", PAGE_PAR_DEFAUT), table, operation or "?")
+    attente = ATTENTE_INITIALE
+    for tentative in range(1, NB_TENTATIVES + 1):
+        t0 = time.perf_counter()
+        try:
+            reponse = requete.execute()
+            erreur = None
+        except (httpx.HTTPError, APIError) as e:
+            erreur = e
+        duree = time.perf_counter() - t0
+        with _verrou:
+            m = _mesures[cle]
+            m[0] += 1
+            m[3] += duree
+            m[4] = max(m[4], duree)
+            if erreur is not None:
+                m[1] += 1
+            if tentative > 1:
+                m[2] += 1
+        if erreur is None:
+            return reponse
+        if tentative == NB_TENTATIVES or not est_temporaire(erreur, operation):
+            raise erreur
+        time.sleep(attente)
+        attente *= 2
+
+
+class _Requete:
+    """Enveloppe d'un constructeur de requête postgrest : chaque méthode renvoie une
+    nouvelle enveloppe, execute() passe par executer()."""
+
+    def __init__(self, constructeur, table, operation=None):
+        self._constructeur = constructeur
+        self._table = table
+        self._operation = operation
+
+    def _envelopper(self, valeur, operation):
+        if hasattr(valeur, "execute") or hasattr(valeur, "select"):
+            return _Requete(valeur, self._table, operation)
+        return valeur
+
+    def __getattr__(self, nom):
+        attribut = getattr(self._constructeur, nom)
+        operation = self._operation or (nom if nom in OPERATIONS else None)
+        if not callable(attribut):
+            # ex. .not_ : propriété qui renvoie le constructeur
+            return self._envelopper(attribut, operation)
+
+        def appel(*args, **kwargs):
+            return self._envelopper(attribut(*args, **kwargs), operation)
+        return appel
+
+    def execute(self):
+        return executer(self._constructeur, self._table, self._operation)
+
+
+class ClientMesure:
+    """Client Supabase dont les requêtes table / rpc sont mesurées et reprises."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def table(self, nom):
+        return _Requete(self.client.table(nom), nom)
+
+    from_ = table
+
+    def rpc(self, fonction, params=None, **kwargs):
+        return _Requete(self.client.rpc(fonction, params or {}, **kwargs), fonction, "rpc")
+
+    def __getattr__(self, nom):
+        return getattr(self.client, nom)
+
+
+def client_supabase(url, key):
+    """Client partagé du processus pour (url, key), créé au premier appel."""
+    with _verrou:
+        if (url, key) not in _clients:
+            options = ClientOptions(postgrest_client_timeout=httpx.Timeout(DELAI_REQUETE, connect=DELAI_CONNEXION))
+            _clients[(url, key)] = ClientMesure(create_client(url, key, options=options))
+        return _clients[(url, key)]
+
+
+def mesures():
+    """Tableau des allers-retours par page, table et opération (depuis le démarrage)."""
+    with _verrou:
+        lignes = [
+            (page, table, operation, appels, erreurs, reprises, 1000 * total, 1000 * total / appels, 1000 * maxi)
+            for (page, table, operation), (appels, erreurs, reprises, total, maxi) in _mesures.items()
+        ]
+    tableau = pd.DataFrame(lignes, columns=["Page", "Table", "Opération", "Appels", "Erreurs", "Reprises",
+                                            "Total (ms)", "Moyenne (ms)", "Max (ms)"])
+    return tableau.sort_values("Total (ms)", ascending=False, ignore_index=True)
+
+
+def reinitialiser_mesures():
+    with _verrou:
+        _mesures.clear()
+
+
+# --- COMPTES (CACHE DE LECTURE) ---
+class CacheComptes:
+    """Comptes d'une table *_auth indexés par email. Les lectures passent par le cache
+    (au plus `duree` secondes d'ancienneté) ; les écritures de ce processus invalident
+    aussitôt les entrées concernées."""
+
+    def __init__(self, client, table, duree=DUREE_COMPTES):
+        self.client = client
+        self.table = table
+        self.duree = duree
+        self._verrou = threading.Lock()
+        self._comptes = {}      # email → (échéance, ligne)
+        self._tous = None       # (échéance, [lignes]) : table complète
+
+    def compte(self, email, frais=False):
+        """Ligne du compte (copie) ou None ; `frais` force la relecture."""
+        maintenant = time.monotonic()
+        if not frais:
+            with self._verrou:
+                entree = self._comptes.get(email)
+            if entree is not None and entree[0] > maintenant:
+                return dict(entree[1])
+        res = self.client.table(self.table).select("*").eq("email", email).execute()
+        ligne = res.data[0] if res.data else None
+        with self._verrou:
+            if ligne is None:
+                # Absence non mémorisée : une inscription faite ailleurs est vue aussitôt
+                self._comptes.pop(email, None)
+            else:
+                self._comptes[email] = (maintenant + self.duree, ligne)
+        return dict(ligne) if ligne else None
+
+    def verifier(self, email, password_hash):
+        """Compte si le mot de passe (haché) correspond, sinon None. En cas d'écart, le
+        compte est relu une fois : le code a pu être changé depuis un autre processus."""
+        compte = self.compte(email)
+        if compte is not None and compte.get("password_hash") != password_hash:
+            compte = self.compte(email, frais=True)
+        return compte if compte is not None and compte.get("password_hash") == password_hash else None
+
+    def tous(self):
+        """Tous les comptes (copies), une lecture complète au plus par période."""
+        maintenant = time.monotonic()
+        with self._verrou:
+            if self._tous is not None and self._tous[0] > maintenant:
+                return [dict(l) for l in self._tous[1]]
+        lignes = self.client.table(self.table).select("*").execute().data or []
+        with self._verrou:
+            self._tous = (maintenant + self.duree, lignes)
+            self._comptes.update({l["email"]: (maintenant + self.duree, l) for l in lignes})
+        return [dict(l) for l in lignes]
+
+    def enregistrer(self, donnees, remplacer=True):
+        """Crée ou met à jour le compte en une requête (upsert sur l'email).
+
+        remplacer=False : création seulement ; retourne None si l'email est déjà pris.
+        """
+        try:
+            res = self.client.table(self.table).upsert(donnees, on_conflict="email",
+                                                       ignore_duplicates=not remplacer).execute()
+        except APIError as e:
+            if str(e.code) not in CODES_EMAIL_NON_UNIQUE:
+                raise
+            # Base non migrée : lecture puis insertion ou mise à jour, comme avant
+            res = self._enregistrer_sans_index(donnees, remplacer)
+        self.invalider(donnees["email"])
+        return res.data[0] if res is not None and res.data else None
+
+    def _enregistrer_sans_index(self, donnees, remplacer):
+        existe = self.client.table(self.table).select("email").eq("email", donnees["email"]).execute().data
+        if not existe:
+            return self.client.table(self.table).insert(donnees).execute()
+        if not remplacer:
+            return None
+        return self.client.table(self.table).update(donnees).eq("email", donnees["email"]).execute()
+
+    def modifier(self, valeurs, emails=None):
+        """Met à jour les comptes `emails` (tous si None) en une requête."""
+        requete = self.client.table(self.table).update(valeurs)
+        if emails is None:
+            requete.neq("email", "").execute()
+        else:
+            requete.in_("email", list(emails)).execute()
+        self.invalider(emails)
+
+    def invalider(self, emails=None):
+        """Oublie les comptes donnés (un email, une liste, ou tous si None)."""
+        with self._verrou:
+            self._tous = None
+            if emails is None:
+                self._comptes.clear()
+                return
+            for email in [emails] if isinstance(emails, str) else emails:
+                self._comptes.pop(email, None)
+
+
+def comptes(client, table):
+    """CacheComptes partagé du processus pour cette table."""
+    with _verrou:
+        if (id(client), table) not in _caches:
+            _caches[(id(client), table)] = CacheComptes(client, table)
+        return _caches[(id(client), table)]
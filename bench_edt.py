@@ -0,0 +1,167 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import chargement_edt
+from chargement_edt import charger_edt, lire_excel, normalize, preparer_edt
+from conflits_edt import analyser_conflits, conflits_chevauchement, fiches_conflits, rapport_conflits
+from modele_creneaux import ModeleEDT
+from assistant_resolution import TOUS_HORAIRES, IndexOccupation, est_compatible, profil_lieu
+
+# --- BANC D'ESSAI DES CHEMINS CRITIQUES ---
+# Usage : python bench_edt.py [facteur ...]   (par défaut : 1 10 100)
+# Chargement : EDT synthétiques obtenus en répliquant dataEDT-ELT-S2-2026.xlsx.
+# Conflits : EDT aléatoire à l'échelle d'une faculté (voir edt_faculte).
+
+FICHIER_EDT = "dataEDT-ELT-S2-2026.xlsx"
+
+HORAIRES = [
+    "8h - 9h", "8h - 9h30", "8h - 10h", "9h - 10h", "9h30 - 11h",
+    "10h - 11h", "11h - 12h", "11h - 12h30", "12h - 13h",
+    "12h30 - 14h", "13h - 14h", "14h - 15h30", "14h - 16h", "15h30 - 17h"
+]
+
+
+def chrono(fonction, repetitions=5):
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - t0)
+    return meilleur * 1000
+
+
+def edt_synthetique(facteur):
+    base = pd.read_excel(FICHIER_EDT)
+    return pd.concat([base] * facteur, ignore_index=True)
+
+
+def lecture_historique(chemin):
+    # Reproduit l'ancien chargement d'edt_app.py, exécuté à chaque rerun
+    df = pd.read_excel(chemin)
+    df.columns = [str(c).strip() for c in df.columns]
+    for col in chargement_edt.COLONNES_CLES:
+        if col in df.columns:
+            df[col] = df[col].fillna("Non défini").astype(str).str.strip()
+        else:
+            df[col] = "Non défini"
+    df['h_norm'] = df['Horaire'].apply(normalize)
+    df['j_norm'] = df['Jours'].apply(normalize)
+    return df
+
+
+def bench_chargement(facteur, dossier):
+    chemin = os.path.join(dossier, f"edt_x{facteur}.xlsx")
+    edt_synthetique(facteur).to_excel(chemin, index=False)
+
+    avant = chrono(lambda: lecture_historique(chemin), repetitions=1 if facteur >= 100 else 3)
+    t0 = time.perf_counter()
+    charger_edt(chemin)
+    premier = (time.perf_counter() - t0) * 1000
+    apres = chrono(lambda: charger_edt(chemin), repetitions=50)
+
+    print(f"[chargement] x{facteur:<4} lecture par rerun : {avant:9.1f} ms | "
+          f"1er chargement : {premier:9.1f} ms | rerun en cache : {apres:7.3f} ms")
+
+    # Redémarrage du processus : le cache mémoire est vide mais l'instantané existe
+    chargement_edt._cache.clear()
+    instantane = chrono(lambda: lire_excel(chemin, "edt", preparer_edt), repetitions=5)
+    print(f"[instantané] x{facteur:<4} relecture Arrow (mmap) : {instantane:9.1f} ms")
+
+
+def edt_faculte(nb_seances, graine=2026):
+    # ~1 salle pour 25 séances, 1 enseignant pour 8, 1 promotion pour 30
+    rng = np.random.default_rng(graine)
+    tirage = lambda prefixe, n: [f"{prefixe}{i:04d}" for i in rng.integers(0, n, nb_seances)]
+    df = pd.DataFrame({
+        "Enseignements": tirage("Cours-M", nb_seances // 4),
+        "Code": tirage("TD-", 50),
+        "Enseignants": tirage("PROF", max(nb_seances // 8, 1)),
+        "Horaire": rng.choice(HORAIRES, nb_seances),
+        "Jours": rng.choice(["Dimanche", "Lundi", "Mardi", "Mercredi", "Jeudi"], nb_seances),
+        "Lieu": tirage("S", max(nb_seances // 25, 1)),
+        "Promotion": tirage("PROMO", max(nb_seances // 30, 1)),
+    })
+    return preparer_edt(df)
+
+
+def conflits_historiques(df):
+    # Boucles groupby du vérificateur de conflits d'edt_app.py (égalité stricte des libellés)
+    nb = 0
+    for _, group in df[df["Enseignants"] != "Non défini"].groupby(['Jours', 'Horaire', 'Enseignants']):
+        if len(group['Lieu'].unique()) > 1 or len(group['Enseignements'].unique()) > 1:
+            nb += 1
+    for _, group in df[(df["Lieu"] != "Non défini") & (df["Lieu"] != "A distance")].groupby(['Jours', 'Horaire', 'Lieu']):
+        if len(group['Enseignants'].unique()) > 1:
+            nb += 1
+    for _, group in df[df["Promotion"] != "Non défini"].groupby(['Jours', 'Horaire', 'Promotion']):
+        if len(group['Enseignements'].unique()) > 1:
+            nb += 1
+    return nb
+
+
+def bench_conflits(nb_seances):
+    df = edt_faculte(nb_seances)
+    avant = chrono(lambda: conflits_historiques(df), repetitions=1)
+    apres = chrono(lambda: conflits_chevauchement(ModeleEDT(df)), repetitions=3)
+    paires = sum(len(a) for a, _ in conflits_chevauchement(ModeleEDT(df)).values())
+    print(f"[conflits]   {nb_seances:>6} séances : boucles groupby {avant:9.1f} ms | "
+          f"balayage d'intervalles {apres:7.1f} ms ({paires} paires en conflit)")
+
+    def rapport_complet():
+        groupes, membres = analyser_conflits(df, ModeleEDT(df))
+        fiches_conflits(groupes, membres)
+        rapport_conflits(membres)
+        return groupes
+
+    une_passe = chrono(rapport_complet, repetitions=3)
+    print(f"[rapport]    {nb_seances:>6} séances : analyse + fiches + rapport Excel en une passe "
+          f"{une_passe:7.1f} ms ({len(rapport_complet())} groupes en conflit)")
+
+
+def suggestions_historiques(df, cp, tous_les_lieux):
+    # Boucle de l'assistant d'edt_app.py : deux filtrages du DataFrame par créneau
+    profil = profil_lieu(cp['Lieu'])
+    lieux_compatibles = [l for l in tous_les_lieux if est_compatible(l, profil)]
+    suggestions = []
+    for hor in TOUS_HORAIRES:
+        prof_occupe = False
+        if cp['Enseignant'] not in ["ND", "Multi-enseignants"]:
+            prof_occupe = not df[(df['Jours'] == cp['Jour']) & (df['Horaire'] == hor) &
+                                 (df['Enseignants'] == cp['Enseignant'])].empty
+        if not prof_occupe:
+            lieux_occupes = df[(df['Jours'] == cp['Jour']) & (df['Horaire'] == hor)]['Lieu'].unique()
+            libres = [l for l in lieux_compatibles if l not in lieux_occupes]
+            suggestions += [f"{hor} en {s}" for s in libres if not (hor == cp['Horaire'] and s in cp['Lieu'])]
+    return suggestions[:30]
+
+
+def bench_assistant(nb_seances, nb_conflits=300):
+    df = edt_faculte(nb_seances)
+    modele = ModeleEDT(df)
+    _, fiches = fiches_conflits(*analyser_conflits(df, modele))
+    fiches = fiches[:nb_conflits]
+    lieux = sorted(df['Lieu'].unique())
+    avant = chrono(lambda: [suggestions_historiques(df, cp, lieux) for cp in fiches], repetitions=1)
+
+    def indexe():
+        occupation = IndexOccupation(df, modele)
+        return [occupation.suggestions(cp['Jour'], cp['Enseignant'], cp['Horaire'], cp['Lieu']) for cp in fiches]
+
+    apres = chrono(indexe, repetitions=3)
+    print(f"[assistant]  {nb_seances:>6} séances, {len(fiches)} conflits : filtrages {avant:9.1f} ms | "
+          f"index d'occupation {apres:7.1f} ms")
+
+
+if __name__ == "__main__":
+    facteurs = [int(a) for a in sys.argv[1:]] or [1, 10, 100]
+    with tempfile.TemporaryDirectory() as dossier:
+        for facteur in facteurs:
+            bench_chargement(facteur, dossier)
+    for nb_seances in (2000, 20000, 60000):
+        bench_conflits(nb_seances)
+    bench_assistant(20000, nb_conflits=50)
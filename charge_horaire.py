@@ -0,0 +1,206 @@
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from modele_creneaux import cle_enseignant
+
+# --- CHARGE HORAIRE DES ENSEIGNANTS ---
+# Règles du Bilan Horaire : une séance par (jour, horaire), Cours = 1.5 eq, TD/TP = 1 eq,
+# seuil de 6.0 eq/h (3.0 pour un poste supérieur), 1 eq = 1.5 h réelle. Les compteurs
+# de tous les enseignants sont obtenus en un seul passage sur les couples
+# (séance, enseignant) de l'index inversé ; le bilan est ensuite une opération sur
+# colonnes, le poste supérieur étant un attribut propre à chaque enseignant.
+# Le registre des heures (registre_heures) est écrit ligne à ligne en mode
+# constant_memory de xlsxwriter : aucun DataFrame par enseignant n'est construit.
+
+COEF_COURS = 1.5        # équivalent TD d'un cours
+COEF_TD_TP = 1.0
+SEUIL_NORMAL = 6.0      # service hebdomadaire (eq/h)
+SEUIL_POSTE_SUP = 3.0   # décharge de 3h
+HEURES_PAR_EQ = 1.5     # 1 unité eq = 1.5 h réelle
+DUREE_SEANCE = 1.5      # heures réelles d'une séance
+
+COLONNES_BILAN = [
+    "Enseignant", "Cours", "TD", "TP", "Poste sup.", "Charge effective (h)",
+    "Charge (eq/h)", "Seuil (eq/h)", "Delta (eq/h)", "H. sup. (h)",
+]
+
+# Registre : une ligne de bilan par enseignant, suivie de ses séances
+COLONNES_REGISTRE = [
+    "Enseignant", "Jour", "Horaire", "Enseignements", "Code", "Lieu", "Promotion",
+    "Cours", "TD", "TP", "Charge effective (h)", "Charge (eq/h)", "Seuil (eq/h)",
+    "Delta (eq/h)", "H. sup. (h)",
+]
+COLONNES_SEANCE = ["Jours", "Horaire", "Enseignements", "Code", "Lieu", "Promotion"]
+STATUTS = ["Permanent", "Vacataire"]
+HORS_REPERTOIRE = "Non répertorié"
+
+
+def nature_seances(code):
+    """0 = COURS, 1 = TD, 2 = TP (d'après la colonne Code)."""
+    code = code.astype(str).str.upper()
+    return np.select([code.str.contains("COURS", regex=False), code.str.contains("TD", regex=False)], [0, 1], 2)
+
+
+def _premieres(df, entites, positions):
+    # Indices des couples retenus : une séance par (jour, horaire) et par entité,
+    # comme drop_duplicates(['j_norm', 'h_norm'])
+    creneau = pd.factorize(df["j_norm"].astype(str) + "|" + df["h_norm"].astype(str))[0]
+    cle = entites * (creneau.max() + 1 if len(creneau) else 1) + creneau[positions]
+    return np.unique(cle, return_index=True)[1]
+
+
+def compter_seances(df, entites, positions, nb_entites):
+    """Compteurs [Cours, TD, TP] par entité ; `entites[k]` anime la séance df.iloc[positions[k]].
+
+    Une séance par (jour, horaire) et par entité, comme drop_duplicates(['j_norm', 'h_norm']).
+    """
+    nature = nature_seances(df["Code"])
+    premiers = _premieres(df, entites, positions)
+    comptes = np.zeros((nb_entites, 3), dtype=np.int64)
+    np.add.at(comptes, (entites[premiers], nature[positions[premiers]]), 1)
+    return comptes
+
+
+def bilan_horaire(nb_cours, nb_td, nb_tp, poste_sup=False):
+    """Bilan d'un enseignant (scalaires) ou de plusieurs (tableaux NumPy)."""
+    seuil = np.where(np.asarray(poste_sup, dtype=bool), SEUIL_POSTE_SUP, SEUIL_NORMAL)
+    if seuil.ndim == 0:
+        seuil = float(seuil)
+    charge_totale_eq = nb_cours * COEF_COURS + (nb_td + nb_tp) * COEF_TD_TP
+    # Pas de max(0, ...) : un déficit garde son signe négatif
+    delta_eq = charge_totale_eq - seuil
+    return {
+        "seuil": seuil,
+        "charge_totale_eq": charge_totale_eq,
+        "delta_eq": delta_eq,
+        "h_sup": delta_eq * HEURES_PAR_EQ,
+        "charge_effective": (nb_cours + nb_td + nb_tp) * DUREE_SEANCE,
+    }
+
+
+def charges_enseignants(df, index):
+    """Compteurs Cours / TD / TP de chaque enseignant de l'index (une ligne par enseignant)."""
+    comptes = compter_seances(df, index.ens_id.astype(np.int64), index.seance, len(index))
+    return pd.DataFrame({
+        "Enseignant": index.noms,
+        "Cours": comptes[:, 0], "TD": comptes[:, 1], "TP": comptes[:, 2],
+    })
+
+
+def bilan_enseignants(charges, postes_sup=()):
+    """Tableau du département : compteurs, seuil, delta et heures sup. de chaque enseignant.
+
+    `postes_sup` : noms des enseignants en poste supérieur (comparés sous forme canonique).
+    """
+    cles = {cle_enseignant(n) for n in postes_sup}
+    poste_sup = np.array([cle_enseignant(n) in cles for n in charges["Enseignant"]], dtype=bool)
+    b = bilan_horaire(charges["Cours"].to_numpy(), charges["TD"].to_numpy(), charges["TP"].to_numpy(), poste_sup)
+    bilan = charges.assign(**{
+        "Poste sup.": poste_sup,
+        "Charge effective (h)": b["charge_effective"],
+        "Charge (eq/h)": b["charge_totale_eq"],
+        "Seuil (eq/h)": b["seuil"],
+        "Delta (eq/h)": b["delta_eq"],
+        "H. sup. (h)": b["h_sup"],
+    })
+    return bilan[COLONNES_BILAN]
+
+
+def _statut(qualite):
+    # "Permanentt", " permanent " → "Permanent"
+    qualite = str(qualite).strip()
+    for statut in STATUTS:
+        if qualite.upper().startswith(statut.upper()):
+            return statut
+    return qualite if qualite.lower() not in ("", "nan") else HORS_REPERTOIRE
+
+
+def _nom_feuille(statut, grade):
+    grade = " ".join(str(grade).split())
+    nom = f"{statut} - {grade}" if grade and grade.lower() != "nan" and statut != HORS_REPERTOIRE else statut
+    return re.sub(r"[\[\]:*?/\\]", "-", nom)
+
+
+def _noms_uniques(noms):
+    """{nom: nom de feuille} : 31 caractères au plus, distincts sans tenir compte de la
+    casse (règle d'Excel et de xlsxwriter) ; un doublon reçoit le suffixe " (2)", " (3)"..."""
+    pris = set()
+    feuilles = {}
+    for nom in sorted(noms):
+        feuille, numero = nom[:31], 1
+        while feuille.casefold() in pris:
+            numero += 1
+            suffixe = f" ({numero})"
+            feuille = nom[:31 - len(suffixe)] + suffixe
+        pris.add(feuille.casefold())
+        feuilles[nom] = feuille
+    return feuilles
+
+
+def feuilles_registre(index, staff=None):
+    """Nom de feuille (statut - grade) de chaque enseignant de l'index, d'après le
+    répertoire Permanents / Vacataires (colonnes NOM, Qualité, Grade)."""
+    repertoire = {}
+    if staff is not None:
+        staff = staff.rename(columns=lambda c: str(c).strip()).reindex(columns=["NOM", "Qualité", "Grade"])
+        for nom, qualite, grade in staff.itertuples(index=False, name=None):
+            repertoire.setdefault(cle_enseignant(nom), _nom_feuille(_statut(qualite), grade))
+    # "MCA" et "Mca" : même feuille, sous la graphie la plus fréquente
+    graphies = {}
+    for nom, _ in Counter(repertoire.values()).most_common():
+        graphies.setdefault(nom.casefold(), nom)
+    noms = [graphies[repertoire[cle].casefold()] if cle in repertoire else HORS_REPERTOIRE for cle in index.cles]
+    feuilles = _noms_uniques(set(noms))
+    return [feuilles[nom] for nom in noms]
+
+
+def registre_heures(sortie, modele, bilan, staff=None):
+    """Écrit dans `sortie` (chemin ou fichier binaire) le registre des heures de tous
+    les enseignants : une feuille par statut / grade, pour chaque enseignant une ligne
+    de bilan puis ses séances (1 dans Cours / TD / TP pour une séance décomptée).
+
+    `bilan` : tableau de bilan_enseignants, dans l'ordre de modele.index_enseignants.
+    """
+    df, index = modele.df, modele.index_enseignants
+    # Couples (séance, enseignant) rangés par enseignant, jour puis heure de début
+    ordre = np.lexsort((modele.debut[index.seance], modele.jour[index.seance], index.ens_id))
+    entites = index.ens_id[ordre].astype(np.int64)
+    positions = index.seance[ordre]
+    bornes = np.searchsorted(entites, np.arange(len(index) + 1))
+    decomptee = np.zeros(len(positions), dtype=bool)
+    decomptee[_premieres(df, entites, positions)] = True
+    nature = nature_seances(df["Code"])
+
+    valeurs = df[COLONNES_SEANCE].astype(str).to_numpy(dtype=object)
+    totaux = bilan[COLONNES_REGISTRE[7:]].to_numpy(dtype=float)
+    feuilles = feuilles_registre(index, staff)
+
+    classeur = xlsxwriter.Workbook(sortie, {"constant_memory": True})
+    f_entete = classeur.add_format({"bold": True, "bg_color": "#1E3A8A", "font_color": "white", "border": 1})
+    f_bilan = classeur.add_format({"bold": True, "bg_color": "#E5E7EB", "top": 1})
+    f_bilan_nombre = classeur.add_format({"bold": True, "bg_color": "#E5E7EB", "top": 1, "num_format": "0.00"})
+
+    for feuille in sorted(set(feuilles)):
+        ws = classeur.add_worksheet(feuille)
+        ws.set_column(0, 0, 22)
+        ws.set_column(1, 6, 16)
+        ws.set_column(7, len(COLONNES_REGISTRE) - 1, 13)
+        ws.freeze_panes(1, 1)
+        ws.write_row(0, 0, COLONNES_REGISTRE, f_entete)
+        ligne = 1
+        for e in (i for i, f in enumerate(feuilles) if f == feuille):
+            ws.write_string(ligne, 0, index.noms[e], f_bilan)
+            ws.write_row(ligne, 1, [""] * 6, f_bilan)
+            ws.write_row(ligne, 7, totaux[e, :3].astype(int).tolist(), f_bilan)
+            ws.write_row(ligne, 10, totaux[e, 3:].tolist(), f_bilan_nombre)
+            ligne += 1
+            for k in range(bornes[e], bornes[e + 1]):
+                ws.write_row(ligne, 1, valeurs[positions[k]])
+                if decomptee[k]:
+                    ws.write_number(ligne, 7 + int(nature[positions[k]]), 1)
+                ligne += 1
+    classeur.close()
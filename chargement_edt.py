@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow est normalement installé avec streamlit
+    pa = None
+    feather = None
+
+# --- CHARGEMENT PARTAGÉ DE L'EMPLOI DU TEMPS ---
+# Streamlit ré-exécute le script à chaque clic : le classeur n'est donc lu qu'une
+# seule fois par processus et le même DataFrame est servi à toutes les sessions.
+# Le cache est indexé sur (mtime, taille) puis sur l'empreinte SHA-256 du contenu :
+# une simple ré-écriture à l'identique ne provoque pas de nouvelle lecture.
+# Le DataFrame retourné est partagé : ne jamais le modifier en place (faire un .copy()).
+# Verrous : le verrou global ne protège que la consultation du cache. La lecture d'un
+# classeur et la construction d'une structure dérivée se font sous un verrou propre à
+# (classeur) ou (classeur, version, clé) : un rendu long ne bloque ni les autres
+# sessions ni les autres clés, et chaque structure n'est construite qu'une fois.
+
+# --- INSTANTANÉS COLONNAIRES ---
+# Chaque classeur lu est recopié à côté de lui au format Arrow/Feather non compressé
+# (ex. dataEDT-ELT-S2-2026.edt.arrow), relu ensuite par projection mémoire (mmap).
+# L'instantané embarque la signature du classeur source (mtime, taille, SHA-256) :
+# dès qu'elle ne correspond plus, on relit l'Excel et on réécrit l'instantané.
+
+COLONNES_CLES = [
+    'Enseignements',
+    'Code',
+    'Enseignants',
+    'Horaire',
+    'Jours',
+    'Lieu',
+    'Promotion'
+]
+
+_verrou = threading.RLock()
+_cache = {}
+_verrous = {}   # chemin → verrou de lecture du classeur
+
+
+def normalize(s):
+    if not s or s == "Non défini":
+        return "vide"
+    s = str(s).strip().lower()
+    s = s.replace(" ", "").replace("-", "").replace("–", "")
+    s = s.replace(":00", "").replace("h00", "h")
+    return s
+
+
+def empreinte_fichier(chemin):
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def signature_fichiers(*chemins):
+    """(mtime, taille) de chaque fichier : argument de cache pour st.cache_data."""
+    signature = []
+    for chemin in chemins:
+        try:
+            infos = os.stat(chemin)
+            signature.append((chemin, infos.st_mtime_ns, infos.st_size))
+        except FileNotFoundError:
+            signature.append((chemin, None, None))
+    return tuple(signature)
+
+
+def preparer_edt(df):
+    df.columns = [str(c).strip() for c in df.columns]
+
+    for col in COLONNES_CLES:
+        if col in df.columns:
+            df[col] = df[col].fillna("Non défini").astype(str).str.strip()
+        else:
+            df[col] = "Non défini"
+
+    # normalize() n'est appliqué qu'une fois par valeur distincte
+    df['h_norm'] = df['Horaire'].map({h: normalize(h) for h in df['Horaire'].unique()})
+    df['j_norm'] = df['Jours'].map({j: normalize(j) for j in df['Jours'].unique()})
+    return df
+
+
+def chemin_instantane(chemin, variante="brut"):
+    return f"{os.path.splitext(chemin)[0]}.{variante}.arrow"
+
+
+def _source_instantane(chemin_inst):
+    try:
+        with pa.memory_map(chemin_inst) as source:
+            meta = pa.ipc.open_file(source).schema.metadata or {}
+        return json.loads(meta[b"source"])
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+
+
+def _ecrire_instantane(df, chemin_inst, source):
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        meta = dict(table.schema.metadata or {})
+        meta[b"source"] = json.dumps(source).encode()
+        table = table.replace_schema_metadata(meta)
+        temporaire = f"{chemin_inst}.{os.getpid()}.tmp"
+        feather.write_feather(table, temporaire, compression="uncompressed")
+        os.replace(temporaire, chemin_inst)
+    except (OSError, pa.ArrowException):
+        # Colonnes mixtes non convertibles, disque en lecture seule… : on reste sur l'Excel
+        pass
+
+
+def lire_excel(chemin, variante="brut", preparer=None, empreinte=None):
+    """Lit un classeur via son instantané colonnaire s'il est à jour, sinon via openpyxl.
+
+    `preparer` (optionnel) est appliqué au DataFrame brut avant l'écriture de
+    l'instantané, de sorte que les colonnes dérivées (h_norm, j_norm…) y sont stockées.
+    """
+    if feather is None:
+        df = pd.read_excel(chemin)
+        return preparer(df) if preparer else df
+
+    infos = os.stat(chemin)
+    chemin_inst = chemin_instantane(chemin, variante)
+    source = _source_instantane(chemin_inst)
+    stat = [infos.st_mtime_ns, infos.st_size]
+
+    if source is None or source["stat"] != stat:
+        empreinte = empreinte or empreinte_fichier(chemin)
+        if source is None or source["empreinte"] != empreinte:
+            df = pd.read_excel(chemin)
+            if preparer:
+                df = preparer(df)
+            _ecrire_instantane(df, chemin_inst, {"stat": stat, "empreinte": empreinte})
+            return df
+        # Contenu identique (fichier simplement ré-écrit) : on rafraîchit la signature
+        df = feather.read_table(chemin_inst, memory_map=True).to_pandas()
+        _ecrire_instantane(df, chemin_inst, {"stat": stat, "empreinte": empreinte})
+        return df
+
+    return feather.read_table(chemin_inst, memory_map=True).to_pandas()
+
+
+def _entree(chemin):
+    try:
+        infos = os.stat(chemin)
+    except FileNotFoundError:
+        return None
+    cle_stat = (infos.st_mtime_ns, infos.st_size)
+
+    with _verrou:
+        entree = _cache.get(chemin)
+        if entree is not None and entree["stat"] == cle_stat:
+            return entree
+        verrou = _verrous.setdefault(chemin, threading.RLock())
+    with verrou:
+        # Un autre thread a pu relire le classeur pendant l'attente
+        with _verrou:
+            entree = _cache.get(chemin)
+        if entree is None or entree["stat"] != cle_stat:
+            empreinte = empreinte_fichier(chemin)
+            if entree is None or entree["empreinte"] != empreinte:
+                entree = {
+                    "df": lire_excel(chemin, "edt", preparer_edt, empreinte),
+                    "empreinte": empreinte,
+                    "derives": {},
+                    "verrous": {},
+                }
+            entree["stat"] = cle_stat
+            with _verrou:
+                _cache[chemin] = entree
+        return entree
+
+
+def charger_edt(chemin):
+    """DataFrame partagé (lecture seule) de l'EDT, ou None si le fichier est absent."""
+    entree = _entree(chemin)
+    return entree["df"] if entree else None
+
+
+def derive_edt(chemin, cle, fabrique):
+    """Structure dérivée de l'EDT (modèle, index…) construite une fois par version.
+
+    `fabrique(df)` n'est rappelée qu'après un changement réel du classeur.
+    """
+    entree = _entree(chemin)
+    if entree is None:
+        return None
+    derives = entree["derives"]
+    with _verrou:
+        if cle in derives:
+            return derives[cle]
+        # RLock : une fabrique peut elle-même appeler derive_edt
+        verrou = entree["verrous"].setdefault(cle, threading.RLock())
+    with verrou:
+        with _verrou:
+            if cle in derives:
+                return derives[cle]
+        valeur = fabrique(entree["df"])
+        with _verrou:
+            derives[cle] = valeur
+        return valeur
+
+
+def version_edt(chemin):
+    """Empreinte du contenu actuellement servi, utilisable comme clé de cache."""
+    entree = _entree(chemin)
+    return entree["empreinte"] if entree else None
+
+
+def enregistrer_edt(df, chemin):
+    df.to_excel(chemin, index=False)
+    with _verrou:
+        _cache.pop(chemin, None)
+    # L'instantané est régénéré tout de suite, pas à la première consultation
+    _entree(chemin)
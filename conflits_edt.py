@@ -0,0 +1,443 @@
+import numpy as np
+import pandas as pd
+
+from chargement_edt import normalize
+from modele_creneaux import JOURS, VALEURS_VIDES, intervalle_horaire, noms_enseignants
+
+# --- MOTEUR DE CONFLITS PAR CHEVAUCHEMENT D'INTERVALLES ---
+# Les horaires sont comparés en minutes (voir modele_creneaux.intervalle_horaire) :
+# "8h - 10h" et "9h30 - 11h" se chevauchent même si les libellés diffèrent.
+# Pour chaque ressource (salle, enseignant, promotion) et chaque jour, un tri unique
+# suivi d'un balayage vectorisé retourne toutes les paires qui se chevauchent,
+# en O(n log n + k) où k est le nombre de paires.
+
+# Au-delà d'une journée en minutes (intervalle_horaire rejette les heures hors de
+# 0h-24h) : la clé groupe * ECHELLE + minute reste triée. paires_chevauchement
+# l'élargit si des minutes plus grandes lui sont passées.
+ECHELLE = 2048
+
+
+def paires_chevauchement(groupe, debut, fin):
+    """Paires (i, j) de même groupe dont les intervalles [debut, fin[ se chevauchent.
+
+    Les entrées de groupe ou de début négatifs (valeur inconnue) sont ignorées.
+    """
+    groupe = np.asarray(groupe, dtype=np.int64)
+    debut = np.asarray(debut, dtype=np.int64)
+    fin = np.asarray(fin, dtype=np.int64)
+
+    valides = np.flatnonzero((groupe >= 0) & (debut >= 0))
+    ordre = valides[np.lexsort((debut[valides], groupe[valides]))]
+    g, d, f = groupe[ordre], debut[ordre], fin[ordre]
+
+    # Séances triées par (groupe, début) : pour i, les partenaires sont les j > i
+    # du même groupe qui commencent avant la fin de i
+    echelle = max(ECHELLE, int(f.max()) + 1) if len(f) else ECHELLE
+    cle = g * echelle + d
+    borne = np.searchsorted(cle, g * echelle + f, side="left")
+    nb = borne - np.arange(len(cle)) - 1
+    i = np.repeat(np.arange(len(cle)), nb)
+    decalage = np.arange(int(nb.sum())) - np.repeat(np.cumsum(nb) - nb, nb)
+    return ordre[i], ordre[i + 1 + decalage]
+
+
+def _groupe(jour, code, taille):
+    # (jour, ressource) → entier unique ; -1 si l'un des deux est inconnu
+    return np.where((jour >= 0) & (code >= 0), jour * taille + code, -1)
+
+
+def conflits_chevauchement(modele):
+    """Paires de lignes en conflit, par type de ressource.
+
+    Retourne {"Lieu": (a, b), "Enseignants": (a, b), "Promotion": (a, b)} où a et b
+    sont des positions de lignes. Comme dans le vérificateur historique, deux séances
+    qui se chevauchent ne sont en conflit que si elles diffèrent réellement :
+    - salle : équipes enseignantes différentes ;
+    - enseignant : lieux ou matières différents (un cours commun n'est pas un conflit) ;
+    - promotion : matières différentes.
+    """
+    m = modele
+    conflits = {}
+
+    a, b = paires_chevauchement(_groupe(m.jour, m.salle, len(m.salles)), m.debut, m.fin)
+    garde = m.equipe[a] != m.equipe[b]
+    conflits["Lieu"] = (a[garde], b[garde])
+
+    # Enseignants : on raisonne sur les couples (séance, enseignant)
+    lignes = m.ens_seance
+    a, b = paires_chevauchement(
+        _groupe(m.jour[lignes], m.ens_id, len(m.enseignants)), m.debut[lignes], m.fin[lignes]
+    )
+    a, b = lignes[a], lignes[b]
+    garde = (a != b) & ((m.salle[a] != m.salle[b]) | (m.matiere[a] != m.matiere[b]))
+    conflits["Enseignants"] = (a[garde], b[garde])
+
+    a, b = paires_chevauchement(_groupe(m.jour, m.promo, len(m.promotions)), m.debut, m.fin)
+    garde = m.matiere[a] != m.matiere[b]
+    conflits["Promotion"] = (a[garde], b[garde])
+    return conflits
+
+
+def lignes_en_conflit(paires):
+    a, b = paires
+    return np.unique(np.concatenate([a, b]))
+
+
+# --- RAPPORT DE CONFLITS EN UNE PASSE ---
+# Les trois types de ressources sont empilés dans un seul tableau long
+# (type, jour, ressource, début, fin), triés une seule fois, puis un seul balayage
+# (paires_chevauchement) donne les paires qui se chevauchent, filtrées avec les
+# règles de conflits_chevauchement. Un "groupe" est une composante connexe de ces
+# paires en conflit : une séance qui chevauche seulement des séances avec lesquelles
+# elle n'est pas en conflit (ex. même équipe dans la salle) n'y figure pas.
+
+TYPES_CONFLIT = ["Enseignants", "Lieu", "Promotion"]
+
+LIBELLES_CONFLIT = {
+    "Enseignants": "❌ CONFLIT ENSEIGNANT",
+    "Lieu": "❌ CONFLIT SALLE OCCUPÉE",
+    "Promotion": "⚠️ CONFLIT PROMOTION",
+}
+
+COLONNES_GROUPES = ["Type", "Jour", "Horaire", "Ressource", "Lieux", "Matières", "Promotions",
+                    "Enseignants", "Nb séances"]
+
+
+def _joindre_uniques(membres, colonne):
+    # "A, B" par groupe sans agrégation Python : concaténation par np.add.reduceat
+    uniques = membres[["groupe", colonne]].drop_duplicates().sort_values("groupe", kind="stable")
+    groupes = uniques["groupe"].to_numpy()
+    valeurs = uniques[colonne].astype(str).to_numpy(dtype=object)
+    debuts = np.flatnonzero(np.r_[True, groupes[1:] != groupes[:-1]])
+    suite = np.ones(len(valeurs), dtype=bool)
+    suite[debuts] = False
+    valeurs[suite] = ", " + valeurs[suite]
+    if len(valeurs) == 0:
+        return pd.Series(dtype=object)
+    return pd.Series(np.add.reduceat(valeurs, debuts), index=groupes[debuts])
+
+
+def analyser_conflits(df, modele):
+    """Calcule en une passe les conflits enseignants, salles et promotions.
+
+    Retourne (groupes, membres) :
+    - groupes : une ligne par groupe en conflit (colonnes COLONNES_GROUPES) ;
+    - membres : une ligne par (groupe, séance) avec "Type", "groupe", "ligne"
+      (position dans df) et les colonnes de df.
+    """
+    m = modele
+    tous = np.arange(m.n)
+    lignes = np.concatenate([m.ens_seance, tous, tous])
+    ressource = np.concatenate([m.ens_id, m.salle, m.promo])
+    type_ = np.repeat(np.arange(3), [len(m.ens_seance), m.n, m.n])
+
+    taille = max(len(m.enseignants), len(m.salles), len(m.promotions), 1)
+    jour = m.jour[lignes]
+    groupe = np.where(
+        (ressource >= 0) & (jour >= 0) & (m.debut[lignes] >= 0),
+        (type_ * len(m.jours) + jour).astype(np.int64) * taille + ressource, -1
+    )
+    valides = np.flatnonzero(groupe >= 0)
+    ordre = valides[np.lexsort((m.debut[lignes][valides], groupe[valides]))]
+    g = groupe[ordre]
+    d = m.debut[lignes][ordre].astype(np.int64)
+    f = m.fin[lignes][ordre].astype(np.int64)
+
+    # Paires chevauchantes de même (type, jour, ressource), positions dans `ordre`
+    a, b = paires_chevauchement(g, d, f)
+    pos, t = lignes[ordre], type_[ordre]
+    type_a = t[a]
+    la, lb = pos[a], pos[b]
+    # Mêmes règles que conflits_chevauchement, selon le type de ressource
+    garde = np.select(
+        [type_a == 0, type_a == 1],
+        [(la != lb) & ((m.salle[la] != m.salle[lb]) | (m.matiere[la] != m.matiere[lb])),
+         m.equipe[la] != m.equipe[lb]],
+        m.matiere[la] != m.matiere[lb]
+    ).astype(bool)
+    a, b = a[garde], b[garde]
+
+    # Composantes connexes des paires en conflit : chaque séance prend le plus petit
+    # indice de sa composante (propagation par les paires + saut de pointeurs)
+    racine = np.arange(len(ordre))
+    while True:
+        suivante = racine.copy()
+        np.minimum.at(suivante, a, racine[b])
+        np.minimum.at(suivante, b, racine[a])
+        suivante = suivante[suivante]
+        if np.array_equal(suivante, racine):
+            break
+        racine = suivante
+    en_conflit = np.unique(np.concatenate([a, b]))
+    _, chaine = np.unique(racine[en_conflit], return_inverse=True)
+    # Membres d'un même groupe contigus, dans l'ordre du tri (ressource, début)
+    en_conflit = en_conflit[np.argsort(chaine, kind="stable")]
+    chaine = np.sort(chaine, kind="stable")
+
+    long = pd.DataFrame({
+        "groupe": chaine, "type": t[en_conflit], "code": ressource[ordre][en_conflit], "ligne": pos[en_conflit],
+    })
+
+    # Libellé de la ressource : vocabulaires concaténés dans l'ordre de TYPES_CONFLIT
+    vocabulaires = [m.enseignants, m.salles, m.promotions]
+    decalages = np.cumsum([0] + [len(v) for v in vocabulaires[:-1]])
+    libelles = np.array([r for v in vocabulaires for r in v] + [""], dtype=object)
+    types = long["type"].to_numpy()
+    positions = long["ligne"].to_numpy()
+
+    membres = df.iloc[positions].reset_index(drop=True)
+    membres.insert(0, "Type", np.array(TYPES_CONFLIT, dtype=object)[types])
+    membres.insert(1, "groupe", long["groupe"].to_numpy())
+    membres.insert(2, "ligne", positions)
+    membres.insert(3, "Ressource", libelles[decalages[types] + long["code"].to_numpy()])
+    membres["Jour"] = np.array(m.jours, dtype=object)[m.jour[positions]]
+
+    premiers = membres.drop_duplicates("groupe").set_index("groupe")
+    groupes = pd.DataFrame({
+        "Type": premiers["Type"],
+        "Jour": premiers["Jour"],
+        "Horaire": _joindre_uniques(membres, "Horaire"),
+        "Ressource": premiers["Ressource"],
+        "Lieux": _joindre_uniques(membres, "Lieu"),
+        "Matières": _joindre_uniques(membres, "Enseignements"),
+        "Promotions": _joindre_uniques(membres, "Promotion"),
+        "Enseignants": _joindre_uniques(membres, "Enseignants"),
+        "Nb séances": membres.groupby("groupe", sort=False).size(),
+    })
+    return groupes[COLONNES_GROUPES], membres
+
+
+def fiches_conflits(groupes, membres):
+    """Anomalies au format du vérificateur : (errs_text, errs_for_df).
+
+    Un conflit de salle donne une fiche par équipe enseignante concernée, pour que
+    chaque enseignant la retrouve dans son filtre.
+    """
+    g = groupes
+    est_prof = g["Type"] == "Enseignants"
+    est_salle = g["Type"] == "Lieu"
+    est_promo = g["Type"] == "Promotion"
+    type_err = g["Type"].map(LIBELLES_CONFLIT)
+
+    detail = np.select(
+        [est_prof, est_salle],
+        ["L'enseignant est affecté à plusieurs lieux (" + g["Lieux"] + ") ou matières.",
+         "La salle '" + g["Ressource"] + "' est utilisée par : " + g["Enseignants"]],
+        "La promotion " + g["Ressource"] + " a plusieurs cours simultanés : " + g["Matières"]
+    )
+    message = ("**" + type_err + "** : " + g["Ressource"] + " | " + g["Jour"] + " " + g["Horaire"]
+               + np.where(est_salle, " (" + g["Enseignants"] + ")", ""))
+    errs_text = list(zip(np.where(est_promo, "warning", "error").tolist(), message))
+
+    fiches = pd.DataFrame({
+        "Type": type_err,
+        "Enseignant": np.where(est_promo, "Multi-enseignants", g["Ressource"]),
+        "Jour": g["Jour"],
+        "Horaire": g["Horaire"],
+        "Détail": detail,
+        "Lieu": np.where(est_salle, g["Ressource"], g["Lieux"]),
+        "Matières": g["Matières"],
+        "Promotions": np.where(est_promo, g["Ressource"], g["Promotions"]),
+    }, index=g.index)
+    equipes = membres.loc[membres["Type"] == "Lieu", ["groupe", "Enseignants"]].drop_duplicates()
+    par_equipe = fiches.loc[equipes["groupe"]].assign(Enseignant=equipes["Enseignants"].to_numpy())
+    fiches = pd.concat([fiches[~est_salle], par_equipe]).sort_index(kind="stable")
+    # Équivalent de to_dict("records"), sans la conversion valeur par valeur de pandas
+    colonnes = list(fiches.columns)
+    valeurs = zip(*(fiches[c].to_numpy(dtype=object) for c in colonnes))
+    return errs_text, [dict(zip(colonnes, ligne)) for ligne in valeurs]
+
+
+def rapport_conflits(membres):
+    """Une ligne par séance en conflit, colonnes du rapport Excel de l'éditeur."""
+    types = membres["Type"]
+    rapport = pd.DataFrame({
+        "Type de Conflit": types.map({
+            "Lieu": "❌ SALLE OCCUPÉE",
+            "Enseignants": "👤 CONFLIT ENSEIGNANT",
+            "Promotion": "⚠️ CONFLIT PROMOTION",
+        }),
+        "Promotion": membres["Promotion"],
+        "Intervenant/Salle": membres["Ressource"],
+        "Jour": membres["Jours"],
+        "Horaire": membres["Horaire"],
+        "Détails": np.select(
+            [types == "Lieu", types == "Enseignants"],
+            ["La salle " + membres["Ressource"] + " est réservée par plusieurs groupes.",
+             "L'enseignant " + membres["Ressource"] + " a deux cours en même temps."],
+            "Cette promotion a plusieurs enseignements affectés au même créneau."
+        ),
+    })
+    return rapport.drop_duplicates()
+
+
+# --- INDEX INCRÉMENTAL (ÉDITEUR DE DONNÉES) ---
+# Dans l'éditeur, chaque saisie provoque un rerun : plutôt que de tout recalculer,
+# on maintient des tables de hachage (type, jour, ressource) → {ligne: (début, fin,
+# discriminant)} et, pour chaque ligne, l'ensemble de ses partenaires de conflit.
+# Ajouter, retirer ou modifier une ligne ne touche que les quelques séances de la
+# même ressource le même jour. Les règles sont celles de conflits_chevauchement :
+# deux séances qui se chevauchent sont en conflit si leurs discriminants diffèrent
+# (salle : équipe ; enseignant : lieu et matière ; promotion : matière).
+
+class IndexConflits:
+    def __init__(self, df):
+        self.version = 0
+        self.nb_paires = 0   # paires en conflit, comptées une fois par ressource partagée
+        self._seances = {}   # ligne → (jour, début, fin, [(clé, discriminant), ...])
+        self._cases = {}     # clé → {ligne: (début, fin, discriminant)}
+        self._voisins = {}   # clé → {ligne: {lignes en conflit}}
+        self._jours = {normalize(j): j for j in JOURS}
+        self._analyses = {}  # cache par valeur distincte (jour, horaire, enseignants)
+        self._noms = {}      # clé canonique d'enseignant → nom affiché
+        colonnes = ["Jours", "Horaire", "Lieu", "Promotion", "Enseignements", "Enseignants"]
+        for label, *valeurs in df[colonnes].astype(str).itertuples(name=None):
+            self._inserer(label, dict(zip(colonnes, valeurs)))
+        self.version = 1
+
+    def _analyser(self, sorte, valeur):
+        cle = (sorte, valeur)
+        if cle not in self._analyses:
+            if sorte == "Jours":
+                n = normalize(valeur)
+                resultat = None if n in VALEURS_VIDES | {"vide"} else self._jours.get(n, n)
+            elif sorte == "Horaire":
+                resultat = intervalle_horaire(valeur)
+            else:
+                resultat = noms_enseignants(valeur)
+                for cle_nom, nom in resultat:
+                    self._noms.setdefault(cle_nom, nom)
+                resultat = [cle_nom for cle_nom, _ in resultat]
+            self._analyses[cle] = resultat
+        return self._analyses[cle]
+
+    @staticmethod
+    def _ressource(valeur):
+        valeur = str(valeur).strip()
+        return None if valeur.lower() in VALEURS_VIDES else valeur
+
+    def _decrire(self, ligne):
+        # (jour, début, fin, [(clé, discriminant), ...]) d'une ligne de l'EDT
+        jour = self._analyser("Jours", str(ligne["Jours"]))
+        debut, fin = self._analyser("Horaire", str(ligne["Horaire"]))
+        salle = self._ressource(ligne["Lieu"])
+        promo = self._ressource(ligne["Promotion"])
+        matiere = self._ressource(ligne["Enseignements"])
+        equipe = self._ressource(ligne["Enseignants"])
+
+        cles = []
+        if jour is not None and debut >= 0:
+            cles += [(("Enseignants", jour, nom), (salle, matiere))
+                     for nom in self._analyser("Enseignants", str(ligne["Enseignants"]))]
+            if salle is not None:
+                cles.append((("Lieu", jour, salle), equipe))
+            if promo is not None:
+                cles.append((("Promotion", jour, promo), matiere))
+        return jour, debut, fin, cles
+
+    def _inserer(self, label, ligne):
+        jour, debut, fin, cles = self._seances[label] = self._decrire(ligne)
+        for cle, discriminant in cles:
+            case = self._cases.setdefault(cle, {})
+            for autre, (d, f, disc) in case.items():
+                if d < fin and debut < f and disc != discriminant:
+                    voisins = self._voisins.setdefault(cle, {})
+                    voisins.setdefault(label, set()).add(autre)
+                    voisins.setdefault(autre, set()).add(label)
+                    self.nb_paires += 1
+            case[label] = (debut, fin, discriminant)
+
+    def _enlever(self, label):
+        _, _, _, cles = self._seances.pop(label, (None, -1, -1, []))
+        for cle, _ in cles:
+            self._cases[cle].pop(label, None)
+            voisins = self._voisins.get(cle)
+            if voisins and label in voisins:
+                for autre in voisins.pop(label):
+                    self.nb_paires -= 1
+                    voisins[autre].discard(label)
+                    if not voisins[autre]:
+                        del voisins[autre]
+
+    # --- MISES À JOUR ---
+    def ajouter(self, label, ligne):
+        self._enlever(label)
+        self._inserer(label, ligne)
+        self.version += 1
+
+    def retirer(self, label):
+        self._enlever(label)
+        self.version += 1
+
+    # --- CONSULTATION ---
+    def nb_conflits(self, label):
+        _, _, _, cles = self._seances.get(label, (None, -1, -1, []))
+        return sum(len(self._voisins.get(cle, {}).get(label, ())) for cle, _ in cles)
+
+    def partenaires(self, ligne, label=None):
+        """Conflits qu'aurait `ligne` si elle remplaçait la ligne `label` (ou si elle
+        était ajoutée), sans modifier l'index : liste de (type, étiquette en conflit)."""
+        _, debut, fin, cles = self._decrire(ligne)
+        return [(cle[0], autre)
+                for cle, discriminant in cles
+                for autre, (d, f, disc) in self._cases.get(cle, {}).items()
+                if autre != label and d < fin and debut < f and disc != discriminant]
+
+    def evaluer(self, ligne, label=None):
+        """Nombre de conflits qu'aurait `ligne` (voir partenaires)."""
+        return len(self.partenaires(ligne, label))
+
+    def seance(self, label):
+        """(jour canonique, début, fin) de la ligne, tels que vus par l'index."""
+        return self._seances[label][:3]
+
+    def lignes_en_conflit(self, type_conflit):
+        lignes = set()
+        for (sorte, _, _), voisins in self._voisins.items():
+            if sorte == type_conflit:
+                lignes.update(voisins)
+        return sorted(lignes)
+
+    def membres(self, df):
+        """Une ligne par (ressource, séance) en conflit, au format de analyser_conflits
+        ("ligne" contient ici l'étiquette d'index de df)."""
+        entrees = [(sorte, self._noms.get(ressource, ressource) if sorte == "Enseignants" else ressource, label)
+                   for (sorte, _, ressource), voisins in self._voisins.items()
+                   for label in voisins]
+        if not entrees:
+            return pd.DataFrame(columns=["Type", "ligne", "Ressource", *df.columns])
+        types, ressources, labels = zip(*entrees)
+        membres = df.loc[list(labels)].reset_index(drop=True)
+        membres.insert(0, "Type", types)
+        membres.insert(1, "ligne", labels)
+        membres.insert(2, "Ressource", ressources)
+        return membres
+
+
+if __name__ == "__main__":
+    # Régression : salle S1 le lundi, A et B (même équipe) se chevauchent sans conflit,
+    # seul B / C est un conflit de salle : A ne doit pas figurer dans le groupe.
+    import sys
+
+    from chargement_edt import preparer_edt
+    from modele_creneaux import ModeleEDT
+
+    df = preparer_edt(pd.DataFrame({
+        "Enseignements": ["Cours-A", "Cours-B", "Cours-C"],
+        "Code": ["A", "B", "C"],
+        "Enseignants": ["PROF X", "PROF X", "PROF Y"],
+        "Horaire": ["8h - 10h", "9h - 11h", "10h30 - 12h"],
+        "Jours": ["Lundi"] * 3,
+        "Lieu": ["S1"] * 3,
+        "Promotion": ["L1", "L2", "L3"],
+    }))
+    groupes, membres = analyser_conflits(df, ModeleEDT(df))
+    salle = groupes[groupes["Type"] == "Lieu"]
+    ok = (len(salle) == 1 and salle["Horaire"].iloc[0] == "9h - 11h, 10h30 - 12h"
+          and sorted(membres.loc[membres["Type"] == "Lieu", "ligne"]) == [1, 2])
+    # Même ensemble de séances en conflit que conflits_chevauchement, par type
+    for type_conflit, paires in conflits_chevauchement(ModeleEDT(df)).items():
+        ok &= sorted(membres.loc[membres["Type"] == type_conflit, "ligne"].unique()) == list(lignes_en_conflit(paires))
+    print(salle[["Ressource", "Jour", "Horaire", "Enseignants"]].to_string(index=False))
+    print("OK" if ok else "ÉCHEC")
+    sys.exit(0 if ok else 1)
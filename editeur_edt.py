@@ -0,0 +1,111 @@
+import pandas as pd
+
+# --- SUIVI DES DELTAS DE st.data_editor ---
+# data_editor conserve dans st.session_state[clé] ses modifications par rapport au
+# tableau qu'on lui a fourni : {"edited_rows": {position: {colonne: valeur}},
+# "added_rows": [{colonne: valeur}], "deleted_rows": [position]}. Ces deltas sont
+# cumulatifs : à chaque rerun, on ne reporte sur df_admin (et sur l'index de conflits)
+# que ce qui a changé depuis le rerun précédent, ligne par ligne, par étiquette d'index.
+# La base affichée reste figée pendant une "génération" de l'éditeur ; on en démarre
+# une nouvelle (nouvelle clé de widget) quand le filtre change ou après un ajout par
+# formulaire.
+
+_ABSENT = object()
+
+
+class SuiviEditeur:
+    def __init__(self, base, filtre, generation):
+        self.base = base                # DataFrame affiché, index = étiquettes de df_admin
+        self.filtre = filtre
+        self.cle = f"editeur_edt_{generation}"
+        self._vu = {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+        self._labels_ajouts = []        # étiquette df_admin de chaque ligne ajoutée
+
+    def _valeur_base(self, position, colonne):
+        return self.base.iat[position, self.base.columns.get_loc(colonne)]
+
+    def _ligne_base(self, position, modifications):
+        ligne = self.base.iloc[position].to_dict()
+        ligne.update(modifications.get(position, {}))
+        return ligne
+
+    def changements(self, etat):
+        """Deltas nouveaux depuis le dernier appel.
+
+        Retourne (modifications {étiquette: {colonne: valeur}}, ajouts {étiquette: ligne},
+        suppressions [étiquettes]).
+        """
+        etat = etat or {}
+        labels = self.base.index
+        edites = {int(p): dict(c) for p, c in etat.get("edited_rows", {}).items()}
+        vus = self._vu["edited_rows"]
+        modifications, ajouts, suppressions = {}, {}, []
+
+        # Cellules modifiées, ou revenues à leur valeur d'origine
+        for position in edites.keys() | vus.keys():
+            nouveau, ancien = edites.get(position, {}), vus.get(position, {})
+            for colonne in nouveau.keys() | ancien.keys():
+                valeur = nouveau.get(colonne, _ABSENT)
+                if valeur is _ABSENT:
+                    valeur = self._valeur_base(position, colonne)
+                elif valeur == ancien.get(colonne, _ABSENT):
+                    continue
+                modifications.setdefault(labels[position], {})[colonne] = valeur
+
+        # Lignes supprimées (positions dans la base), ou restaurées
+        supprimees = set(etat.get("deleted_rows", []))
+        anciennes = set(self._vu["deleted_rows"])
+        suppressions += [labels[p] for p in sorted(supprimees - anciennes)]
+        for position in sorted(anciennes - supprimees):
+            ajouts[labels[position]] = self._ligne_base(position, edites)
+        for label in suppressions:
+            modifications.pop(label, None)
+
+        # Lignes ajoutées : si la liste a raccourci (ligne ajoutée puis supprimée),
+        # les positions se décalent et on réécrit l'ensemble des ajouts
+        lignes = [dict(l) for l in etat.get("added_rows", [])]
+        if len(lignes) < len(self._labels_ajouts):
+            suppressions += self._labels_ajouts
+            self._labels_ajouts = []
+            self._vu["added_rows"] = []
+        for i, ligne in enumerate(lignes):
+            if i < len(self._labels_ajouts):
+                if ligne != self._vu["added_rows"][i]:
+                    ajouts[self._labels_ajouts[i]] = ligne
+            else:
+                self._labels_ajouts.append(None)   # étiquette attribuée par appliquer()
+                ajouts[(None, i)] = ligne
+
+        self._vu = {"edited_rows": edites, "added_rows": lignes, "deleted_rows": sorted(supprimees)}
+        return modifications, ajouts, suppressions
+
+    def appliquer(self, df, index, etat, colonnes):
+        """Reporte les nouveaux deltas de l'éditeur sur df et sur index ; retourne df."""
+        modifications, ajouts, suppressions = self.changements(etat)
+        if not (modifications or ajouts or suppressions):
+            return df
+
+        presentes = [l for l in suppressions if l in df.index]
+        if presentes:
+            df = df.drop(presentes)
+        for label in suppressions:
+            index.retirer(label)
+
+        for label, valeurs in modifications.items():
+            if label in df.index:
+                df.loc[label, list(valeurs)] = ["" if v is None else v for v in valeurs.values()]
+                index.ajouter(label, df.loc[label])
+
+        if ajouts:
+            prochain = (df.index.max() + 1) if len(df) else 0
+            nouvelles = {}
+            for cle, ligne in ajouts.items():
+                if isinstance(cle, tuple):
+                    self._labels_ajouts[cle[1]] = cle = prochain
+                    prochain += 1
+                nouvelles[cle] = {c: ("" if ligne.get(c) is None else ligne.get(c)) for c in colonnes}
+            df = df.drop([l for l in nouvelles if l in df.index])
+            df = pd.concat([df, pd.DataFrame.from_dict(nouvelles, orient="index")])
+            for label, ligne in nouvelles.items():
+                index.ajouter(label, ligne)
+        return df
@@ -3,8 +3,20 @@ import pandas as pd
 import os
 import hashlib
 import io
+from contextlib import closing
 from datetime import datetime
-from supabase import create_client
+from base_donnees import client_supabase, comptes, definir_page, mesures
+from chargement_edt import charger_edt, derive_edt, enregistrer_edt, lire_excel, version_edt
+from modele_creneaux import ModeleEDT, libelle_intervalle
+from conflits_edt import IndexConflits, analyser_conflits, fiches_conflits, rapport_conflits
+from editeur_edt import SuiviEditeur
+from assistant_resolution import IndexOccupation
+from reparation_edt import ReparationFond
+from precalcul_edt import precalcul_edt
+from charge_horaire import bilan_enseignants, bilan_horaire, charges_enseignants, registre_heures
+from file_envoi import (EN_ATTENTE, EN_COURS, ENVOYE, ECHEC, INCERTAIN, avancement, connecter, dernier_lot, echecs,
+                        enfiler, lancer_worker, oublier_envois, publier_statuts, statuts_envoyes,
+                        worker_actif)
 
 # --- CONFIGURATION DE LA PAGE ---
 st.set_page_config(
@@ -16,7 +28,9 @@ st.set_page_config(
 # --- CONNEXION BASE DE DONNÉES ---
 URL = st.secrets["SUPABASE_URL"]
 KEY = st.secrets["SUPABASE_KEY"]
-supabase = create_client(URL, KEY)
+supabase = client_supabase(URL, KEY)
+comptes_ens = comptes(supabase, "enseignants_auth")
+definir_page("Connexion")
 
 def hash_pw(password):
     return hashlib.sha256(str.encode(password)).hexdigest()
@@ -128,18 +142,10 @@ NOM_FICHIER_CONTACTS = "Permanents-Vacataires-ELT2-2025-2026.xlsx"
 df = None
 repertoire_source = {}
 
-def normalize(s):
-    if not s or s == "Non défini": 
-        return "vide"
-    s = str(s).strip().lower()
-    s = s.replace(" ", "").replace("-", "").replace("–", "")
-    s = s.replace(":00", "").replace("h00", "h")
-    return s
-
 # 1. Chargement du répertoire depuis le fichier Permanent/Vacataires
 if os.path.exists(NOM_FICHIER_CONTACTS):
     try:
-        df_contacts = pd.read_excel(NOM_FICHIER_CONTACTS)
+        df_contacts = lire_excel(NOM_FICHIER_CONTACTS)
         # On nettoie les noms de colonnes au cas où il y aurait des espaces
         df_contacts.columns = [str(c).strip() for c in df_contacts.columns]
         
@@ -154,28 +160,9 @@ if os.path.exists(NOM_FICHIER_CONTACTS):
         st.error(f"Erreur lors de la lecture du fichier contacts: {e}")
 
 # 2. Chargement de l'Emploi du Temps
-if os.path.exists(NOM_FICHIER_FIXE):
-    df = pd.read_excel(NOM_FICHIER_FIXE)
-    df.columns = [str(c).strip() for c in df.columns]
-    
-    colonnes_cles = [
-        'Enseignements', 
-        'Code', 
-        'Enseignants', 
-        'Horaire', 
-        'Jours', 
-        'Lieu', 
-        'Promotion'
-    ]
-    
-    for col in colonnes_cles:
-        if col in df.columns: 
-            df[col] = df[col].fillna("Non défini").astype(str).str.strip()
-        else:
-            df[col] = "Non défini"
-            
-    df['h_norm'] = df['Horaire'].apply(normalize)
-    df['j_norm'] = df['Jours'].apply(normalize)
+# Lu une seule fois par processus et partagé entre les sessions (voir chargement_edt.py) :
+# ne pas modifier df en place, travailler sur une copie.
+df = charger_edt(NOM_FICHIER_FIXE)
 
 # --- SYSTÈME D'AUTH ---
 if "user_data" not in st.session_state:
@@ -189,9 +176,9 @@ if not st.session_state["user_data"]:
         email_input = st.text_input("Adresse Email", key="login_email")
         pass_input = st.text_input("Mot de passe", type="password", key="login_pass")
         if st.button("Se connecter au portail", use_container_width=True):
-            result = supabase.table("enseignants_auth").select("*").eq("email", email_input).eq("password_hash", hash_pw(pass_input)).execute()
-            if result.data:
-                st.session_state["user_data"] = result.data[0]
+            compte = comptes_ens.verifier(email_input, hash_pw(pass_input))
+            if compte:
+                st.session_state["user_data"] = compte
                 st.rerun()
             else:
                 st.error("Email ou mot de passe incorrect.")
@@ -230,25 +217,23 @@ if not st.session_state["user_data"]:
             elif new_pass != confirm_pass:
                 st.error("Les mots de passe ne correspondent pas.")
             else:
-                # Vérifier si l'email existe déjà
-                check = supabase.table("enseignants_auth").select("email").eq("email", new_email).execute()
-                if check.data:
-                    st.error("Cet email est déjà utilisé.")
-                else:
-                    data_ins = {
-                        "nom_officiel": new_nom,
-                        "email": new_email,
-                        "password_hash": hash_pw(new_pass),
-                        "role": "enseignant",
-                        "statut": statut_user,
-                        "telephone": new_phone if statut_user == "Vacataire" else None
-                    }
-                    try:
-                        supabase.table("enseignants_auth").insert(data_ins).execute()
+                data_ins = {
+                    "nom_officiel": new_nom,
+                    "email": new_email,
+                    "password_hash": hash_pw(new_pass),
+                    "role": "enseignant",
+                    "statut": statut_user,
+                    "telephone": new_phone if statut_user == "Vacataire" else None
+                }
+                try:
+                    # Une seule requête : création seulement si l'email est libre
+                    if comptes_ens.enregistrer(data_ins, remplacer=False) is None:
+                        st.error("Cet email est déjà utilisé.")
+                    else:
                         st.success("✅ Compte créé avec succès ! Connectez-vous maintenant.")
                         st.balloons()
-                    except Exception as e:
-                        st.error(f"Erreur Supabase : {e}")
+                except Exception as e:
+                    st.error(f"Erreur Supabase : {e}")
 
     with t_adm:
         code_admin = st.text_input("Code de sécurité Administration", type="password", key="admin_code")
@@ -279,7 +264,9 @@ st.set_page_config(
 # --- CONNEXION BASE DE DONNÉES ---
 URL = st.secrets["SUPABASE_URL"]
 KEY = st.secrets["SUPABASE_KEY"]
-supabase = create_client(URL, KEY)
+supabase = client_supabase(URL, KEY)
+comptes_ens = comptes(supabase, "enseignants_auth")
+definir_page("Connexion")
 
 def hash_pw(password):
     return hashlib.sha256(str.encode(password)).hexdigest()
@@ -384,38 +371,10 @@ st.markdown(f"""
 
 # --- CHARGEMENT DES DONNÉES ---
 NOM_FICHIER_FIXE = "dataEDT-ELT-S2-2026.xlsx"
-df = None
-
-def normalize(s):
-    if not s or s == "Non défini": 
-        return "vide"
-    s = str(s).strip().lower()
-    s = s.replace(" ", "").replace("-", "").replace("–", "")
-    s = s.replace(":00", "").replace("h00", "h")
-    return s
-
-if os.path.exists(NOM_FICHIER_FIXE):
-    df = pd.read_excel(NOM_FICHIER_FIXE)
-    df.columns = [str(c).strip() for c in df.columns]
-    
-    colonnes_cles = [
-        'Enseignements', 
-        'Code', 
-        'Enseignants', 
-        'Horaire', 
-        'Jours', 
-        'Lieu', 
-        'Promotion'
-    ]
-    
-    for col in colonnes_cles:
-        if col in df.columns: 
-            df[col] = df[col].fillna("Non défini").astype(str).str.strip()
-        else:
-            df[col] = "Non défini"
-            
-    df['h_norm'] = df['Horaire'].apply(normalize)
-    df['j_norm'] = df['Jours'].apply(normalize)
+df = charger_edt(NOM_FICHIER_FIXE)
+# Séances codées en entiers (jour, créneau, salle, promotion, enseignants), construit une fois par version
+modele = derive_edt(NOM_FICHIER_FIXE, "modele", ModeleEDT)
+precalcul = precalcul_edt(NOM_FICHIER_FIXE, modele)
 
 # --- SYSTÈME D'AUTH ---
 if "user_data" not in st.session_state:
@@ -429,9 +388,9 @@ if not st.session_state["user_data"]:
         email_input = st.text_input("Adresse Email", key="login_email")
         pass_input = st.text_input("Mot de passe", type="password", key="login_pass")
         if st.button("Se connecter au portail"):
-            result = supabase.table("enseignants_auth").select("*").eq("email", email_input).eq("password_hash", hash_pw(pass_input)).execute()
-            if result.data:
-                st.session_state["user_data"] = result.data[0]
+            compte = comptes_ens.verifier(email_input, hash_pw(pass_input))
+            if compte:
+                st.session_state["user_data"] = compte
                 st.rerun()
             else:
                 st.error("Email ou mot de passe incorrect.")
@@ -452,18 +411,16 @@ if not st.session_state["user_data"]:
             elif new_pass != confirm_pass:
                 st.error("Les mots de passe ne correspondent pas.")
             else:
-                # Vérifier si l'email existe déjà
-                check = supabase.table("enseignants_auth").select("email").eq("email", new_email).execute()
-                if check.data:
+                data_ins = {
+                    "nom_officiel": new_nom,
+                    "email": new_email,
+                    "password_hash": hash_pw(new_pass),
+                    "role": "enseignant"
+                }
+                # Une seule requête : création seulement si l'email est libre
+                if comptes_ens.enregistrer(data_ins, remplacer=False) is None:
                     st.error("Cet email est déjà utilisé.")
                 else:
-                    data_ins = {
-                        "nom_officiel": new_nom,
-                        "email": new_email,
-                        "password_hash": hash_pw(new_pass),
-                        "role": "enseignant"
-                    }
-                    supabase.table("enseignants_auth").insert(data_ins).execute()
                     st.success("✅ Compte créé avec succès ! Vous pouvez maintenant vous connecter.")
                     st.balloons()
 
@@ -489,20 +446,7 @@ if user is None:
 
 is_admin = user.get("role") == "admin"
 
-# 1. Définition précise de votre nouvelle liste d'horaires (14 créneaux)
-horaires_list = [
-    "8h - 9h", "8h - 9h30", "8h - 10h", "9h - 10h", "9h30 - 11h", 
-    "10h - 11h", "11h - 12h", "11h - 12h30", 
-    "12h - 13h", "12h30 - 14h", "13h - 14h", "14h - 15h30", "14h - 16h", "15h30 - 17h"
-]
-
-# 2. Définition des jours de la semaine
-jours_list = ["Dimanche", "Lundi", "Mardi", "Mercredi", "Jeudi"]
-
-# 3. Mapping pour la normalisation (crucial pour faire le lien avec l'Excel)
-# Cela permet de faire correspondre "8h-9h30" (Excel) avec "8h - 9h30" (Affichage)
-map_h = {normalize(h): h for h in horaires_list}
-map_j = {normalize(j): j for j in jours_list}
+# Créneaux et jours des grilles : voir HORAIRES_GRILLE / JOURS_GRILLE (grille_edt.py)
 
 # --- BARRE LATÉRALE ---
 with st.sidebar:
@@ -519,11 +463,17 @@ with st.sidebar:
     
     if portail == "📖 Emploi du Temps":
         if is_admin:
-            mode_view = st.radio("Vue Administration :", ["Promotion", "Enseignant", "🏢 Planning Salles", "🚩 Vérificateur de conflits","✍️ Éditeur de données"])
+            mode_view = st.radio("Vue Administration :", ["Promotion", "Enseignant", "📊 Bilan des charges", "🏢 Planning Salles", "🚩 Vérificateur de conflits","✍️ Éditeur de données"])
         else:
             mode_view = "Personnel"
         poste_sup = st.checkbox("Poste Supérieur (Décharge 3h)")
-        
+    # Allers-retours base de données imputés à la page affichée
+    definir_page(portail if mode_view == "Personnel" else f"{portail} / {mode_view}")
+
+    if is_admin:
+        with st.expander("🗄️ Requêtes base de données"):
+            st.dataframe(mesures(), hide_index=True, use_container_width=True)
+
     if st.button("🚪 Déconnexion du compte"):
         st.session_state["user_data"] = None
         st.rerun()
@@ -531,6 +481,19 @@ if st.button("🚪 Déconnexion du compte"):
         st.session_state["user_data"] = None
         st.rerun()
 
+def charger_df_admin(source, cols_format):
+    # Copie de travail de l'éditeur et index de conflits associé
+    temp_df = source.copy()
+    for col in cols_format:
+        if col not in temp_df.columns:
+            temp_df[col] = ""
+        temp_df[col] = temp_df[col].astype(str).replace(['nan', 'None', '<NA>'], '')
+    st.session_state.df_admin = temp_df
+    # Index de conflits tenu à jour ligne par ligne (voir IndexConflits)
+    st.session_state.index_conflits = IndexConflits(temp_df)
+    st.session_state.pop("suivi_editeur", None)
+    st.session_state.pop("rapport_excel", None)
+
 # --- ESPACE ÉDITEUR AVANCÉ (ADMIN UNIQUEMENT) ---
 if is_admin and mode_view == "✍️ Éditeur de données":
     st.divider()
@@ -540,12 +503,7 @@ if is_admin and mode_view == "✍️ Éditeur de données":
     cols_format = ['Enseignements', 'Code', 'Enseignants', 'Horaire', 'Jours', 'Lieu', 'Promotion', 'Chevauchement']
 
     if 'df_admin' not in st.session_state:
-        temp_df = df.copy()
-        for col in cols_format:
-            if col not in temp_df.columns:
-                temp_df[col] = ""
-            temp_df[col] = temp_df[col].astype(str).replace(['nan', 'None', '<NA>'], '')
-        st.session_state.df_admin = temp_df
+        charger_df_admin(df, cols_format)
 
     # 2. PRÉPARATION DES OPTIONS
     horaires_ref = ["8h - 9h30", "9h30 - 11h", "11h - 12h30", "12h30 - 14h00", "14h00 - 15h30", "15h30 - 17h00"]
@@ -590,18 +548,15 @@ if is_admin and mode_view == "✍️ Éditeur de données":
             submit_add = st.form_submit_button("🔍 Vérifier et Insérer", use_container_width=True)
 
             if submit_add:
-                # 1. Vérification des conflits avec extraction de la promotion concernée
-                conflit_salle = st.session_state.df_admin[
-                    (st.session_state.df_admin['Jours'] == n_jour) & 
-                    (st.session_state.df_admin['Horaire'] == n_horaire) & 
-                    (st.session_state.df_admin['Lieu'] == n_lieu)
-                ]
-                
-                conflit_prof = st.session_state.df_admin[
-                    (st.session_state.df_admin['Jours'] == n_jour) & 
-                    (st.session_state.df_admin['Horaire'] == n_horaire) & 
-                    (st.session_state.df_admin['Enseignants'] == n_prof)
-                ]
+                # 1. Vérification des conflits avec extraction de la promotion concernée :
+                # évaluation de la ligne candidate sur l'index incrémental (séances de la
+                # même salle / du même enseignant le même jour), sans reconstruire de modèle
+                nouvelle = {'Enseignements': n_ensg, 'Code': n_code, 'Enseignants': n_prof, 'Horaire': n_horaire,
+                            'Jours': n_jour, 'Lieu': n_lieu, 'Promotion': n_promo, 'Chevauchement': n_chev}
+                partenaires = st.session_state.index_conflits.partenaires(nouvelle)
+                # Un enseignant est en conflit même s'il co-anime la séance existante ("A & B")
+                conflit_salle = st.session_state.df_admin.loc[[l for t, l in partenaires if t == "Lieu"]]
+                conflit_prof = st.session_state.df_admin.loc[[l for t, l in partenaires if t == "Enseignants"]]
 
                 if not conflit_salle.empty:
                     # On affiche quelle promotion occupe déjà la salle
@@ -617,54 +572,35 @@ if is_admin and mode_view == "✍️ Éditeur de données":
                 
                 else:
                     # 2. Insertion si tout est correct
-                    new_row = pd.DataFrame([{
-                        'Enseignements': n_ensg, 
-                        'Code': n_code, 
-                        'Enseignants': n_prof,
-                        'Horaire': n_horaire, 
-                        'Jours': n_jour, 
-                        'Lieu': n_lieu,
-                        'Promotion': n_promo, 
-                        'Chevauchement': n_chev
-                    }])
-                    st.session_state.df_admin = pd.concat([st.session_state.df_admin, new_row], ignore_index=True)
+                    new_row = pd.DataFrame([nouvelle])
+                    label = st.session_state.df_admin.index.max() + 1
+                    new_row.index = [label]
+                    st.session_state.df_admin = pd.concat([st.session_state.df_admin, new_row])
+                    st.session_state.index_conflits.ajouter(label, new_row.iloc[0])
+                    # Nouvelle génération de l'éditeur pour afficher la ligne ajoutée
+                    st.session_state.pop("suivi_editeur", None)
                     st.success(f"✅ Ligne ajoutée avec succès pour la promotion {n_promo} !")
                     st.rerun()
 
    # --- ÉDITEUR DE TABLEAU ---
+    # Un seul data_editor (l'ancienne version en double a été retirée). Ses deltas
+    # (cellules modifiées, lignes ajoutées/supprimées) sont reportés par étiquette sur
+    # df_admin et sur l'index de conflits : le coût d'une saisie dépend des lignes
+    # touchées, pas de la taille de l'emploi du temps.
     st.markdown("### 📝 Modification des données")
-    edited_df = st.data_editor(
-        df_to_edit[cols_format],
-        use_container_width=True,
-        num_rows="dynamic",
-        key="editor_with_filter_2026",
-        column_config={
-            "Enseignements": st.column_config.TextColumn("📚 Matière"),
-            "Horaire": st.column_config.SelectboxColumn("🕒 Horaire", options=liste_horaires),
-            "Jours": st.column_config.SelectboxColumn("📅 Jours", options=jours_std),
-            "Promotion": st.column_config.SelectboxColumn("🎓 Promotion", options=promos_existantes if promos_existantes else ["M2RE"]),
-            "Chevauchement": st.column_config.TextColumn("⚠️ État Conflit"),
-        }
-    )
 
-    # Synchronisation intelligente (Gère le filtre par prof)
-    if edited_df is not None and not edited_df.equals(df_to_edit[cols_format]):
-        if search_prof:
-            indices_modifies = df_to_edit.index
-            df_others = st.session_state.df_admin.drop(indices_modifies)
-            st.session_state.df_admin = pd.concat([df_others, edited_df], ignore_index=True)
-        else:
-            st.session_state.df_admin = edited_df
+    suivi = st.session_state.get("suivi_editeur")
+    if suivi is None or suivi.filtre != search_prof:
+        generation = st.session_state.get("generation_editeur", 0) + 1
+        st.session_state.generation_editeur = generation
+        suivi = SuiviEditeur(df_to_edit[cols_format].copy(), search_prof, generation)
+        st.session_state.suivi_editeur = suivi
 
-   # --- ÉDITEUR DE TABLEAU (VERSION CORRIGÉE 2026) ---
-    st.markdown("### 📝 Modification des données")
-    
-    # Changement de la clé pour éviter le conflit StreamlitDuplicateElementKey
-    edited_df = st.data_editor(
-        df_to_edit[cols_format],
+    st.data_editor(
+        suivi.base,
         use_container_width=True,
         num_rows="dynamic",
-        key="editor_final_unique_v3", 
+        key=suivi.cle,
         column_config={
             "Enseignements": st.column_config.TextColumn("📚 Matière"),
             "Horaire": st.column_config.SelectboxColumn("🕒 Horaire", options=liste_horaires),
@@ -674,20 +610,18 @@ if is_admin and mode_view == "✍️ Éditeur de données":
         }
     )
 
-    # Synchronisation intelligente
-    if edited_df is not None and not edited_df.equals(df_to_edit[cols_format]):
-        if search_prof:
-            indices_modifies = df_to_edit.index
-            df_others = st.session_state.df_admin.drop(indices_modifies)
-            st.session_state.df_admin = pd.concat([df_others, edited_df], ignore_index=True)
-        else:
-            st.session_state.df_admin = edited_df
+    # Synchronisation incrémentale (gère aussi le filtre par prof : mêmes étiquettes)
+    st.session_state.df_admin = suivi.appliquer(
+        st.session_state.df_admin, st.session_state.index_conflits,
+        st.session_state.get(suivi.cle), cols_format
+    )
+    index_conflits = st.session_state.index_conflits
 
     # --- BLOC D'ANALYSE VISUELLE (STYLE PERSONNALISÉ : SALLE/PROF/PROMO) ---
     st.divider()
     st.markdown("### 🔍 Analyse Visuelle des Chevauchements")
 
-    def afficher_grille_anomalie(df_source, type_tri):
+    def afficher_grille_anomalie(df_source, type_tri, index):
         jours_ordre = ["Dimanche", "Lundi", "Mardi", "Mercredi", "Jeudi"]
         horaires_ordre = [
             "8h - 9h", "8h - 9h30", "8h - 10h", "9h - 10h", "9h30 - 11h", 
@@ -696,21 +630,13 @@ if is_admin and mode_view == "✍️ Éditeur de données":
         ]
         
         grid = pd.DataFrame("", index=horaires_ordre, columns=jours_ordre)
-        df_temp = df_source.copy()
-        
-        def format_horaire(h):
-            h_str = str(h).replace(" ", "").lower()
-            for target in horaires_ordre:
-                if h_str == target.replace(" ", "").lower(): return target
-            return h
-
-        df_temp['Horaire_Normalise'] = df_temp['Horaire'].apply(format_horaire)
-        df_temp['Jours'] = df_temp['Jours'].astype(str).str.strip().str.capitalize()
-
-        # Détection des doublons
-        doublons = df_temp.duplicated(subset=['Jours', 'Horaire_Normalise', type_tri], keep=False)
-        mask_valid = (df_temp[type_tri].astype(str).str.len() > 1) & (df_temp[type_tri].astype(str).str.lower() != "nan")
-        df_conflits = df_temp[doublons & mask_valid].copy()
+
+        # Lignes impliquées dans au moins un chevauchement réel (8h-10h vs 9h30-11h compris)
+        labels = index.lignes_en_conflit(type_tri)
+        seances = [index.seance(l) for l in labels]
+        df_conflits = df_source.loc[labels].copy()
+        df_conflits['Horaire_Normalise'] = [libelle_intervalle(d, f) for _, d, f in seances]
+        df_conflits['Jours'] = [j for j, _, _ in seances]
         
         if not df_conflits.empty:
             for _, row in df_conflits.iterrows():
@@ -747,11 +673,11 @@ if is_admin and mode_view == "✍️ Éditeur de données":
     t_salle, t_prof, t_promo = st.tabs(["🏢 Conflits Salles", "👤 Conflits Enseignants", "🎓 Conflits Promotions"])
     
     with t_salle:
-        afficher_grille_anomalie(st.session_state.df_admin, "Lieu")
+        afficher_grille_anomalie(st.session_state.df_admin, "Lieu", index_conflits)
     with t_prof:
-        afficher_grille_anomalie(st.session_state.df_admin, "Enseignants")
+        afficher_grille_anomalie(st.session_state.df_admin, "Enseignants", index_conflits)
     with t_promo:
-        afficher_grille_anomalie(st.session_state.df_admin, "Promotion")
+        afficher_grille_anomalie(st.session_state.df_admin, "Promotion", index_conflits)
 
     # 4. SAUVEGARDE ET EXPORT AVEC RAPPORT DE CONFLITS DYNAMIQUE
     st.write("---")
@@ -760,7 +686,8 @@ if is_admin and mode_view == "✍️ Éditeur de données":
     with c1:
         if st.button("💾 Enregistrer sur Serveur", type="primary", use_container_width=True):
             try:
-                st.session_state.df_admin[cols_format].to_excel(NOM_FICHIER_FIXE, index=False)
+                enregistrer_edt(st.session_state.df_admin[cols_format], NOM_FICHIER_FIXE)
+                precalcul_edt(NOM_FICHIER_FIXE)
                 st.success("✅ Modifications enregistrées sur le serveur !")
                 st.balloons()
             except Exception as e:
@@ -768,81 +695,43 @@ if is_admin and mode_view == "✍️ Éditeur de données":
 
     with c2:
         if st.button("🔄 Réinitialiser l'éditeur", use_container_width=True):
-            if 'df_admin' in st.session_state:
-                del st.session_state.df_admin
+            for cle in ('df_admin', 'index_conflits', 'suivi_editeur', 'rapport_excel'):
+                st.session_state.pop(cle, None)
             st.rerun()
 
     with c3:
-        import io
-        import re
-        df_complet = st.session_state.df_admin.copy()
-        conflits_list = []
-
-        # 1. Détection des doublons sur les colonnes clés
-        doublons_salle = df_complet.duplicated(subset=['Jours', 'Horaire', 'Lieu'], keep=False) & (df_complet['Lieu'].astype(str).str.len() > 1)
-        doublons_prof = df_complet.duplicated(subset=['Jours', 'Horaire', 'Enseignants'], keep=False) & (df_complet['Enseignants'] != "ND") & (df_complet['Enseignants'] != "")
-        doublons_promo = df_complet.duplicated(subset=['Jours', 'Horaire', 'Promotion'], keep=False) & (df_complet['Promotion'] != "")
-
-        # 2. Construction du rapport ligne par ligne pour garantir l'affichage de la Promotion
-        for i, row in df_complet.iterrows():
-            #--- CONFLIT SALLE ---
-            if doublons_salle[i]:
-                conflits_list.append({
-                    "Type de Conflit": "❌ SALLE OCCUPÉE",
-                    "Promotion": row['Promotion'],
-                    "Intervenant/Salle": row['Lieu'],
-                    "Jour": row['Jours'],
-                    "Horaire": row['Horaire'],
-                    "Détails": f"La salle {row['Lieu']} est réservée par plusieurs groupes."
-                })
-            
-            #--- CONFLIT ENSEIGNANT ---
-            if doublons_prof[i]:
-                conflits_list.append({
-                    "Type de Conflit": "👤 CONFLIT ENSEIGNANT",
-                    "Promotion": row['Promotion'],
-                    "Intervenant/Salle": row['Enseignants'],
-                    "Jour": row['Jours'],
-                    "Horaire": row['Horaire'],
-                    "Détails": f"L'enseignant {row['Enseignants']} a deux cours en même temps."
-                })
-
-            #--- CONFLIT PROMOTION (Chevauchement de cours) ---
-            if doublons_promo[i]:
-                conflits_list.append({
-                    "Type de Conflit": "⚠️ CONFLIT PROMOTION",
-                    "Promotion": row['Promotion'],
-                    "Intervenant/Salle": row['Promotion'],
-                    "Jour": row['Jours'],
-                    "Horaire": row['Horaire'],
-                    "Détails": "Cette promotion a plusieurs enseignements affectés au même créneau."
-                })
-
-        # Création du DataFrame final
-        df_rapport = pd.DataFrame(conflits_list).drop_duplicates()
-
-        # 3. Génération du fichier Excel
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            # Onglet 1 : Emploi du Temps
-            df_complet[cols_format].to_excel(writer, sheet_name='Emploi du Temps', index=False)
-            
-            # Onglet 2 : Rapport des Conflits
-            if not df_rapport.empty:
-                # Disposition demandée : Promotion bien isolée en 2ème colonne
-                colonnes_rapport = ["Type de Conflit", "Promotion", "Intervenant/Salle", "Jour", "Horaire", "Détails"]
-                df_rapport[colonnes_rapport].to_excel(writer, sheet_name='Rapport Conflits', index=False)
-                
-                # Mise en forme (largeur colonnes)
-                worksheet = writer.sheets['Rapport Conflits']
-                for idx, col in enumerate(colonnes_rapport):
-                    worksheet.set_column(idx, idx, 22)
-            else:
-                pd.DataFrame({"Résultat": ["Aucun conflit détecté"]}).to_excel(writer, sheet_name='Rapport Conflits', index=False)
+        # Le classeur n'est régénéré que si l'index a changé depuis le dernier rerun
+        rapport_excel = st.session_state.get("rapport_excel")
+        if rapport_excel is None or rapport_excel[0] != index_conflits.version:
+            df_complet = st.session_state.df_admin
+
+            # 1-2. Rapport issu de l'index incrémental (une ligne par séance en conflit)
+            df_rapport = rapport_conflits(index_conflits.membres(df_complet))
+
+            # 3. Génération du fichier Excel
+            buffer = io.BytesIO()
+            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+                # Onglet 1 : Emploi du Temps
+                df_complet[cols_format].to_excel(writer, sheet_name='Emploi du Temps', index=False)
+
+                # Onglet 2 : Rapport des Conflits
+                if not df_rapport.empty:
+                    # Disposition demandée : Promotion bien isolée en 2ème colonne
+                    colonnes_rapport = ["Type de Conflit", "Promotion", "Intervenant/Salle", "Jour", "Horaire", "Détails"]
+                    df_rapport[colonnes_rapport].to_excel(writer, sheet_name='Rapport Conflits', index=False)
+
+                    # Mise en forme (largeur colonnes)
+                    worksheet = writer.sheets['Rapport Conflits']
+                    for idx, col in enumerate(colonnes_rapport):
+                        worksheet.set_column(idx, idx, 22)
+                else:
+                    pd.DataFrame({"Résultat": ["Aucun conflit détecté"]}).to_excel(writer, sheet_name='Rapport Conflits', index=False)
+            rapport_excel = (index_conflits.version, buffer.getvalue())
+            st.session_state.rapport_excel = rapport_excel
 
         st.download_button(
             label="📥 Télécharger le Rapport d'Erreurs Excel",
-            data=buffer.getvalue(),
+            data=rapport_excel[1],
             file_name=f"Rapport_Conflits_EDT_2026.xlsx",
             mime="application/vnd.ms-excel",
             use_container_width=True
@@ -878,33 +767,23 @@ if df is not None:
             else:
                 cible = st.selectbox("Sélectionner l'Enseignant :", sorted(df["Enseignants"].unique()))
             
-            # Filtrage des données
-            df_f = df[df["Enseignants"].str.contains(cible, case=False, na=False)].copy()
-            
-            # Définition des types pour le calcul
-            df_f['Type'] = df_f['Code'].apply(lambda x: "COURS" if "COURS" in str(x).upper() else ("TD" if "TD" in str(x).upper() else "TP"))
-            df_u = df_f.drop_duplicates(subset=['j_norm', 'h_norm'])
+            # Séances, compteurs et grille précalculés pour chaque enseignant (voir precalcul_edt)
+            artefact = precalcul.enseignant(cible)
             
             # --- 1. CALCUL DES COMPTEURS (NOUVELLE LOGIQUE BILAN DIRECT) ---
-            nb_cours = len(df_u[df_u['Type'] == 'COURS'])
-            nb_td    = len(df_u[df_u['Type'] == 'TD'])
-            nb_tp    = len(df_u[df_u['Type'] == 'TP'])
-
-            # Le seuil réglementaire (3.0 si poste sup, sinon 6.0)
-            seuil_obligatoire = 3.0 if poste_sup else 6.0
-            
-            # Calcul de la charge totale en Équivalent (Cours=1.5, TD/TP=1.0)
-            charge_totale_eq = (nb_cours * 1.5) + (nb_td + nb_tp)
-            
-            # Calcul du bilan (Déficit ou Heures Sup)
-            # Pas de max(0, ...), on veut garder le signe négatif si nécessaire
-            delta_eq = charge_totale_eq - seuil_obligatoire
-            
-            # Conversion du delta en HEURES RÉELLES (1 unité eq = 1.5h réelle)
-            h_sup = delta_eq * 1.5
-            
-            # Charge effective enseignée (Nombre total de séances * 1.5h)
-            charge_effective = (nb_cours + nb_td + nb_tp) * 1.5
+            # Une séance par (jour, horaire) : Cours / TD / TP d'après le Code
+            nb_cours = artefact['nb_cours']
+            nb_td    = artefact['nb_td']
+            nb_tp    = artefact['nb_tp']
+
+            # Seuil (3.0 si poste sup, sinon 6.0), charge en équivalent (Cours=1.5, TD/TP=1.0),
+            # delta signé et heures réelles : règles communes avec le tableau du département
+            bilan = bilan_horaire(nb_cours, nb_td, nb_tp, poste_sup)
+            seuil_obligatoire = bilan["seuil"]
+            charge_totale_eq = bilan["charge_totale_eq"]
+            delta_eq = bilan["delta_eq"]
+            h_sup = bilan["h_sup"]
+            charge_effective = bilan["charge_effective"]
 
             # --- 2. AFFICHAGE DES MÉTRIQUES (STYLE PLATEFORME 2026) ---
             st.markdown(f"### 📊 Bilan Horaire : {cible}")
@@ -947,151 +826,83 @@ if df is not None:
             st.divider()
             st.markdown("### 📅 Emploi du Temps Individuel")
 
-            def format_case(rows):
-                items = []
-                for _, r in rows.iterrows():
-                    # Disposition : Enseignements, Code, Lieu, Promotion
-                    nat = '📘' if 'COURS' in str(r['Code']).upper() else '📗' if 'TD' in str(r['Code']).upper() else '🔴'
-                    txt = f"<div style='margin-bottom:8px;'>{nat} <b>{r['Enseignements']}</b><br><small>({r['Code']})</small><br><i>{r['Lieu']}</i><br><b>{r['Promotion']}</b></div>"
-                    items.append(txt)
-                return "<div class='separator'></div>".join(items)
-
-            if not df_f.empty:
-                grid = df_f.groupby(['h_norm', 'j_norm']).apply(format_case, include_groups=False).unstack('j_norm')
-                grid = grid.reindex(index=[normalize(h) for h in horaires_list], columns=[normalize(j) for j in jours_list]).fillna("")
-                grid.index = [map_h.get(i, i) for i in grid.index]
-                grid.columns = [map_j.get(c, c) for c in grid.columns]
-                st.write(grid.to_html(escape=False), unsafe_allow_html=True)
+            if len(artefact['positions']):
+                st.write(artefact['html'], unsafe_allow_html=True)
             else:
                 st.warning("Aucune donnée trouvée pour l'emploi du temps.")
 
         elif is_admin and mode_view == "Promotion":
-            p_sel = st.selectbox("Choisir Promotion :", sorted(df["Promotion"].unique()))
-            df_p = df[df["Promotion"] == p_sel]
-            
-            def fmt_p(rows):
-                items = []
-                for _, r in rows.iterrows():
-                    nat = '📘' if 'COURS' in str(r['Code']).upper() else '📗' if 'TD' in str(r['Code']).upper() else '🔴'
-                    items.append(f"<b>{nat} {r['Enseignements']}</b><br>{r['Enseignants']}<br><i>{r['Lieu']}</i>")
-                return "<div class='separator'></div>".join(items)
-                
-            grid_p = df_p.groupby(['h_norm', 'j_norm']).apply(fmt_p, include_groups=False).unstack('j_norm')
-            grid_p = grid_p.reindex(index=[normalize(h) for h in horaires_list], columns=[normalize(j) for j in jours_list]).fillna("")
-            grid_p.index = horaires_list
-            grid_p.columns = jours_list
-            st.write(grid_p.to_html(escape=False), unsafe_allow_html=True)
+            p_sel = st.selectbox("Choisir Promotion :", sorted(modele.promotions))
+            st.write(precalcul.promotion(p_sel)['html'], unsafe_allow_html=True)
+
+        elif is_admin and mode_view == "📊 Bilan des charges":
+            st.subheader("📊 Bilan Horaire du Département")
+            # Compteurs de tous les enseignants calculés une fois par version de l'EDT ;
+            # le bilan ne dépend ensuite que de la liste des postes supérieurs
+            charges = derive_edt(
+                NOM_FICHIER_FIXE, "charges", lambda d: charges_enseignants(d, modele.index_enseignants)
+            )
+            postes_sup = st.multiselect(
+                "Enseignants en poste supérieur (seuil 3.0 eq/h) :", list(charges["Enseignant"]),
+                key="postes_sup"
+            )
+            df_bilan = bilan_enseignants(charges, postes_sup)
 
-        elif is_admin and mode_view == "🏢 Planning Salles":
-            s_sel = st.selectbox("Choisir Salle :", sorted(df["Lieu"].unique()))
-            df_s = df[df["Lieu"] == s_sel]
-            
-            def fmt_s(rows):
-                items = [f"<b>{r['Promotion']}</b><br>{r['Enseignements']}<br><i>{r['Enseignants']}</i>" for _, r in rows.iterrows()]
-                return "<div class='separator'></div>".join(items)
-                
-            grid_s = df_s.groupby(['h_norm', 'j_norm']).apply(fmt_s, include_groups=False).unstack('j_norm')
-            grid_s = grid_s.reindex(index=[normalize(h) for h in horaires_list], columns=[normalize(j) for j in jours_list]).fillna("")
-            grid_s.index = horaires_list
-            grid_s.columns = jours_list
-            st.write(grid_s.to_html(escape=False), unsafe_allow_html=True)
-        elif is_admin and mode_view == "Promotion":
-            p_sel = st.selectbox("Choisir Promotion :", sorted(df["Promotion"].unique()))
-            df_p = df[df["Promotion"] == p_sel]
-            
-            def fmt_p(rows):
-                items = []
-                for _, r in rows.iterrows():
-                    nat = '📘 COURS' if 'COURS' in str(r['Code']).upper() else '📗 TD' if 'TD' in str(r['Code']).upper() else '🔴 TP'
-                    items.append(f"<b>{nat} : {r['Enseignements']}</b><br>{r['Enseignants']}<br><i>{r['Lieu']}</i>")
-                return "<div class='separator'></div>".join(items)
-                
-            grid_p = df_p.groupby(['h_norm', 'j_norm']).apply(fmt_p, include_groups=False).unstack('j_norm')
-            grid_p = grid_p.reindex(index=[normalize(h) for h in horaires_list], columns=[normalize(j) for j in jours_list]).fillna("")
-            grid_p.index = horaires_list
-            grid_p.columns = jours_list
-            st.write(grid_p.to_html(escape=False), unsafe_allow_html=True)
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Enseignants", len(df_bilan))
+            c2.metric("Heures Sup. (total)", f"{round(df_bilan['H. sup. (h)'].clip(lower=0).sum(), 2)} h")
+            c3.metric("En sous-charge", int((df_bilan["H. sup. (h)"] < 0).sum()))
+
+            # Tri par clic sur l'en-tête de colonne
+            st.dataframe(
+                df_bilan.sort_values("H. sup. (h)", ascending=False),
+                use_container_width=True, hide_index=True
+            )
+
+            buf_bilan = io.BytesIO()
+            with pd.ExcelWriter(buf_bilan, engine='xlsxwriter') as writer:
+                df_bilan.to_excel(writer, index=False, sheet_name='Bilan Horaire')
+                writer.sheets['Bilan Horaire'].set_column(0, 0, 25)
+                writer.sheets['Bilan Horaire'].set_column(1, len(df_bilan.columns) - 1, 16)
+            st.download_button(
+                label="📥 Télécharger le Bilan Horaire (Excel)",
+                data=buf_bilan.getvalue(),
+                file_name="Bilan_Horaire_ELT_2026.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
+
+            # Registre détaillé (une feuille par statut / grade) : écrit en flux, seulement au clic
+            def fichier_registre():
+                sortie = io.BytesIO()
+                staff = lire_excel(NOM_FICHIER_CONTACTS) if os.path.exists(NOM_FICHIER_CONTACTS) else None
+                registre_heures(sortie, modele, df_bilan, staff)
+                return sortie
+
+            st.download_button(
+                label="📒 Télécharger le Registre des Heures (par grade)",
+                data=fichier_registre,
+                file_name="Registre_Heures_ELT_2026.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
 
         elif is_admin and mode_view == "🏢 Planning Salles":
-            s_sel = st.selectbox("Choisir Salle :", sorted(df["Lieu"].unique()))
-            df_s = df[df["Lieu"] == s_sel]
-            
-            def fmt_s(rows):
-                items = [f"<b>{r['Promotion']}</b><br>{r['Enseignements']}<br><i>{r['Enseignants']}</i>" for _, r in rows.iterrows()]
-                return "<div class='separator'></div>".join(items)
-                
-            grid_s = df_s.groupby(['h_norm', 'j_norm']).apply(fmt_s, include_groups=False).unstack('j_norm')
-            grid_s = grid_s.reindex(index=[normalize(h) for h in horaires_list], columns=[normalize(j) for j in jours_list]).fillna("")
-            grid_s.index = horaires_list
-            grid_s.columns = jours_list
-            st.write(grid_s.to_html(escape=False), unsafe_allow_html=True)
+            s_sel = st.selectbox("Choisir Salle :", sorted(modele.salles))
+            st.write(precalcul.salle(s_sel)['html'], unsafe_allow_html=True)
 
         elif is_admin and mode_view == "🚩 Vérificateur de conflits":
             st.subheader("🚩 Analyse des Conflits Individuels")
             st.markdown("---")
             
-            errs_text = []      
-            errs_for_df = []    
-            
             # --- 1. DÉTECTION DES CONFLITS (ENSEIGNANTS, SALLES ET PROMOS) ---
-            errs_text = []      
-            errs_for_df = []    
-
-            # A. CONFLITS D'ENSEIGNANTS (Un prof ne peut pas être à 2 lieux/matières)
-            p_groups = df[df["Enseignants"] != "Non défini"].groupby(['Jours', 'Horaire', 'Enseignants'])
-            for (jour, horaire, prof), group in p_groups:
-                lieux_uniques = group['Lieu'].unique()
-                matieres_uniques = group['Enseignements'].unique()
-                if len(lieux_uniques) > 1 or len(matieres_uniques) > 1:
-                    type_err = "❌ CONFLIT ENSEIGNANT"
-                    style = "error"
-                    detail = f"L'enseignant est affecté à plusieurs lieux ({', '.join(lieux_uniques)}) ou matières."
-                    
-                    msg = f"**{type_err}** : {prof} | {jour} {horaire}"
-                    errs_text.append((style, msg))
-                    errs_for_df.append({
-                        "Type": type_err, "Enseignant": prof, "Jour": jour, "Horaire": horaire, 
-                        "Détail": detail, "Lieu": ", ".join(lieux_uniques), 
-                        "Matières": ", ".join(matieres_uniques), "Promotions": ", ".join(group['Promotion'].unique())
-                    })
-
-            # B. CONFLITS DE SALLES (Deux profs différents dans la même salle) -> RÉSOUT VOTRE PROBLÈME
-            s_groups = df[(df["Lieu"] != "Non défini") & (df["Lieu"] != "A distance")].groupby(['Jours', 'Horaire', 'Lieu'])
-            for (jour, horaire, lieu), group in s_groups:
-                if len(group['Enseignants'].unique()) > 1:
-                    type_err = "❌ CONFLIT SALLE OCCUPÉE"
-                    style = "error"
-                    profs_concernees = group['Enseignants'].unique()
-                    detail = f"La salle '{lieu}' est utilisée par : {', '.join(profs_concernees)}"
-                    
-                    msg = f"**{type_err}** : {lieu} | {jour} {horaire} ({', '.join(profs_concernees)})"
-                    errs_text.append((style, msg))
-                    
-                    # On ajoute l'erreur pour chaque enseignant impliqué pour qu'ils la voient dans leur filtre
-                    for p in profs_concernees:
-                        errs_for_df.append({
-                            "Type": type_err, "Enseignant": p, "Jour": jour, "Horaire": horaire, 
-                            "Détail": detail, "Lieu": lieu, 
-                            "Matières": ", ".join(group['Enseignements'].unique()), 
-                            "Promotions": ", ".join(group['Promotion'].unique())
-                        })
-
-            # C. CONFLITS DE PROMOTION (Une classe ne peut pas avoir deux cours en même temps)
-            pr_groups = df[df["Promotion"] != "Non défini"].groupby(['Jours', 'Horaire', 'Promotion'])
-            for (jour, horaire, promo), group in pr_groups:
-                if len(group['Enseignements'].unique()) > 1:
-                    type_err = "⚠️ CONFLIT PROMOTION"
-                    style = "warning"
-                    matieres = group['Enseignements'].unique()
-                    detail = f"La promotion {promo} a plusieurs cours simultanés : {', '.join(matieres)}"
-                    
-                    msg = f"**{type_err}** : {promo} | {jour} {horaire}"
-                    errs_text.append((style, msg))
-                    errs_for_df.append({
-                        "Type": type_err, "Enseignant": "Multi-enseignants", "Jour": jour, "Horaire": horaire, 
-                        "Détail": detail, "Lieu": ", ".join(group['Lieu'].unique()), 
-                        "Matières": ", ".join(matieres), "Promotions": promo
-                    })
+            # Une seule passe vectorisée pour les trois types, calculée une fois par version
+            # du fichier. Un prof ne peut pas être à 2 lieux/matières, une salle n'accueille
+            # qu'une équipe, une promotion n'a qu'un cours à la fois (chevauchements compris).
+            groupes_conflits, membres_conflits = derive_edt(
+                NOM_FICHIER_FIXE, "conflits", lambda d: analyser_conflits(d, modele)
+            )
+            errs_text, errs_for_df = fiches_conflits(groupes_conflits, membres_conflits)
 
             # --- 2. INTERFACE DE FILTRAGE ET BOUTON RESET ---
             if errs_for_df:
@@ -1160,8 +971,8 @@ if df is not None:
                 st.subheader("💡 Assistant de Résolution Intelligent")
                 st.info("L'assistant propose des créneaux libres (Horaire + Salle) en respectant le type de lieu initial.")
 
-                # On récupère la liste de tous les lieux possibles à partir du fichier
-                tous_les_lieux = sorted([l for l in df['Lieu'].unique() if str(l) != "nan" and l != "Non défini"])
+                # Occupation des salles et enseignants par (jour, créneau), une fois par version
+                occupation = derive_edt(NOM_FICHIER_FIXE, "occupation", lambda d: IndexOccupation(d, modele))
                 
                 solutions_finales = []
 
@@ -1175,48 +986,9 @@ if df is not None:
                             st.caption(f"Matières impliquées : {cp.get('Matières', 'N/A')}")
                         
                         with c2:
-                            # 1. ANALYSE DU TYPE DE LIEU INITIAL
-                            lieu_initial = str(cp['Lieu']).upper()
-                            
-                            # Détermination intelligente du type (Labo, Amphi, ou Salle)
-                            est_tp = any(keyword in lieu_initial for keyword in ["LABO", "TP", "ATELIER", "CC", "MICRO"])
-                            est_amphi = "AMPHI" in lieu_initial or "A0" in lieu_initial
-                            
-                            # 2. FILTRAGE DES LIEUX DU MÊME GENRE UNIQUEMENT
-                            lieux_compatibles = []
-                            for l in tous_les_lieux:
-                                l_str = str(l).upper()
-                                if est_tp and any(k in l_str for k in ["LABO", "TP", "CC", "MICRO"]):
-                                    lieux_compatibles.append(l)
-                                elif est_amphi and ("AMPHI" in l_str or "A0" in l_str):
-                                    lieux_compatibles.append(l)
-                                elif not est_tp and not est_amphi and ("S" in l_str or "SALLE" in l_str):
-                                    lieux_compatibles.append(l)
-
-                            # 3. RECHERCHE DE CRÉNEAUX ET LIEUX DISPONIBLES (Même Jour)
-                            tous_horaires = ["8h - 9h30", "9h30 - 11h", "11h - 12h30", "12h30 - 14h", "14h - 15h30", "15h30 - 17h"]
-                            suggestions_valides = []
-                            
-                            for hor in tous_horaires:
-                                # A. Vérifier si l'ENSEIGNANT est libre à cette heure 'hor' ce jour-là
-                                # (On ignore la vérification pour "ND" car c'est un placeholder multi-profs)
-                                prof_occupe = False
-                                if cp['Enseignant'] not in ["ND", "Multi-enseignants"]:
-                                    prof_occupe = not df[(df['Jours'] == cp['Jour']) & 
-                                                         (df['Horaire'] == hor) & 
-                                                         (df['Enseignants'] == cp['Enseignant'])].empty
-                                
-                                if not prof_occupe:
-                                    # B. Vérifier quels LIEUX COMPATIBLES sont libres à cette heure 'hor'
-                                    lieux_occupes = df[(df['Jours'] == cp['Jour']) & 
-                                                       (df['Horaire'] == hor)]['Lieu'].unique()
-                                    
-                                    libres = [l for l in lieux_compatibles if l not in lieux_occupes]
-                                    
-                                    for salle_libre in libres:
-                                        # Éviter de proposer l'option qui est déjà en conflit
-                                        if not (hor == cp['Horaire'] and salle_libre in cp['Lieu']):
-                                            suggestions_valides.append(f"{hor} en {salle_libre}")
+                            # 1-2. Type du lieu initial (Labo, Amphi ou Salle) et lieux du même genre
+                            # 3. Créneaux du même jour où l'enseignant et une salle compatible sont libres
+                            suggestions_valides = occupation.suggestions(cp['Jour'], cp['Enseignant'], cp['Horaire'], cp['Lieu'])
 
                             # 4. SÉLECTEUR DE SOLUTION
                             choix_sol = st.selectbox(
@@ -1276,13 +1048,58 @@ if df is not None:
 
                 st.caption("ℹ️ Utilisez ce fichier Excel pour appliquer les corrections dans l'Éditeur de données.")
 
+                # --- 7. RÉPARATION AUTOMATIQUE (CORRECTIONS COHÉRENTES ENTRE ELLES) ---
+                st.divider()
+                st.markdown("### 🛠️ Réparation automatique")
+                st.info("Le moteur cherche un ensemble de déplacements compatibles entre eux (salle, puis créneau, puis jour) "
+                        "qui supprime un maximum de conflits avec un minimum de changements.")
+
+                budget_rep = st.slider("⏱️ Budget de calcul (secondes)", 5, 120, 30, key="budget_reparation")
+                tache_rep = st.session_state.get("reparation_en_cours")
+                if st.button("🚀 Lancer la réparation", use_container_width=True,
+                             disabled=tache_rep is not None and not tache_rep.termine()):
+                    # Recherche dans un thread : le script rend la main, le suivi lit l'avancement
+                    tache_rep = ReparationFond(df, budget_rep, version=version_edt(NOM_FICHIER_FIXE))
+                    st.session_state.reparation_en_cours = tache_rep
+
+                # Avancement rafraîchi chaque seconde tant que la recherche tourne
+                @st.fragment(run_every=1 if tache_rep is not None and not tache_rep.termine() else None)
+                def suivi_reparation():
+                    tache = st.session_state.get("reparation_en_cours")
+                    if tache is None:
+                        return
+                    if not tache.termine():
+                        st.progress(tache.fraction, text=tache.message)
+                        if st.button("⏹️ Arrêter (garder la meilleure solution)", key="arreter_reparation"):
+                            tache.arreter()
+                        return
+                    del st.session_state.reparation_en_cours
+                    if tache.erreur is not None:
+                        st.error(f"❌ Réparation interrompue : {tache.erreur}")
+                        return
+                    st.session_state.reparation_edt = (tache.version, tache.resultat)
+                    # Résultat prêt : affiché par le script complet
+                    st.rerun(scope="app")
+
+                suivi_reparation()
+
+                reparation = st.session_state.get("reparation_edt")
+                if reparation is not None and reparation[0] == version_edt(NOM_FICHIER_FIXE):
+                    resultat = reparation[1]
+                    st.success(f"Conflits : {resultat.conflits_avant} → {resultat.conflits_apres} "
+                               f"({len(resultat.deplacements)} séance(s) déplacée(s) en {resultat.duree:.0f} s)")
+                    st.dataframe(resultat.deplacements, use_container_width=True)
+                    if st.button("✍️ Charger l'EDT corrigé dans l'éditeur", type="primary", use_container_width=True):
+                        charger_df_admin(resultat.df, ['Enseignements', 'Code', 'Enseignants', 'Horaire', 'Jours', 'Lieu', 'Promotion', 'Chevauchement'])
+                        st.success("✅ EDT corrigé chargé : vérifiez-le dans « ✍️ Éditeur de données » puis enregistrez.")
+
             else:
                 st.success("✅ Félicitations ! Aucun conflit détecté dans l'emploi du temps actuel.")
                 st.balloons()
     elif portail == "📅 Surveillances Examens":
         FILE_S = "surveillances_2026.xlsx"
         if os.path.exists(FILE_S):
-            df_surv = pd.read_excel(FILE_S)
+            df_surv = lire_excel(FILE_S)
             df_surv.columns = [str(c).strip() for c in df_surv.columns]
             df_surv['Date_Tri'] = pd.to_datetime(df_surv['Date'], dayfirst=True, errors='coerce')
             
@@ -1354,7 +1171,7 @@ if df is not None:
 
             SRC = "surveillances_2026.xlsx"
             if os.path.exists(SRC):
-                df_src = pd.read_excel(SRC)
+                df_src = lire_excel(SRC)
                 df_src.columns = [str(c).strip() for c in df_src.columns]
                 for c in df_src.columns: df_src[c] = df_src[c].fillna("").astype(str).str.strip()
                 
@@ -1411,11 +1228,22 @@ if df is not None:
             st.write("Plateforme de gestion des emplois du temps 2026-Département d'Électrotechnique-Faculté de génie électrique-UDL-SBA")
 
         # 1. RÉCUPÉRATION DES DONNÉES (Supabase + Répertoire Source Excel)
-        res_auth = supabase.table("enseignants_auth").select("nom_officiel, email, last_sent").execute()
+        # Statuts last_sent notés par le worker mais pas encore publiés : lus dans le tampon
+        # local de la file d'envoi ; publiés ici si le worker n'a pas pu le faire
+        with closing(connecter()) as conn:
+            if not worker_actif(conn):
+                try:
+                    publier_statuts(conn, lambda emails, last_sent: comptes_ens.modifier({"last_sent": last_sent}, emails))
+                except Exception as e:
+                    st.warning(f"⚠️ Statuts d'envoi non synchronisés (nouvel essai au prochain affichage) : {e}")
+            # Publiés ou non : le cache des comptes peut ignorer un last_sent publié par le worker
+            envois_locaux = statuts_envoyes(conn)
+
+        # Comptes lus à travers le cache du processus (une lecture complète par période)
         dict_auth = {str(row['nom_officiel']).strip().upper(): {
             "email": row['email'], 
-            "statut": "✅ Envoyé" if row['last_sent'] else "⏳ En attente"
-        } for row in res_auth.data} if res_auth.data else {}
+            "statut": "✅ Envoyé" if row.get('last_sent') or row['email'] in envois_locaux else "⏳ En attente"
+        } for row in comptes_ens.tous()}
 
         noms_excel = sorted([e for e in df['Enseignants'].unique() if str(e) not in ["Non défini", "nan", ""]])
         
@@ -1440,124 +1268,88 @@ if df is not None:
                 "État d'envoi": etat
             })
 
+        # Envois : une tâche par enseignant dans la file SQLite locale, vidée par un processus
+        # séparé (voir file_envoi.py) : un rerun ou un redémarrage n'interrompt plus rien.
+        # SMTP_HOST / SMTP_PORT / SMTP_STARTTLS (secrets) permettent de viser un serveur de test local.
+        def env_worker():
+            env = {"EMAIL_USER": st.secrets["EMAIL_USER"], "EMAIL_PASS": st.secrets["EMAIL_PASS"],
+                   "SUPABASE_URL": URL, "SUPABASE_KEY": KEY}
+            for cle in ("SMTP_HOST", "SMTP_PORT", "SMTP_STARTTLS"):
+                if cle in st.secrets:
+                    env[cle] = st.secrets[cle]
+            return env
+
+        def envoyer_edt(destinataires):
+            """Enfile l'EDT de chaque ligne (Enseignant, Email) et démarre le worker."""
+            # last_sent n'est mis à jour que pour les inscrits Supabase
+            taches = [{**row, "marquer": row["État d'envoi"] == "⏳ En attente"} for row in destinataires]
+            with closing(connecter()) as conn:
+                lot, enfiles, ignores = enfiler(conn, taches, version_edt(NOM_FICHIER_FIXE))
+            lancer_worker(env_worker(), chemin_edt=NOM_FICHIER_FIXE)
+            st.session_state.lot_envoi = lot
+            if ignores:
+                st.info(f"ℹ️ {ignores} enseignant(s) ont déjà reçu (ou vont recevoir) cette version de l'EDT.")
+            return enfiles
+
+        with closing(connecter()) as conn:
+            envoi_actif = worker_actif(conn)
+
+        # Avancement du dernier lot, rafraîchi toutes les 2 s tant que le worker tourne
+        @st.fragment(run_every=2 if envoi_actif else None)
+        def suivi_envois():
+            with closing(connecter()) as conn:
+                lot = st.session_state.get("lot_envoi") or dernier_lot(conn)
+                if not lot:
+                    return
+                comptes = avancement(conn, lot)
+                ratees = echecs(conn, lot)
+                actif = worker_actif(conn)
+            total = sum(comptes.values())
+            restants = comptes[EN_ATTENTE] + comptes[EN_COURS]
+            st.progress(
+                (total - restants) / total if total else 1.0,
+                text=f"📤 Dernier envoi : {comptes[ENVOYE]} envoyé(s), {comptes[ECHEC]} échec(s), {restants} en attente"
+            )
+            for r in ratees:
+                if r['etat'] == INCERTAIN:
+                    # Coupure après transmission : pas de renvoi automatique (risque de doublon)
+                    st.warning(f"❓ {r['enseignant']} ({r['email']}) : connexion coupée après l'envoi du message, "
+                               f"réception non confirmée ({r['erreur']})")
+                else:
+                    st.error(f"❌ {r['enseignant']} ({r['email']}) : {r['erreur']} après {r['tentatives']} tentative(s)")
+            if restants and not actif:
+                st.warning("⏸️ Des envois sont restés en attente (application redémarrée ?).")
+                if st.button("▶️ Reprendre les envois", key="reprendre_envois"):
+                    lancer_worker(env_worker(), chemin_edt=NOM_FICHIER_FIXE)
+                    st.rerun()
+            elif envoi_actif and not actif:
+                # Lot terminé : rafraîchit les statuts et arrête le suivi
+                st.rerun(scope="app")
+
+        suivi_envois()
+
         # 2. BOUTONS D'ACTION
         c1, c2 = st.columns(2)
         with c1:
             if st.button("🔄 Réinitialiser les statuts (Comptes)", use_container_width=True):
-                supabase.table("enseignants_auth").update({"last_sent": None}).neq("email", "").execute()
+                comptes_ens.modifier({"last_sent": None})
+                # Les envois déjà faits peuvent de nouveau être programmés
+                with closing(connecter()) as conn:
+                    oublier_envois(conn)
                 st.success("✅ Statuts réinitialisés !")
                 st.rerun()
         
         with c2:
             if st.button("🚀 Lancer l'envoi groupé", type="primary", use_container_width=True):
-                import smtplib
-                import io
-                import os
-                import pandas as pd
-                from email.mime.text import MIMEText
-                from email.mime.multipart import MIMEMultipart
-                from email.mime.base import MIMEBase
-                from email import encoders
-                from datetime import datetime
-
+                # On envoie si le mail est présent et l'état est "En attente" ou "Dispo Source"
+                destinataires = [
+                    row for row in donnees_finales
+                    if row["État d'envoi"] in ["⏳ En attente", "🟡 Dispo (Source Excel)"] and "@" in str(row["Email"])
+                ]
                 try:
-                    server = smtplib.SMTP('smtp.gmail.com', 587)
-                    server.starttls()
-                    server.login(st.secrets["EMAIL_USER"], st.secrets["EMAIL_PASS"])
-                    
-                    for row in donnees_finales:
-                        # On envoie si le mail est présent et l'état est "En attente" ou "Dispo Source"
-                        if (row["État d'envoi"] in ["⏳ En attente", "🟡 Dispo (Source Excel)"]) and "@" in str(row["Email"]):
-                            
-                            # 1. FILTRAGE ET CALCULS
-                            nom_cible = str(row['Enseignant']).strip().upper()
-                            # Filtrage qui inclut les noms composés (comme FETHIMILOUA)
-                            df_perso = df[df["Enseignants"].astype(str).str.upper().str.contains(nom_cible, na=False)]
-                            df_mail = df_perso[['Enseignements', 'Code', 'Enseignants', 'Horaire', 'Jours', 'Lieu', 'Promotion']]
-                            
-                            nb_cours = df_mail['Enseignements'].str.contains('Cours', case=False).sum()
-                            nb_td = df_mail['Enseignements'].str.contains('TD', case=False).sum()
-                            nb_tp = df_mail['Enseignements'].str.contains('TP', case=False).sum()
-
-                            msg = MIMEMultipart()
-                            msg['Subject'] = f"Votre Emploi du Temps S2-2026 - {row['Enseignant']}"
-                            msg['From'] = st.secrets["EMAIL_USER"]
-                            msg['To'] = row["Email"]
-                            
-                            # 2. CORPS DU MESSAGE (Structure identique à l'individuel)
-                            corps_html = f"""
-                            <html>
-                            <body style="font-family: Arial, sans-serif; line-height: 1.6;">
-                                <h2 style="color: #1E3A8A;">Plateforme de gestion des EDTs-S2-2026-Département d'Électrotechnique-Faculté de génie électrique-UDL-SBA</h2>
-                                <p>Sallem M./Mme <b>{row['Enseignant']}</b>,</p>
-                                
-                                <div style="background-color: #f8f9fa; padding: 10px; border: 1px solid #dee2e6; border-radius: 5px; margin-bottom: 15px;">
-                                    <b>📊 Récapitulatif de votre charge (S2-2026) :</b><br>
-                                    <ul>
-                                        <li>Nombre de Cours : <b>{nb_cours}</b></li>
-                                        <li>Nombre de TD : <b>{nb_td}</b></li>
-                                        <li>Nombre de TP : <b>{nb_tp}</b></li>
-                                    </ul>
-                                </div>
-
-                                <div style="background-color: #fff4e5; border-left: 5px solid #ffa500; padding: 15px; margin: 20px 0; font-style: italic;">
-                                    <p>J'ai été chargé en tant que représentant des responsables des équipes de formation, en concertation avec le chef de département et le vice doyen chargé de la graduation, de coordonner l'élaboration de ces emplois du temps.</p>
-                                    <p>Je vous prie de bien vouloir nous signaler une éventuelle anomalie. Merci de nous renseigner le fichier Excel corrigé, au cas où tout est bon merci de nous envoyer <b>RAS</b>.</p>
-                                </div>
-
-                                {df_mail.to_html(index=False, border=1, justify='center')}
-
-                                <p><br>Cordialement.<br>---<br><b>Service d'enseignement du département d'électrotechnique.</b></p>
-                            </body>
-                            </html>
-                            """
-                            msg.attach(MIMEText(corps_html, 'html'))
-
-                            # 3. GÉNÉRATION DE L'EXCEL COLORÉ ET FILTRÉ (En mémoire)
-                            buffer = io.BytesIO()
-                            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                                df_mail.to_excel(writer, index=False, sheet_name='Mon EDT')
-                                workbook = writer.book
-                                worksheet = writer.sheets['Mon EDT']
-
-                                # Formats
-                                fmt_cours = workbook.add_format({'bg_color': '#D9EAD3', 'border': 1})
-                                fmt_td = workbook.add_format({'bg_color': '#FFF2CC', 'border': 1})
-                                fmt_tp = workbook.add_format({'bg_color': '#F4CCCC', 'border': 1})
-                                fmt_header = workbook.add_format({'bold': True, 'bg_color': '#4472C4', 'font_color': 'white', 'border': 1})
-
-                                for col_num, value in enumerate(df_mail.columns.values):
-                                    worksheet.write(0, col_num, value, fmt_header)
-
-                                for i, enseignement in enumerate(df_mail['Enseignements']):
-                                    current_fmt = None
-                                    if 'Cours' in str(enseignement): current_fmt = fmt_cours
-                                    elif 'TD' in str(enseignement): current_fmt = fmt_td
-                                    elif 'TP' in str(enseignement): current_fmt = fmt_tp
-                                    if current_fmt: worksheet.set_row(i + 1, None, current_fmt)
-                                
-                                worksheet.set_column('A:G', 20)
-                            
-                            buffer.seek(0)
-                            part = MIMEBase('application', 'vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-                            part.set_payload(buffer.read())
-                            encoders.encode_base64(part)
-                            part.add_header('Content-Disposition', f'attachment; filename="EDT_S2_2026_{row["Enseignant"]}.xlsx"')
-                            msg.attach(part)
-                            
-                            # 4. ENVOI ET MISE À JOUR
-                            server.send_message(msg)
-                            
-                            # Si c'est un inscrit Supabase, on met à jour la date
-                            if row["État d'envoi"] == "⏳ En attente":
-                                supabase.table("enseignants_auth").update({
-                                    "last_sent": datetime.now().isoformat()
-                                }).eq("email", row["Email"]).execute()
-                    
-                    server.quit()
-                    st.success("✅ Envoi groupé terminé ! Chaque enseignant a reçu son Excel personnalisé.")
-                    st.rerun()
-
+                    if envoyer_edt(destinataires):
+                        st.success("✅ Envoi groupé programmé ! Chaque enseignant recevra son Excel personnalisé.")
+                        st.rerun()
                 except Exception as e:
                     st.error(f"Erreur lors de l'envoi groupé : {e}")
         # 3. AFFICHAGE DU TABLEAU RECAPITULATIF
@@ -1600,94 +1392,10 @@ if df is not None:
                 if not selection:
                     st.warning("Veuillez sélectionner au moins un enseignant.")
                 else:
-                    import smtplib, io, pandas as pd
-                    from email.mime.text import MIMEText
-                    from email.mime.multipart import MIMEMultipart
-                    from email.mime.base import MIMEBase
-                    from email import encoders
-                    from datetime import datetime
-
                     try:
-                        server = smtplib.SMTP('smtp.gmail.com', 587)
-                        server.starttls()
-                        server.login(st.secrets["EMAIL_USER"], st.secrets["EMAIL_PASS"])
-                        
-                        progress_bar = st.progress(0)
-                        for i, nom in enumerate(selection):
-                            # Trouver les infos de l'enseignant sélectionné
-                            info_ens = next(e for e in enseignants_filtres if e["Enseignant"] == nom)
-                            
-                            # 1. FILTRAGE ET RECAP
-                            nom_cible = str(nom).strip().upper()
-                            df_perso = df[df["Enseignants"].astype(str).str.upper().str.contains(nom_cible, na=False)]
-                            df_mail = df_perso[['Enseignements', 'Code', 'Enseignants', 'Horaire', 'Jours', 'Lieu', 'Promotion']]
-                            
-                            nb_cours = df_mail['Enseignements'].str.contains('Cours', case=False).sum()
-                            nb_td = df_mail['Enseignements'].str.contains('TD', case=False).sum()
-                            nb_tp = df_mail['Enseignements'].str.contains('TP', case=False).sum()
-
-                            msg = MIMEMultipart()
-                            msg['Subject'] = f"Votre Emploi du Temps S2-2026 - {nom}"
-                            msg['From'] = st.secrets["EMAIL_USER"]
-                            msg['To'] = info_ens["Email"]
-
-                            # 2. CORPS DU MESSAGE
-                            corps_html = f"""
-                            <html>
-                            <body style="font-family: Arial, sans-serif; line-height: 1.6;">
-                                <h2 style="color: #1E3A8A;">Plateforme de gestion des EDTs-S2-2026-Département d'Électrotechnique-Faculté de génie électrique-UDL-SBA</h2>
-                                <p>Sallem M./Mme <b>{nom}</b>,</p>
-                                <div style="background-color: #f8f9fa; padding: 10px; border: 1px solid #dee2e6; border-radius: 5px;">
-                                    <b>📊 Récapitulatif de votre charge (S2-2026) :</b><br>
-                                    <ul>
-                                        <li>Nombre de Cours : <b>{nb_cours}</b></li>
-                                        <li>Nombre de TD : <b>{nb_td}</b></li>
-                                        <li>Nombre de TP : <b>{nb_tp}</b></li>
-                                    </ul>
-                                </div>
-                                <div style="background-color: #fff4e5; border-left: 5px solid #ffa500; padding: 15px; margin: 20px 0; font-style: italic;">
-                                    <p>J'ai été chargé en tant que représentant des responsables des équipes de formation, en concertation avec le chef de département et le vice doyen chargé de la graduation, de coordonner l'élaboration de ces emplois du temps.</p>
-                                    <p>Je vous prie de bien vouloir nous signaler une éventuelle anomalie. Merci de nous renseigner le fichier Excel corrigé, au cas où tout est bon merci de nous envoyer <b>RAS</b>.</p>
-                                </div>
-                                {df_mail.to_html(index=False, border=1, justify='center')}
-                                <p><br>Cordialement.<br>---<br><b>Service d'enseignement du département d'électrotechnique.</b></p>
-                            </body>
-                            </html>
-                            """
-                            msg.attach(MIMEText(corps_html, 'html'))
-
-                            # 3. EXCEL COLORÉ
-                            buffer = io.BytesIO()
-                            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                                df_mail.to_excel(writer, index=False, sheet_name='Mon EDT')
-                                workbook = writer.book
-                                worksheet = writer.sheets['Mon EDT']
-                                fmt_cours = workbook.add_format({'bg_color': '#D9EAD3', 'border': 1})
-                                fmt_td = workbook.add_format({'bg_color': '#FFF2CC', 'border': 1})
-                                fmt_tp = workbook.add_format({'bg_color': '#F4CCCC', 'border': 1})
-                                fmt_header = workbook.add_format({'bold': True, 'bg_color': '#4472C4', 'font_color': 'white', 'border': 1})
-                                for col_num, val in enumerate(df_mail.columns.values): worksheet.write(0, col_num, val, fmt_header)
-                                for idx_row, ens in enumerate(df_mail['Enseignements']):
-                                    f = None
-                                    if 'Cours' in str(ens): f = fmt_cours
-                                    elif 'TD' in str(ens): f = fmt_td
-                                    elif 'TP' in str(ens): f = fmt_tp
-                                    if f: worksheet.set_row(idx_row + 1, None, f)
-                                worksheet.set_column('A:G', 18)
-                            
-                            buffer.seek(0)
-                            part = MIMEBase('application', 'octet-stream')
-                            part.set_payload(buffer.read())
-                            encoders.encode_base64(part)
-                            part.add_header('Content-Disposition', f'attachment; filename="EDT_2026_{nom}.xlsx"')
-                            msg.attach(part)
-                            
-                            server.send_message(msg)
-                            progress_bar.progress((i + 1) / len(selection))
-                        
-                        server.quit()
-                        st.success(f"✅ Envoi terminé pour les {len(selection)} enseignant(s) sélectionné(s).")
-                        st.rerun()
+                        if envoyer_edt([next(e for e in enseignants_filtres if e["Enseignant"] == nom) for nom in selection]):
+                            st.success(f"✅ Envoi programmé pour les {len(selection)} enseignant(s) sélectionné(s).")
+                            st.rerun()
                     except Exception as e:
                         st.error(f"Erreur : {e}")
 
@@ -1701,84 +1409,10 @@ if df is not None:
                 
                 if "@" in str(row["Email"]):
                     if col_act.button("📧 Envoyer", key=f"btn_unit_{row['Enseignant']}_{idx}"):
-                        import smtplib, io, pandas as pd
-                        from email.mime.text import MIMEText
-                        from email.mime.multipart import MIMEMultipart
-                        from email.mime.base import MIMEBase
-                        from email import encoders
-                        from datetime import datetime
-
                         try:
-                            server = smtplib.SMTP('smtp.gmail.com', 587)
-                            server.starttls()
-                            server.login(st.secrets["EMAIL_USER"], st.secrets["EMAIL_PASS"])
-                            
-                            nom_cible = str(row['Enseignant']).strip().upper()
-                            df_perso = df[df["Enseignants"].astype(str).str.upper().str.contains(nom_cible, na=False)]
-                            df_mail = df_perso[['Enseignements', 'Code', 'Enseignants', 'Horaire', 'Jours', 'Lieu', 'Promotion']]
-                            
-                            nb_cours = df_mail['Enseignements'].str.contains('Cours', case=False).sum()
-                            nb_td = df_mail['Enseignements'].str.contains('TD', case=False).sum()
-                            nb_tp = df_mail['Enseignements'].str.contains('TP', case=False).sum()
-
-                            msg = MIMEMultipart()
-                            msg['Subject'] = f"Votre Emploi du Temps S2-2026 - {row['Enseignant']}"
-                            msg['From'] = st.secrets["EMAIL_USER"]
-                            msg['To'] = row["Email"]
-                            
-                            corps_html = f"""
-                            <html>
-                            <body style="font-family: Arial, sans-serif; line-height: 1.6;">
-                                <h2 style="color: #1E3A8A;">Plateforme de gestion des EDTs-S2-2026-Département d'Électrotechnique-Faculté de génie électrique-UDL-SBA</h2>
-                                <p>Sallem M./Mme <b>{row['Enseignant']}</b>,</p>
-                                <div style="background-color: #f8f9fa; padding: 10px; border: 1px solid #dee2e6; border-radius: 5px; margin-bottom:10px;">
-                                    <b>📊 Récapitulatif de votre charge (S2-2026) :</b><br>
-                                    <ul>
-                                        <li>Nombre de Cours : <b>{nb_cours}</b></li>
-                                        <li>Nombre de TD : <b>{nb_td}</b></li>
-                                        <li>Nombre de TP : <b>{nb_tp}</b></li>
-                                    </ul>
-                                </div>
-                                <div style="background-color: #fff4e5; border-left: 5px solid #ffa500; padding: 15px; margin: 20px 0; font-style: italic;">
-                                    <p>J'ai été chargé en tant que représentant des responsables des équipes de formation, en concertation avec le chef de département et le vice doyen chargé de la graduation, de coordonner l'élaboration de ces emplois du temps.</p>
-                                    <p>Je vous prie de bien vouloir nous signaler une éventuelle anomalie. Merci de nous renseigner le fichier Excel corrigé, au cas où tout est bon merci de nous envoyer <b>RAS</b>.</p>
-                                </div>
-                                {df_mail.to_html(index=False, border=1, justify='center')}
-                                <p><br>Cordialement.<br>---<br><b>Service d'enseignement du département d'électrotechnique.</b></p>
-                            </body>
-                            </html>
-                            """
-                            msg.attach(MIMEText(corps_html, 'html'))
-
-                            buffer = io.BytesIO()
-                            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                                df_mail.to_excel(writer, index=False, sheet_name='Mon EDT')
-                                workbook = writer.book
-                                worksheet = writer.sheets['Mon EDT']
-                                f_cours = workbook.add_format({'bg_color': '#D9EAD3', 'border': 1})
-                                f_td = workbook.add_format({'bg_color': '#FFF2CC', 'border': 1})
-                                f_tp = workbook.add_format({'bg_color': '#F4CCCC', 'border': 1})
-                                f_head = workbook.add_format({'bold': True, 'bg_color': '#4472C4', 'font_color': 'white', 'border': 1})
-                                for c, v in enumerate(df_mail.columns.values): worksheet.write(0, c, v, f_head)
-                                for i, ens in enumerate(df_mail['Enseignements']):
-                                    fmt = None
-                                    if 'Cours' in str(ens): fmt = f_cours
-                                    elif 'TD' in str(ens): fmt = f_td
-                                    elif 'TP' in str(ens): fmt = f_tp
-                                    if fmt: worksheet.set_row(i + 1, None, fmt)
-                                worksheet.set_column('A:G', 18)
-                            
-                            buffer.seek(0)
-                            part = MIMEBase('application', 'octet-stream')
-                            part.set_payload(buffer.read())
-                            encoders.encode_base64(part)
-                            part.add_header('Content-Disposition', f'attachment; filename="EDT_2026_{row["Enseignant"]}.xlsx"')
-                            msg.attach(part)
-                            
-                            server.send_message(msg)
-                            server.quit()
-                            st.success(f"✅ Envoyé à {row['Enseignant']}")
-                            st.rerun()
+                            if envoyer_edt([row]):
+                                st.success(f"✅ Envoi programmé pour {row['Enseignant']}")
+                                st.rerun()
                         except Exception as e:
                             st.error(f"Erreur : {e}")
         # --- FIN DE LA BOUCLE ---
@@ -1793,6 +1427,7 @@ if df is not None:
             st.divider(); st.subheader("✍️ Espace Éditeur de Données (Admin)")
             search_query = st.text_input("🔍 Rechercher une ligne :")
             cols_format = ['Enseignements', 'Code', 'Enseignants', 'Horaire', 'Jours', 'Lieu', 'Promotion', 'Chevauchement']
+            df = df.copy()  # df est partagé entre les sessions
             for col in cols_format: 
                 if col not in df.columns: df[col] = ""
             df_to_edit = df[df[cols_format].apply(lambda r: r.astype(str).str.contains(search_query, case=False).any(), axis=1)].copy() if search_query else df[cols_format].copy()
@@ -1802,7 +1437,8 @@ if df is not None:
                 try:
                     if search_query: df.update(edited_df)
                     else: df = edited_df
-                    df[cols_format].to_excel(NOM_FICHIER_FIXE, index=False)
+                    enregistrer_edt(df[cols_format], NOM_FICHIER_FIXE)
+                    precalcul_edt(NOM_FICHIER_FIXE)
                     st.success("✅ Modifications enregistrées !"); st.rerun()
                 except Exception as e: st.error(f"Erreur : {e}")
 
@@ -0,0 +1,320 @@
+import html
+import io
+import random
+import smtplib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from queue import Empty, Queue
+
+import xlsxwriter
+
+# --- MOTEUR D'ENVOI DES EMPLOIS DU TEMPS PAR EMAIL ---
+# Quelques connexions SMTP persistantes (réutilisées d'un message à l'autre, rouvertes
+# si le serveur les coupe), un groupe de threads qui envoie en parallèle, un limiteur
+# de débit commun (quota Gmail) et des reprises avec attente exponentielle pour les
+# erreurs temporaires (4xx, coupure, délai dépassé). Les erreurs définitives (5xx :
+# adresse refusée...) ne sont pas retentées. Une coupure après le début de DATA ne
+# l'est pas non plus : le serveur a pu accepter le message, l'issue est "incertaine"
+# (un renvoi risquerait un doublon).
+# Test local, sans Gmail :
+#   python -m aiosmtpd -n -l localhost:8025
+#   python envoi_mails.py localhost 8025 [nb_messages]
+
+HOTE_SMTP = "smtp.gmail.com"
+PORT_SMTP = 587
+
+NB_CONNEXIONS = 3
+DEBIT_MAX = 2.0          # messages par seconde, tous threads confondus
+NB_TENTATIVES = 4
+ATTENTE_INITIALE = 1.0   # secondes, doublée à chaque reprise
+DELAI_RESEAU = 30        # secondes
+
+COLONNES_MAIL = ['Enseignements', 'Code', 'Enseignants', 'Horaire', 'Jours', 'Lieu', 'Promotion']
+
+TYPE_XLSX = "vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class ConnexionSMTP(smtplib.SMTP):
+    """smtplib.SMTP qui note le début de la commande DATA (message transmis)."""
+
+    data_commencee = False
+
+    def data(self, msg):
+        self.data_commencee = True
+        return super().data(msg)
+
+
+class PoolSMTP:
+    """Connexions SMTP persistantes, prêtées une à une aux threads d'envoi."""
+
+    def __init__(self, utilisateur, mot_de_passe, hote=HOTE_SMTP, port=PORT_SMTP,
+                 taille=NB_CONNEXIONS, starttls=True, delai=DELAI_RESEAU):
+        self.utilisateur = utilisateur
+        self.mot_de_passe = mot_de_passe
+        self.hote, self.port = hote, port
+        self.starttls = starttls
+        self.delai = delai
+        self._libres = Queue()
+        for _ in range(taille):
+            self._libres.put(None)   # jeton : connexion ouverte au premier usage
+
+    def _ouvrir(self):
+        serveur = ConnexionSMTP(self.hote, self.port, timeout=self.delai)
+        if self.starttls:
+            serveur.starttls()
+        if self.utilisateur:
+            serveur.login(self.utilisateur, self.mot_de_passe)
+        return serveur
+
+    @staticmethod
+    def _fermer(serveur):
+        try:
+            serveur.quit()
+        except (smtplib.SMTPException, OSError):
+            serveur.close()
+
+    @contextmanager
+    def connexion(self):
+        serveur = self._libres.get()
+        try:
+            if serveur is None:
+                serveur = self._ouvrir()
+            yield serveur
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Connexion inutilisable : elle sera rouverte par le prochain emprunteur
+            if serveur is not None:
+                serveur.close()
+            serveur = None
+            raise
+        finally:
+            self._libres.put(serveur)
+
+    def fermer(self):
+        while True:
+            try:
+                serveur = self._libres.get_nowait()
+            except Empty:
+                return
+            if serveur is not None:
+                self._fermer(serveur)
+
+
+class Limiteur:
+    """Seau à jetons : au plus `debit` messages par seconde (rafale de `rafale`)."""
+
+    def __init__(self, debit=DEBIT_MAX, rafale=1):
+        self.debit = debit
+        self.rafale = rafale
+        self._jetons = float(rafale)
+        self._instant = time.monotonic()
+        self._verrou = threading.Lock()
+
+    def attendre(self):
+        while True:
+            with self._verrou:
+                maintenant = time.monotonic()
+                self._jetons = min(self.rafale, self._jetons + (maintenant - self._instant) * self.debit)
+                self._instant = maintenant
+                if self._jetons >= 1:
+                    self._jetons -= 1
+                    return
+                attente = (1 - self._jetons) / self.debit
+            time.sleep(attente)
+
+
+class ResultatEnvoi:
+    def __init__(self, cle, ok, tentatives, erreur=None, incertain=False):
+        self.cle = cle              # identifiant fourni par l'appelant (ex. nom de l'enseignant)
+        self.ok = ok
+        self.tentatives = tentatives
+        self.erreur = erreur
+        self.incertain = incertain  # coupure après DATA : message peut-être délivré
+
+
+def est_temporaire(erreur):
+    """Vrai si l'erreur SMTP mérite une nouvelle tentative."""
+    if isinstance(erreur, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in erreur.recipients.values())
+    if isinstance(erreur, smtplib.SMTPResponseException):
+        return 400 <= erreur.smtp_code < 500
+    return isinstance(erreur, (smtplib.SMTPServerDisconnected, OSError))
+
+
+def _envoyer(pool, limiteur, cle, message, tentatives, attente):
+    for essai in range(1, tentatives + 1):
+        limiteur.attendre()
+        connexion = None
+        try:
+            with pool.connexion() as serveur:
+                connexion = serveur
+                serveur.data_commencee = False
+                serveur.send_message(message)
+            return ResultatEnvoi(cle, True, essai)
+        except (smtplib.SMTPException, OSError) as e:
+            # Coupure ou délai dépassé pendant DATA, sans réponse du serveur : pas de renvoi
+            if getattr(connexion, "data_commencee", False) and not isinstance(e, smtplib.SMTPResponseException):
+                return ResultatEnvoi(cle, False, essai, e, incertain=True)
+            if essai == tentatives or not est_temporaire(e):
+                return ResultatEnvoi(cle, False, essai, e)
+            # Attente exponentielle avec un peu d'aléa pour désynchroniser les threads
+            time.sleep(attente * 2 ** (essai - 1) * (1 + random.random() / 2))
+
+
+def envoyer_messages(messages, pool, limiteur=None, nb_threads=NB_CONNEXIONS,
+                     tentatives=NB_TENTATIVES, attente=ATTENTE_INITIALE, rappel=None):
+    """Envoie les couples (clé, message) en parallèle ; retourne les ResultatEnvoi.
+
+    `rappel(resultat, nb_faits, nb_total)` est appelé dans le thread appelant après
+    chaque message (barre de progression, mise à jour des statuts).
+    """
+    messages = list(messages)
+    limiteur = limiteur or Limiteur()
+    resultats = []
+    with ThreadPoolExecutor(max_workers=nb_threads) as executeur:
+        taches = [executeur.submit(_envoyer, pool, limiteur, cle, message, tentatives, attente)
+                  for cle, message in messages]
+        for tache in as_completed(taches):
+            resultats.append(tache.result())
+            if rappel:
+                rappel(resultats[-1], len(resultats), len(messages))
+    return resultats
+
+
+# --- CONTENU DU MESSAGE ---
+# Construit à partir des lignes (tuples de chaînes, dans l'ordre de COLONNES_MAIL) :
+# tableau HTML au gabarit de DataFrame.to_html(index=False, border=1, justify='center')
+# et classeur écrit directement avec xlsxwriter, sans DataFrame intermédiaire.
+
+GABARIT_TABLE = (
+    '<table border="1" class="dataframe">\n'
+    '  <thead>\n'
+    '    <tr style="text-align: center;">\n'
+    '{entetes}'
+    '    </tr>\n'
+    '  </thead>\n'
+    '  <tbody>\n'
+    '{lignes}'
+    '  </tbody>\n'
+    '</table>'
+)
+
+
+def _cellule(valeur):
+    # Même rendu que to_html : texte échappé, espaces de bord retirés, doubles espaces insécables
+    return html.escape(str(valeur).strip(), quote=False).replace("  ", "&nbsp;&nbsp;")
+
+
+def table_html(lignes, colonnes=COLONNES_MAIL):
+    entetes = "".join(f"      <th>{_cellule(c)}</th>\n" for c in colonnes)
+    corps = "".join(
+        "    <tr>\n" + "".join(f"      <td>{_cellule(v)}</td>\n" for v in ligne) + "    </tr>\n"
+        for ligne in lignes
+    )
+    return GABARIT_TABLE.format(entetes=entetes, lignes=corps)
+
+
+def recap_charge(lignes, colonnes=COLONNES_MAIL):
+    """(nb_cours, nb_td, nb_tp) affichés dans le message."""
+    i = colonnes.index('Enseignements')
+    enseignements = [str(l[i]).lower() for l in lignes]
+    return tuple(sum(m in e for e in enseignements) for m in ('cours', 'td', 'tp'))
+
+
+def corps_edt(nom, lignes, colonnes=COLONNES_MAIL):
+    nb_cours, nb_td, nb_tp = recap_charge(lignes, colonnes)
+    return f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6;">
+        <h2 style="color: #1E3A8A;">Plateforme de gestion des EDTs-S2-2026-Département d'Électrotechnique-Faculté de génie électrique-UDL-SBA</h2>
+        <p>Sallem M./Mme <b>{nom}</b>,</p>
+
+        <div style="background-color: #f8f9fa; padding: 10px; border: 1px solid #dee2e6; border-radius: 5px; margin-bottom: 15px;">
+            <b>📊 Récapitulatif de votre charge (S2-2026) :</b><br>
+            <ul>
+                <li>Nombre de Cours : <b>{nb_cours}</b></li>
+                <li>Nombre de TD : <b>{nb_td}</b></li>
+                <li>Nombre de TP : <b>{nb_tp}</b></li>
+            </ul>
+        </div>
+
+        <div style="background-color: #fff4e5; border-left: 5px solid #ffa500; padding: 15px; margin: 20px 0; font-style: italic;">
+            <p>J'ai été chargé en tant que représentant des responsables des équipes de formation, en concertation avec le chef de département et le vice doyen chargé de la graduation, de coordonner l'élaboration de ces emplois du temps.</p>
+            <p>Je vous prie de bien vouloir nous signaler une éventuelle anomalie. Merci de nous renseigner le fichier Excel corrigé, au cas où tout est bon merci de nous envoyer <b>RAS</b>.</p>
+        </div>
+
+        {table_html(lignes, colonnes)}
+
+        <p><br>Cordialement.<br>---<br><b>Service d'enseignement du département d'électrotechnique.</b></p>
+    </body>
+    </html>
+    """
+
+
+def classeur_edt(lignes, colonnes=COLONNES_MAIL):
+    """Excel coloré (Cours / TD / TP) de l'emploi du temps, en octets."""
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {'in_memory': True})
+    worksheet = workbook.add_worksheet('Mon EDT')
+
+    # Formats
+    fmt_cours = workbook.add_format({'bg_color': '#D9EAD3', 'border': 1})
+    fmt_td = workbook.add_format({'bg_color': '#FFF2CC', 'border': 1})
+    fmt_tp = workbook.add_format({'bg_color': '#F4CCCC', 'border': 1})
+    fmt_header = workbook.add_format({'bold': True, 'bg_color': '#4472C4', 'font_color': 'white', 'border': 1})
+
+    worksheet.write_row(0, 0, colonnes, fmt_header)
+    i_ens = colonnes.index('Enseignements')
+    for i, ligne in enumerate(lignes):
+        enseignement = str(ligne[i_ens])
+        current_fmt = None
+        if 'Cours' in enseignement: current_fmt = fmt_cours
+        elif 'TD' in enseignement: current_fmt = fmt_td
+        elif 'TP' in enseignement: current_fmt = fmt_tp
+        if current_fmt: worksheet.set_row(i + 1, None, current_fmt)
+        worksheet.write_row(i + 1, 0, [str(v) for v in ligne])
+
+    worksheet.set_column('A:G', 20)
+    workbook.close()
+    return buffer.getvalue()
+
+
+def courriel_edt(expediteur, destinataire, nom, corps, classeur):
+    """Message prêt à l'envoi : corps HTML et Excel de l'emploi du temps en pièce jointe."""
+    msg = MIMEMultipart()
+    msg['Subject'] = f"Votre Emploi du Temps S2-2026 - {nom}"
+    msg['From'] = expediteur
+    msg['To'] = destinataire
+    msg.attach(MIMEText(corps, 'html'))
+
+    part = MIMEBase('application', TYPE_XLSX)
+    part.set_payload(classeur)
+    encoders.encode_base64(part)
+    part.add_header('Content-Disposition', f'attachment; filename="EDT_S2_2026_{nom}.xlsx"')
+    msg.attach(part)
+    return msg
+
+
+if __name__ == "__main__":
+    hote = sys.argv[1] if len(sys.argv) > 1 else "localhost"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8025
+    nb = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    lignes = [("Cours-Essai", "Cours-E", "ESSAI", "8h - 9h30", "Dimanche", "A12", "L3ELT")]
+    corps, classeur = corps_edt("ESSAI", lignes), classeur_edt(lignes)
+    messages = [(i, courriel_edt("edt@localhost", f"enseignant{i}@localhost", f"ESSAI {i}", corps, classeur))
+                for i in range(nb)]
+    pool = PoolSMTP(None, None, hote, port, starttls=False)
+    t0 = time.perf_counter()
+    resultats = envoyer_messages(messages, pool, Limiteur(debit=1000, rafale=10))
+    pool.fermer()
+    echecs = [r for r in resultats if not r.ok]
+    print(f"{nb - len(echecs)}/{nb} message(s) envoyé(s) en {time.perf_counter() - t0:.2f} s")
+    for r in echecs:
+        print(f"  {r.cle} : {r.erreur!r}")
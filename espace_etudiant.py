@@ -0,0 +1,201 @@
+import io
+import re
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# --- ESPACE ÉTUDIANT : SÉANCES D'UN ÉTUDIANT ---
+# Remplace le filtre ligne à ligne (filter_st_edt) par un index calculé une fois par
+# version de l'EDT et de la liste des étudiants : les colonnes utiles sont lues et
+# découpées une seule fois (promotion, nature Cours / TD / TP, suffixes -A / -B / -C
+# du code), puis chaque clé (promotion, groupe, sous-groupe) reçoit les positions de
+# ses séances. L'emploi du temps d'un étudiant est alors une lecture de dictionnaire
+# suivie d'un df.iloc.
+# Règles reprises telles quelles de filter_st_edt :
+# - même promotion (sans casse) ; toute séance de Cours est retenue ;
+# - TD : le groupe (tel qu'écrit, en majuscules) figure dans le code, ou groupe n°1
+#   et code en "-A", ou groupe n°2 et code en "-B" ;
+# - TP : sous-groupe n°1 / 2 / 3 et code en "-A" / "-B" / "-C".
+# Le numéro est le premier nombre du libellé ("G1" → "1", "SG12" → "12").
+# Grilles : les étudiants d'une même clé ont le même emploi du temps. GrillesEtudiants
+# construit une grille par clé en un seul regroupement, la rend en HTML et en Excel,
+# et associe chaque étudiant à la grille de sa clé ; l'ensemble est reconstruit
+# seulement quand l'EDT ou la liste des étudiants change.
+
+# Grille affichée (format des horaires de l'EDT étudiant : tiret collé)
+ORDRE_HORAIRES = ["8h-9h30", "9h30-11h", "11h-12h30", "12h30-14h", "14h-15h30", "15h30-17h"]
+JOURS_ORDRE = ["Dimanche", "Lundi", "Mardi", "Mercredi", "Jeudi"]
+STYLES_SEANCE = {
+    "Cours": {"bg_color": "#d1e7dd", "font_color": "#084298", "bold": True},
+    "TD": {"bg_color": "#fff3cd", "font_color": "#856404", "bold": True},
+    "TP": {"bg_color": "#cfe2ff", "font_color": "#004085", "bold": True},
+}
+
+_re_nombre = re.compile(r"\d+")
+_AUCUNE = np.empty(0, dtype=np.int64)
+SUFFIXES_TP = {"1": "A", "2": "B", "3": "C"}
+SUFFIXES_TD = {"1": "A", "2": "B"}
+
+
+def _numero(libelle):
+    trouve = _re_nombre.search(str(libelle))
+    return trouve.group() if trouve else ""
+
+
+def cle_etudiant(promotion, groupe, sous_groupe):
+    """Clé (promotion, groupe, suffixe TP) : seuls ces éléments décident des séances."""
+    return str(promotion).upper(), str(groupe).upper(), SUFFIXES_TP.get(_numero(sous_groupe), "")
+
+
+class IndexEtudiants:
+    def __init__(self, df_edt, df_etudiants=None):
+        self.n = len(df_edt)
+        promotions = np.array([str(p).upper() for p in df_edt["Promotion"]], dtype=object)
+        enseignements = [str(e).upper() for e in df_edt["Enseignements"]]
+        self._code = np.array([str(c).upper() for c in df_edt["Code"]], dtype=object)
+        self._cours = np.array(["COURS" in e for e in enseignements], dtype=bool)
+        self._td = np.array(["TD" in e for e in enseignements], dtype=bool)
+        self._tp = np.array(["TP" in e for e in enseignements], dtype=bool)
+        self._suffixe = {s: np.array([f"-{s}" in c for c in self._code], dtype=bool) for s in "ABC"}
+
+        # Séances de chaque promotion (positions croissantes)
+        valeurs, inverse = np.unique(promotions.astype(str), return_inverse=True)
+        ordre = np.argsort(inverse, kind="stable")
+        bornes = np.searchsorted(inverse[ordre], np.arange(len(valeurs) + 1))
+        self._par_promotion = {v: ordre[bornes[i]:bornes[i + 1]] for i, v in enumerate(valeurs)}
+
+        self._positions = {}
+        if df_etudiants is not None:
+            for cle in set(map(cle_etudiant, df_etudiants["Promotion"], df_etudiants["Groupe"], df_etudiants["Sous groupe"])):
+                self._positions[cle] = self._calculer(cle)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _calculer(self, cle):
+        promotion, groupe, suffixe_tp = cle
+        positions = self._par_promotion.get(promotion, _AUCUNE)
+        garde = self._cours[positions].copy()
+        td = self._td[positions] & np.array([groupe in c for c in self._code[positions]], dtype=bool)
+        suffixe_td = SUFFIXES_TD.get(_numero(groupe))
+        if suffixe_td:
+            td |= self._td[positions] & self._suffixe[suffixe_td][positions]
+        garde |= td
+        if suffixe_tp:
+            garde |= self._tp[positions] & self._suffixe[suffixe_tp][positions]
+        return positions[garde]
+
+    def positions_cle(self, cle):
+        """Positions (croissantes, pour df.iloc) des séances d'une clé de cle_etudiant."""
+        if cle not in self._positions:
+            # Clé absente de la liste des étudiants : calculée puis mémorisée
+            self._positions[cle] = self._calculer(cle)
+        return self._positions[cle]
+
+    def positions(self, promotion, groupe, sous_groupe):
+        return self.positions_cle(cle_etudiant(promotion, groupe, sous_groupe))
+
+    def seances(self, df_edt, profil):
+        """Lignes de l'EDT d'un étudiant (profil : Promotion, Groupe, Sous groupe)."""
+        return df_edt.iloc[self.positions(profil["Promotion"], profil["Groupe"], profil["Sous groupe"])]
+
+
+def nature_case(val):
+    """"Cours", "TD", "TP" ou None, d'après le texte d'une case (ordre de color_edt)."""
+    if not val:
+        return None
+    if "Cours" in val:
+        return "Cours"
+    if "Td" in val or "TD" in val:
+        return "TD"
+    if "TP" in val:
+        return "TP"
+    return None
+
+
+def couleur_seance(val):
+    """Style CSS d'une case de la grille (Styler.map)."""
+    nature = nature_case(val)
+    if nature is None:
+        return ""
+    style = STYLES_SEANCE[nature]
+    return f"background-color: {style['bg_color']}; color: {style['font_color']}; font-weight: bold;"
+
+
+def grilles_groupes(df_edt, index, cles):
+    """{clé: grille} en un seul regroupement ; grille vide (aucune séance) → None.
+
+    Même résultat que, pour chaque clé, pivot_table(index='Horaire', columns='Jours',
+    aggfunc=' / '.join) puis réordonnancement des horaires et des jours.
+    """
+    cles = list(cles)
+    positions = [index.positions_cle(cle) for cle in cles]
+    numeros = np.repeat(np.arange(len(cles)), [len(p) for p in positions])
+    lignes = df_edt.iloc[np.concatenate(positions) if cles else []]
+    long = pd.DataFrame({
+        "cle": numeros,
+        "Horaire": lignes["Horaire"].to_numpy(dtype=object),
+        "Jours": lignes["Jours"].to_numpy(dtype=object),
+        "Enseignements": lignes["Enseignements"].to_numpy(dtype=object),
+    })
+    # Séances d'une case jointes dans l'ordre de l'EDT, comme l'aggfunc de pivot_table
+    cases = long.groupby(["cle", "Horaire", "Jours"], sort=True)["Enseignements"].agg(" / ".join)
+
+    grilles = dict.fromkeys(cles)
+    for numero, serie in cases.groupby(level="cle", sort=False):
+        grille = serie.droplevel("cle").unstack("Jours").fillna("")
+        horaires = [h for h in ORDRE_HORAIRES if h in grille.index] + [h for h in grille.index if h not in ORDRE_HORAIRES]
+        grille = grille.reindex(index=horaires, columns=[j for j in JOURS_ORDRE if j in grille.columns])
+        grille.columns.name = "Jours"
+        grilles[cles[numero]] = grille
+    return grilles
+
+
+def grille_html(grille):
+    """Tableau HTML coloré (page autonome) d'une grille."""
+    return ("<html><head><meta charset='utf-8'></head><body>"
+            + grille.style.map(couleur_seance).to_html() + "</body></html>")
+
+
+def grille_xlsx(grille):
+    """Classeur Excel coloré d'une grille, en octets."""
+    buffer = io.BytesIO()
+    classeur = xlsxwriter.Workbook(buffer, {"in_memory": True})
+    feuille = classeur.add_worksheet("Emploi du temps")
+    f_entete = classeur.add_format({"bold": True, "bg_color": "#003366", "font_color": "white", "border": 1})
+    f_case = classeur.add_format({"border": 1, "text_wrap": True, "valign": "top"})
+    f_nature = {n: classeur.add_format({**style, "border": 1, "text_wrap": True, "valign": "top"})
+                for n, style in STYLES_SEANCE.items()}
+
+    feuille.write_row(0, 0, ["Horaire"] + list(grille.columns), f_entete)
+    for i, (horaire, ligne) in enumerate(grille.iterrows(), start=1):
+        feuille.write_string(i, 0, str(horaire), f_entete)
+        for j, val in enumerate(ligne, start=1):
+            nature = nature_case(val)
+            feuille.write_string(i, j, str(val), f_nature[nature] if nature else f_case)
+    feuille.set_column(0, 0, 12)
+    feuille.set_column(1, len(grille.columns), 30)
+    classeur.close()
+    return buffer.getvalue()
+
+
+class GrillesEtudiants:
+    """Grille (DataFrame, HTML, Excel) de chaque clé de la liste des étudiants, et clé
+    de chaque étudiant (colonne Full_N ; premier profil en cas d'homonymes)."""
+
+    def __init__(self, df_edt, df_etudiants, index):
+        self.cle_de = {}
+        for nom, promotion, groupe, sous_groupe in zip(df_etudiants["Full_N"], df_etudiants["Promotion"],
+                                                        df_etudiants["Groupe"], df_etudiants["Sous groupe"]):
+            self.cle_de.setdefault(nom, cle_etudiant(promotion, groupe, sous_groupe))
+        self.grilles = grilles_groupes(df_edt, index, sorted(set(self.cle_de.values())))
+        self.html = {cle: grille_html(g) for cle, g in self.grilles.items() if g is not None}
+        self.xlsx = {cle: grille_xlsx(g) for cle, g in self.grilles.items() if g is not None}
+
+    def __len__(self):
+        return len(self.grilles)
+
+    def grille(self, nom):
+        """Grille de l'étudiant, None s'il n'a aucune séance (ou est inconnu)."""
+        return self.grilles.get(self.cle_de.get(nom))
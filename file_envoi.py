@@ -0,0 +1,392 @@
+import hashlib
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+from chargement_edt import derive_edt, version_edt
+from envoi_mails import HOTE_SMTP, PORT_SMTP, PoolSMTP, courriel_edt, envoyer_messages
+from modele_creneaux import IndexEnseignants, cle_enseignant
+from pieces_jointes import pieces_jointes
+
+# --- FILE D'ENVOI PERSISTANTE (SQLite) ---
+# L'interface ne fait qu'enfiler une tâche par enseignant dans un fichier SQLite local ;
+# un processus séparé (python file_envoi.py) vide la file avec le moteur d'envoi_mails.
+# Un rerun, un rafraîchissement du navigateur ou un redémarrage de l'application
+# n'interrompent plus les envois : les tâches restent sur disque et le worker reprend
+# là où il s'était arrêté (une tâche "en_cours" dont le bail a expiré est remise en
+# attente).
+# Clé d'idempotence : (email, enseignant, version de l'EDT). Une même version n'est
+# jamais renvoyée à la même adresse ; seule une tâche en échec peut être ré-enfilée.
+# L'EDT enregistré entre l'enfilage et l'envoi : la tâche est ré-étiquetée à la version
+# réellement envoyée, ou marquée "remplace" si cette version est déjà dans la file.
+# Statuts last_sent : chaque envoi réussi d'un inscrit est noté dans la table `statuts`
+# (même transaction que la tâche), puis publié par lots vers Supabase toutes les
+# INTERVALLE_SYNCHRO secondes et en fin de file, avec reprise en cas d'échec. Tant
+# qu'une ligne n'est pas publiée, l'interface lit l'état dans ce tampon local.
+
+FICHIER_FILE = "file_envoi.sqlite"
+FICHIER_EDT = "dataEDT-ELT-S2-2026.xlsx"
+
+EN_ATTENTE, EN_COURS, ENVOYE, ECHEC, REMPLACE = "en_attente", "en_cours", "envoye", "echec", "remplace"
+# Connexion coupée après DATA : message peut-être délivré, jamais renvoyé automatiquement
+INCERTAIN = "incertain"
+
+TAILLE_LOT = 20     # tâches réservées à la fois par le worker
+BAIL = 300          # secondes avant de reprendre une tâche "en_cours" abandonnée
+SILENCE_MAX = 90    # secondes sans signe de vie avant de tenir le worker pour arrêté
+INTERVALLE_SYNCHRO = 10     # secondes entre deux publications des statuts
+TAILLE_SYNCHRO = 200        # adresses par requête de publication
+ESSAIS_SYNCHRO = 3          # tentatives de publication en fin de file
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS envois (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cle TEXT NOT NULL UNIQUE,
+    lot TEXT NOT NULL,
+    enseignant TEXT NOT NULL,
+    email TEXT NOT NULL,
+    version TEXT NOT NULL,
+    marquer INTEGER NOT NULL DEFAULT 0,
+    etat TEXT NOT NULL DEFAULT 'en_attente',
+    tentatives INTEGER NOT NULL DEFAULT 0,
+    erreur TEXT,
+    cree REAL NOT NULL,
+    maj REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS envois_etat ON envois (etat, id);
+CREATE INDEX IF NOT EXISTS envois_lot ON envois (lot);
+CREATE TABLE IF NOT EXISTS statuts (
+    email TEXT PRIMARY KEY,
+    last_sent TEXT NOT NULL,
+    publie INTEGER NOT NULL DEFAULT 0,
+    essais INTEGER NOT NULL DEFAULT 0,
+    erreur TEXT
+);
+CREATE INDEX IF NOT EXISTS statuts_publie ON statuts (publie);
+CREATE TABLE IF NOT EXISTS worker (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    pid INTEGER NOT NULL,
+    battement REAL NOT NULL
+);
+"""
+
+
+def connecter(chemin=FICHIER_FILE):
+    # Mode autocommit : les transactions sont ouvertes explicitement (BEGIN IMMEDIATE)
+    conn = sqlite3.connect(chemin, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def cle_idempotence(email, enseignant, version):
+    brut = f"{str(email).strip().lower()}|{cle_enseignant(enseignant)}|{version}"
+    return hashlib.sha256(brut.encode()).hexdigest()
+
+
+def enfiler(conn, destinataires, version, lot=None):
+    """Enfile une tâche par destinataire {"Enseignant", "Email", "marquer"}.
+
+    `marquer` : mettre à jour last_sent après l'envoi (inscrit Supabase).
+    Retourne (lot, nb_enfilés, nb_ignorés) ; sont ignorés les envois déjà faits ou en
+    cours pour cette version de l'EDT.
+    """
+    maintenant = time.time()
+    lot = lot or f"{maintenant:.6f}"
+    enfiles = 0
+    destinataires = list(destinataires)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for d in destinataires:
+            cur = conn.execute(
+                """INSERT INTO envois (cle, lot, enseignant, email, version, marquer, cree, maj)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (cle) DO UPDATE SET
+                       etat = 'en_attente', erreur = NULL, tentatives = 0,
+                       lot = excluded.lot, marquer = excluded.marquer, maj = excluded.maj
+                   WHERE envois.etat = 'echec'""",
+                (cle_idempotence(d["Email"], d["Enseignant"], version), lot, str(d["Enseignant"]),
+                 str(d["Email"]).strip(), version, int(bool(d.get("marquer"))), maintenant, maintenant),
+            )
+            enfiles += cur.rowcount
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return lot, enfiles, len(destinataires) - enfiles
+
+
+def avancement(conn, lot=None):
+    """{état: nombre de tâches} du lot (de toute la file si lot est None)."""
+    requete = "SELECT etat, COUNT(*) FROM envois" + (" WHERE lot = ?" if lot else "") + " GROUP BY etat"
+    comptes = {EN_ATTENTE: 0, EN_COURS: 0, ENVOYE: 0, ECHEC: 0, REMPLACE: 0, INCERTAIN: 0}
+    comptes.update(dict(conn.execute(requete, (lot,) if lot else ()).fetchall()))
+    return comptes
+
+
+def echecs(conn, lot=None):
+    """Tâches en échec ou d'issue incertaine (colonne etat)."""
+    requete = "SELECT enseignant, email, tentatives, erreur, etat FROM envois WHERE etat IN ('echec', 'incertain')"
+    return conn.execute(requete + (" AND lot = ?" if lot else "") + " ORDER BY id", (lot,) if lot else ()).fetchall()
+
+
+def oublier_envois(conn):
+    """Efface les tâches terminées et les statuts : leurs destinataires pourront de
+    nouveau être servis."""
+    conn.execute("DELETE FROM envois WHERE etat IN ('envoye', 'echec', 'remplace', 'incertain')")
+    conn.execute("DELETE FROM statuts")
+
+
+# --- STATUTS last_sent (TAMPON LOCAL) ---
+def statuts_en_attente(conn):
+    """{email: last_sent} des envois pas encore publiés vers Supabase."""
+    return dict(conn.execute("SELECT email, last_sent FROM statuts WHERE publie = 0").fetchall())
+
+
+def statuts_envoyes(conn):
+    """{email: last_sent} de tous les envois notés depuis la dernière réinitialisation,
+    publiés ou non."""
+    return dict(conn.execute("SELECT email, last_sent FROM statuts").fetchall())
+
+
+def publier_statuts(conn, publier, taille=TAILLE_SYNCHRO):
+    """Publie les statuts en attente par paquets : `publier(emails, last_sent)` met à
+    jour plusieurs adresses en une requête. Retourne le nombre de statuts publiés ;
+    en cas d'échec, les lignes restantes seront reprises au prochain appel."""
+    lignes = conn.execute("SELECT email, last_sent FROM statuts WHERE publie = 0 ORDER BY last_sent").fetchall()
+    publies = 0
+    for debut in range(0, len(lignes), taille):
+        paquet = lignes[debut:debut + taille]
+        emails = [l["email"] for l in paquet]
+        marques = ",".join("?" * len(emails))
+        try:
+            # L'heure la plus récente du paquet : une requête par paquet, pas par adresse
+            publier(emails, max(l["last_sent"] for l in paquet))
+        except Exception as e:
+            conn.execute(f"UPDATE statuts SET essais = essais + 1, erreur = ? WHERE email IN ({marques})",
+                         [repr(e), *emails])
+            raise
+        # Seules les lignes non modifiées entre-temps sont marquées publiées
+        conn.executemany("UPDATE statuts SET publie = 1, erreur = NULL WHERE email = ? AND last_sent = ?",
+                         [(l["email"], l["last_sent"]) for l in paquet])
+        publies += len(paquet)
+    return publies
+
+
+def dernier_lot(conn):
+    ligne = conn.execute("SELECT lot FROM envois ORDER BY id DESC LIMIT 1").fetchone()
+    return ligne[0] if ligne else None
+
+
+# --- WORKER ---
+def _processus_vivant(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def worker_actif(conn):
+    ligne = conn.execute("SELECT pid, battement FROM worker WHERE id = 1").fetchone()
+    return bool(ligne) and time.time() - ligne["battement"] < SILENCE_MAX and _processus_vivant(ligne["pid"])
+
+
+def chemin_journal(chemin_file=FICHIER_FILE):
+    return f"{os.path.splitext(chemin_file)[0]}.log"
+
+
+def lancer_worker(env, chemin_file=FICHIER_FILE, chemin_edt=FICHIER_EDT):
+    """Démarre le worker en arrière-plan s'il ne tourne pas déjà ; `env` : identifiants
+    SMTP / Supabase (EMAIL_USER, EMAIL_PASS, SMTP_HOST, SUPABASE_URL...).
+    Sorties et erreurs du worker (traceback compris) : chemin_journal(chemin_file)."""
+    with closing(connecter(chemin_file)) as conn:
+        if worker_actif(conn):
+            return False
+    with open(chemin_journal(chemin_file), "a", encoding="utf-8") as journal:
+        journal.write(f"--- {datetime.now().isoformat(timespec='seconds')} démarrage du worker\n")
+        journal.flush()
+        # Le processus fils garde sa propre copie du descripteur
+        worker = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), chemin_file, chemin_edt],
+            env={**os.environ, **{k: str(v) for k, v in env.items()}, "PYTHONUNBUFFERED": "1"},
+            stdin=subprocess.DEVNULL, stdout=journal, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    # Récupère le code de sortie : pas de processus zombie tenu pour vivant
+    threading.Thread(target=worker.wait, daemon=True).start()
+    return True
+
+
+def _prendre_la_main(conn):
+    # Un seul worker à la fois : la ligne `worker` sert de verrou avec battement
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if worker_actif(conn) and conn.execute("SELECT pid FROM worker").fetchone()[0] != os.getpid():
+            conn.execute("ROLLBACK")
+            return False
+        conn.execute("INSERT OR REPLACE INTO worker (id, pid, battement) VALUES (1, ?, ?)", (os.getpid(), time.time()))
+        conn.execute("COMMIT")
+        return True
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _battre(conn):
+    conn.execute("UPDATE worker SET battement = ? WHERE id = 1 AND pid = ?", (time.time(), os.getpid()))
+
+
+def _reserver(conn, taille=TAILLE_LOT):
+    maintenant = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Worker remplacé (jugé arrêté pendant un envoi trop long) : il s'efface
+        proprietaire = conn.execute("SELECT pid FROM worker WHERE id = 1").fetchone()
+        if not proprietaire or proprietaire[0] != os.getpid():
+            conn.execute("ROLLBACK")
+            return None
+        # Tâches d'un worker arrêté en plein envoi : remises en attente
+        conn.execute("UPDATE envois SET etat = 'en_attente' WHERE etat = 'en_cours' AND maj < ?",
+                     (maintenant - BAIL,))
+        taches = conn.execute("SELECT * FROM envois WHERE etat = 'en_attente' ORDER BY id LIMIT ?",
+                              (taille,)).fetchall()
+        if not taches:
+            # File vide : le worker se retire dans la même transaction, une tâche enfilée
+            # juste après trouvera la place libre et relancera un worker
+            conn.execute("DELETE FROM worker WHERE id = 1 AND pid = ?", (os.getpid(),))
+        conn.executemany("UPDATE envois SET etat = 'en_cours', maj = ? WHERE id = ?",
+                         [(maintenant, t["id"]) for t in taches])
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return taches
+
+
+def _actualiser(conn, taches, version):
+    # Tâches enfilées pour une autre version de l'EDT que celle des pièces jointes :
+    # ré-étiquetées à `version` (clé comprise), ou "remplace" si la clé existe déjà.
+    # Retourne les tâches à envoyer, toutes pour `version`.
+    perimees = [t for t in taches if t["version"] != version]
+    if not perimees:
+        return taches
+    maintenant = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for t in perimees:
+            try:
+                conn.execute("UPDATE envois SET cle = ?, version = ?, maj = ? WHERE id = ?",
+                             (cle_idempotence(t["email"], t["enseignant"], version), version, maintenant, t["id"]))
+            except sqlite3.IntegrityError:
+                conn.execute("UPDATE envois SET etat = 'remplace', erreur = ?, maj = ? WHERE id = ?",
+                             (f"version {version[:12]} déjà dans la file", maintenant, t["id"]))
+        ids = [t["id"] for t in taches]
+        taches = conn.execute(f"SELECT * FROM envois WHERE etat = 'en_cours' AND id IN ({','.join('?' * len(ids))}) "
+                              "ORDER BY id", ids).fetchall()
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return taches
+
+
+def _terminer(conn, tache, resultat):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE envois SET etat = ?, tentatives = tentatives + ?, erreur = ?, maj = ? WHERE id = ?",
+            (ENVOYE if resultat.ok else INCERTAIN if resultat.incertain else ECHEC, resultat.tentatives,
+             None if resultat.ok else str(resultat.erreur), time.time(), tache["id"]),
+        )
+        if resultat.ok and tache["marquer"]:
+            conn.execute(
+                """INSERT INTO statuts (email, last_sent) VALUES (?, ?)
+                   ON CONFLICT (email) DO UPDATE SET last_sent = excluded.last_sent, publie = 0""",
+                (tache["email"], datetime.now().isoformat()),
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _synchroniser(conn, publier, essais=1):
+    # Un échec de publication n'arrête pas les envois : les statuts restent dans le tampon
+    for essai in range(essais):
+        try:
+            publier_statuts(conn, publier)
+            return True
+        except Exception as e:
+            print(f"Publication des statuts ({essai + 1}/{essais}) : {e!r}", file=sys.stderr)
+            if essai + 1 < essais:
+                time.sleep(2 ** essai)
+    return False
+
+
+def travailler(conn, pool, expediteur, chemin_edt=FICHIER_EDT, publier=None):
+    """Vide la file ; `publier(emails, last_sent)` publie les statuts par lots."""
+    if not _prendre_la_main(conn):
+        return 0
+    envoyes = 0
+    derniere_synchro = time.monotonic()
+    while True:
+        _battre(conn)
+        taches = _reserver(conn)
+        if not taches:
+            if publier:
+                _synchroniser(conn, publier, ESSAIS_SYNCHRO)
+            return envoyes
+
+        # Pièces jointes de la version courante, rendues une fois pour tous les enseignants ;
+        # seules partent les tâches (ré-étiquetées si besoin) de cette version
+        index = derive_edt(chemin_edt, "index_enseignants", lambda d: IndexEnseignants(d["Enseignants"]))
+        pieces = pieces_jointes(chemin_edt, index)
+        taches = _actualiser(conn, taches, pieces.version)
+        if not taches:
+            continue
+        pieces.completer(t["enseignant"] for t in taches)
+        messages = [(tache, courriel_edt(expediteur, tache["email"], tache["enseignant"], *pieces.pieces_de(tache["enseignant"])))
+                    for tache in taches]
+
+        def suivi(resultat, faits, total):
+            nonlocal envoyes, derniere_synchro
+            _terminer(conn, resultat.cle, resultat)
+            _battre(conn)
+            envoyes += resultat.ok
+            if publier and time.monotonic() - derniere_synchro >= INTERVALLE_SYNCHRO:
+                _synchroniser(conn, publier)
+                derniere_synchro = time.monotonic()
+
+        envoyer_messages(messages, pool, rappel=suivi)
+
+
+if __name__ == "__main__":
+    chemin_file = sys.argv[1] if len(sys.argv) > 1 else FICHIER_FILE
+    chemin_edt = sys.argv[2] if len(sys.argv) > 2 else FICHIER_EDT
+    env = os.environ
+
+    publier = None
+    if env.get("SUPABASE_URL"):
+        from base_donnees import client_supabase
+
+        supabase = client_supabase(env["SUPABASE_URL"], env["SUPABASE_KEY"])
+
+        def publier(emails, last_sent):
+            supabase.table("enseignants_auth").update({"last_sent": last_sent}).in_("email", emails).execute()
+
+    pool = PoolSMTP(env.get("EMAIL_USER"), env.get("EMAIL_PASS"), env.get("SMTP_HOST", HOTE_SMTP),
+                    int(env.get("SMTP_PORT", PORT_SMTP)), starttls=env.get("SMTP_STARTTLS", "1") != "0")
+    conn = connecter(chemin_file)
+    try:
+        nb = travailler(conn, pool, env.get("EMAIL_USER") or "edt@localhost", chemin_edt, publier)
+    finally:
+        pool.fermer()
+    print(f"{nb} envoi(s) effectué(s) ; file : {avancement(conn)} (EDT {version_edt(chemin_edt)[:12]})")
@@ -0,0 +1,127 @@
+import numpy as np
+
+from chargement_edt import normalize
+
+# --- GRILLE HEBDOMADAIRE (ENSEIGNANT / PROMOTION / SALLE) ---
+# Un seul composant pour les trois vues : le contenu des cases est construit par
+# opérations vectorisées sur les colonnes, les séances sont rangées par un tri unique
+# (créneau, jour) puis concaténées case par case, et le tableau HTML est produit
+# depuis un gabarit (même sortie que DataFrame.to_html, pour garder la mise en forme).
+
+SEPARATEUR = "<div class='separator'></div>"
+
+# Grille affichée : 14 créneaux (libellés d'affichage) et jours ouvrés
+HORAIRES_GRILLE = [
+    "8h - 9h", "8h - 9h30", "8h - 10h", "9h - 10h", "9h30 - 11h",
+    "10h - 11h", "11h - 12h", "11h - 12h30",
+    "12h - 13h", "12h30 - 14h", "13h - 14h", "14h - 15h30", "14h - 16h", "15h30 - 17h"
+]
+JOURS_GRILLE = ["Dimanche", "Lundi", "Mardi", "Mercredi", "Jeudi"]
+
+GABARIT_TABLE = (
+    '<table border="1" class="dataframe">\n'
+    '  <thead>\n'
+    '    <tr style="text-align: right;">\n'
+    '      <th></th>\n'
+    '{entetes}'
+    '    </tr>\n'
+    '  </thead>\n'
+    '  <tbody>\n'
+    '{lignes}'
+    '  </tbody>\n'
+    '</table>'
+)
+GABARIT_ENTETE = '      <th>{}</th>\n'
+GABARIT_LIGNE = '    <tr>\n      <th>{}</th>\n{}    </tr>\n'
+GABARIT_CASE = '      <td>{}</td>\n'
+
+
+def _nature(code, detaillee=False):
+    code = code.astype(str).str.upper()
+    cours = code.str.contains("COURS", regex=False)
+    td = code.str.contains("TD", regex=False)
+    if detaillee:
+        return np.select([cours, td], ["📘 COURS", "📗 TD"], "🔴 TP")
+    return np.select([cours, td], ["📘", "📗"], "🔴")
+
+
+def contenu_enseignant(df):
+    # Disposition : Enseignements, Code, Lieu, Promotion
+    return ("<div style='margin-bottom:8px;'>" + _nature(df["Code"]) + " <b>" + df["Enseignements"]
+            + "</b><br><small>(" + df["Code"] + ")</small><br><i>" + df["Lieu"] + "</i><br><b>"
+            + df["Promotion"] + "</b></div>")
+
+
+def contenu_promotion(df):
+    return ("<b>" + _nature(df["Code"]) + " " + df["Enseignements"] + "</b><br>" + df["Enseignants"]
+            + "<br><i>" + df["Lieu"] + "</i>")
+
+
+def contenu_salle(df):
+    return "<b>" + df["Promotion"] + "</b><br>" + df["Enseignements"] + "<br><i>" + df["Enseignants"] + "</i>"
+
+
+CONTENUS = {
+    "Enseignant": contenu_enseignant,
+    "Promotion": contenu_promotion,
+    "Salle": contenu_salle,
+}
+
+
+def grilles_html(df, vue, entites, positions, horaires=HORAIRES_GRILLE, jours=JOURS_GRILLE, nb_entites=None):
+    """Grilles HTML de plusieurs cibles en un seul passage.
+
+    `entites[k]` (entier >= 0) reçoit la séance df.iloc[positions[k]] ; les couples
+    doivent être rangés par position croissante au sein d'une même entité. Retourne
+    une liste de `nb_entites` tableaux HTML (par défaut : plus grande entité + 1).
+    """
+    entites = np.asarray(entites, dtype=np.int64)
+    positions = np.asarray(positions, dtype=np.int64)
+    if nb_entites is None:
+        nb_entites = int(entites.max()) + 1 if len(entites) else 0
+    nb_cases = len(horaires) * len(jours)
+    cases = np.full(nb_entites * nb_cases, "", dtype=object)
+
+    lignes_h = {normalize(h): i for i, h in enumerate(horaires)}
+    colonnes_j = {normalize(j): i for i, j in enumerate(jours)}
+    ligne = df["h_norm"].map(lignes_h).to_numpy(dtype=float, na_value=np.nan)
+    colonne = df["j_norm"].map(colonnes_j).to_numpy(dtype=float, na_value=np.nan)
+    case = np.where(np.isnan(ligne) | np.isnan(colonne), -1,
+                    np.nan_to_num(ligne) * len(jours) + np.nan_to_num(colonne)).astype(np.int64)
+
+    # Séances hors grille ignorées, comme avec l'ancien reindex
+    garde = case[positions] >= 0
+    if garde.any():
+        utiles = np.unique(positions[garde])
+        contenus = np.full(len(df), "", dtype=object)
+        contenus[utiles] = np.asarray(CONTENUS[vue](df.iloc[utiles]), dtype=object)
+        numero = entites[garde] * nb_cases + case[positions[garde]]
+        textes = contenus[positions[garde]]
+
+        # Tri unique et stable : l'ordre des séances dans une case est conservé
+        ordre = np.argsort(numero, kind="stable")
+        numero, textes = numero[ordre], textes[ordre]
+        debuts = np.flatnonzero(np.r_[True, numero[1:] != numero[:-1]])
+        suite = np.ones(len(textes), dtype=bool)
+        suite[debuts] = False
+        textes[suite] = SEPARATEUR + textes[suite]
+        cases[numero[debuts]] = np.add.reduceat(textes, debuts)
+
+    entetes = "".join(GABARIT_ENTETE.format(j) for j in jours)
+    cases = cases.reshape(nb_entites, len(horaires), len(jours))
+    return [
+        GABARIT_TABLE.format(entetes=entetes, lignes="".join(
+            GABARIT_LIGNE.format(h, "".join(GABARIT_CASE.format(c.replace("  ", "&nbsp;&nbsp;")) for c in grille[i]))
+            for i, h in enumerate(horaires)
+        ))
+        for grille in cases
+    ]
+
+
+def grille_html(df, vue, horaires=HORAIRES_GRILLE, jours=JOURS_GRILLE):
+    """Tableau HTML (créneaux en lignes, jours en colonnes) des séances de df.
+
+    Les séances sont placées d'après h_norm / j_norm ; celles dont le créneau ou le
+    jour n'apparaît pas dans la grille sont ignorées, comme avec l'ancien reindex.
+    """
+    return grilles_html(df, vue, np.zeros(len(df)), np.arange(len(df)), horaires, jours, nb_entites=1)[0]
@@ -0,0 +1,273 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+
+from postgrest.exceptions import APIError
+
+from registre_absences import CONFLIT_SEANCE
+
+# --- JOURNAL LOCAL DES ABSENCES (SQLite, MODE WAL) ---
+# La validation d'une séance n'écrit plus directement dans Supabase : les fiches sont
+# d'abord journalisées dans un fichier SQLite local (une transaction, retour immédiat),
+# puis un thread d'arrière-plan les pousse par lots vers archives_absences, avec
+# reprises à intervalle croissant tant que le réseau ne répond pas.
+# Doublons : la clé (cle_seance, etudiant_nom, note_evaluation) est unique dans le
+# journal (un double clic n'ajoute rien) comme dans la table distante (un lot rejoué
+# après une réponse perdue est ignoré, voir registre_absences.archiver). Tant que
+# l'index distant manque, pousser refuse d'archiver (MigrationAbsente) : les fiches
+# attendent dans le journal plutôt que d'être dupliquées.
+# Erreurs : une panne (réseau, base indisponible, migration absente) arrête le
+# passage et sera reprise. Une fiche refusée par la base (valeur invalide, contrainte :
+# SQLSTATE 22xxx / 23xxx) est isolée en coupant le lot en deux ; après MAX_ESSAIS refus
+# elle est écartée (état "erreur") et le reste du journal continue de passer.
+# `pousser(fiches)` est injecté : archiver(supabase, ..., exiger_cle=True) en
+# production, une table SQLite de remplacement (TableLocale) pour les essais hors ligne.
+
+FICHIER_JOURNAL = "journal_absences.sqlite"
+
+EN_ATTENTE, SYNCHRONISE, EN_ERREUR = "en_attente", "synchronise", "erreur"
+
+TAILLE_LOT = 500            # fiches par requête d'insertion
+INTERVALLE_SYNCHRO = 5.0    # secondes entre deux passages quand tout est à jour
+ATTENTE_MAX = 300.0         # plafond de l'attente entre deux essais en échec
+RETENTION = 7 * 86400       # secondes de conservation des fiches synchronisées
+MAX_ESSAIS = 3              # refus de la base avant d'écarter une fiche
+# Classes SQLSTATE d'une erreur propre aux valeurs d'une fiche (22 : donnée, 23 : contrainte)
+CLASSES_ERREUR_FICHE = ("22", "23")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fiches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cle_seance TEXT NOT NULL,
+    etudiant_nom TEXT NOT NULL,
+    note_evaluation TEXT NOT NULL,
+    fiche TEXT NOT NULL,
+    etat TEXT NOT NULL DEFAULT 'en_attente',
+    essais INTEGER NOT NULL DEFAULT 0,
+    erreur TEXT,
+    cree REAL NOT NULL,
+    synchronise_le REAL,
+    UNIQUE (cle_seance, etudiant_nom, note_evaluation)
+);
+CREATE INDEX IF NOT EXISTS fiches_etat ON fiches (etat, id);
+"""
+
+_verrou = threading.Lock()
+_synchros = {}
+
+
+def connecter(chemin=FICHIER_JOURNAL):
+    # WAL : l'interface écrit pendant que le thread de synchronisation lit
+    conn = sqlite3.connect(chemin, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def journaliser(conn, fiches):
+    """Enregistre les fiches (une transaction) ; retourne le nombre de fiches nouvelles,
+    celles déjà journalisées sous la même clé étant ignorées."""
+    maintenant = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        avant = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO fiches (cle_seance, etudiant_nom, note_evaluation, fiche, cree) VALUES (?, ?, ?, ?, ?)",
+            [(f["cle_seance"], f["etudiant_nom"], f["note_evaluation"], json.dumps(f, default=str), maintenant)
+             for f in fiches],
+        )
+        nouvelles = conn.total_changes - avant
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return nouvelles
+
+
+def compteurs(conn):
+    """{"en_attente": n, "synchronise": n, "erreur": n fiches écartées, "message":
+    dernière erreur d'une fiche en attente ou None}."""
+    etats = dict(conn.execute("SELECT etat, COUNT(*) FROM fiches GROUP BY etat").fetchall())
+    erreur = conn.execute("SELECT erreur FROM fiches WHERE etat = 'en_attente' AND erreur IS NOT NULL "
+                          "ORDER BY id LIMIT 1").fetchone()
+    return {EN_ATTENTE: etats.get(EN_ATTENTE, 0), SYNCHRONISE: etats.get(SYNCHRONISE, 0),
+            EN_ERREUR: etats.get(EN_ERREUR, 0), "message": erreur[0] if erreur else None}
+
+
+def fiches_en_erreur(conn, limite=100):
+    """Fiches écartées (les plus récentes d'abord) : fiche d'origine, essais et erreur."""
+    lignes = conn.execute("SELECT fiche, essais, erreur FROM fiches WHERE etat = 'erreur' ORDER BY id DESC LIMIT ?",
+                          (limite,)).fetchall()
+    return [{**json.loads(l["fiche"]), "essais": l["essais"], "erreur": l["erreur"]} for l in lignes]
+
+
+def erreur_de_fiche(erreur):
+    """Refus lié aux valeurs envoyées (rejouer le même lot échouerait encore)."""
+    return isinstance(erreur, APIError) and str(erreur.code or "").startswith(CLASSES_ERREUR_FICHE)
+
+
+def _pousser_lot(conn, pousser, lot):
+    # Pousse le lot ; refusé pour une fiche, il est coupé en deux jusqu'à l'isoler.
+    # Retourne le nombre de fiches synchronisées ; une panne est propagée.
+    ids = [l["id"] for l in lot]
+    marques = ",".join("?" * len(ids))
+    try:
+        pousser([json.loads(l["fiche"]) for l in lot])
+    except Exception as e:
+        if not erreur_de_fiche(e):
+            conn.execute(f"UPDATE fiches SET erreur = ? WHERE id IN ({marques})", [repr(e), *ids])
+            raise
+        if len(lot) > 1:
+            milieu = len(lot) // 2
+            return _pousser_lot(conn, pousser, lot[:milieu]) + _pousser_lot(conn, pousser, lot[milieu:])
+        conn.execute("UPDATE fiches SET essais = essais + 1, erreur = ?, "
+                     "etat = CASE WHEN essais + 1 >= ? THEN 'erreur' ELSE etat END WHERE id = ?",
+                     (repr(e), MAX_ESSAIS, ids[0]))
+        return 0
+    conn.execute(f"UPDATE fiches SET etat = 'synchronise', erreur = NULL, synchronise_le = ? WHERE id IN ({marques})",
+                 [time.time(), *ids])
+    return len(ids)
+
+
+def synchroniser(conn, pousser, taille=TAILLE_LOT):
+    """Pousse les fiches en attente par lots, dans l'ordre de saisie. Retourne le
+    nombre de fiches synchronisées. Une panne est notée sur le lot puis relancée ;
+    une fiche refusée est sautée jusqu'au passage suivant (écartée après MAX_ESSAIS)."""
+    synchronisees = 0
+    dernier = 0
+    while True:
+        # Curseur sur l'id : une fiche refusée pendant ce passage n'est pas relue
+        lot = conn.execute("SELECT id, fiche FROM fiches WHERE etat = 'en_attente' AND id > ? ORDER BY id LIMIT ?",
+                           (dernier, taille)).fetchall()
+        if not lot:
+            break
+        synchronisees += _pousser_lot(conn, pousser, lot)
+        dernier = lot[-1]["id"]
+    conn.execute("DELETE FROM fiches WHERE etat = 'synchronise' AND synchronise_le < ?", (time.time() - RETENTION,))
+    return synchronisees
+
+
+class SynchroJournal:
+    """Thread d'arrière-plan qui vide le journal vers la table distante."""
+
+    def __init__(self, chemin, pousser, intervalle=INTERVALLE_SYNCHRO):
+        self.chemin = chemin
+        self.pousser = pousser
+        self.intervalle = intervalle
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._boucle, name=f"synchro-{chemin}", daemon=True)
+        self._thread.start()
+
+    def reveiller(self):
+        """Synchronise sans attendre la fin de l'intervalle (ex. après une saisie)."""
+        self._reveil.set()
+
+    def arreter(self):
+        self._arret.set()
+        self._reveil.set()
+        self._thread.join()
+
+    def _boucle(self):
+        attente = self.intervalle
+        with closing(connecter(self.chemin)) as conn:
+            while not self._arret.is_set():
+                try:
+                    synchroniser(conn, self.pousser)
+                    attente = self.intervalle
+                except Exception as e:
+                    # Réseau absent, base indisponible ou non migrée : les fiches restent dans le journal
+                    print(f"Synchronisation du journal : {e!r}", file=sys.stderr)
+                    attente = min(max(attente, self.intervalle) * 2, ATTENTE_MAX)
+                self._reveil.wait(attente)
+                self._reveil.clear()
+
+
+def demarrer_synchro(chemin, pousser, intervalle=INTERVALLE_SYNCHRO):
+    """SynchroJournal du processus pour ce journal, démarré au premier appel."""
+    with _verrou:
+        if chemin not in _synchros:
+            _synchros[chemin] = SynchroJournal(chemin, pousser, intervalle)
+        return _synchros[chemin]
+
+
+class TableLocale:
+    """Remplaçant SQLite de archives_absences (même clé unique) : pousser() se comporte
+    comme registre_absences.archiver, sans réseau."""
+
+    def __init__(self, chemin=":memory:"):
+        self._verrou = threading.Lock()
+        self.conn = sqlite3.connect(chemin, check_same_thread=False, isolation_level=None)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS archives_absences (cle_seance TEXT, etudiant_nom TEXT, "
+                          "note_evaluation TEXT, fiche TEXT)")
+        self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS archives_unique ON archives_absences ({CONFLIT_SEANCE})")
+
+    def pousser(self, fiches):
+        # Fiche sans étudiant : refus comme une contrainte NOT NULL de PostgreSQL
+        if any(not f.get("etudiant_nom") for f in fiches):
+            raise APIError({"code": "23502", "message": "null value in column \"etudiant_nom\""})
+        with self._verrou:
+            avant = self.conn.total_changes
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO archives_absences VALUES (?, ?, ?, ?)",
+                [(f["cle_seance"], f["etudiant_nom"], f["note_evaluation"], json.dumps(f, default=str)) for f in fiches],
+            )
+            self.conn.execute("COMMIT")
+            return self.conn.total_changes - avant
+
+    def __len__(self):
+        with self._verrou:
+            return self.conn.execute("SELECT COUNT(*) FROM archives_absences").fetchone()[0]
+
+
+if __name__ == "__main__":
+    # Essai hors ligne : réseau instable simulé, double saisie, fiche refusée par la base,
+    # synchronisation en arrière-plan
+    import os
+    import random
+    import tempfile
+
+    from registre_absences import fiches_seance
+
+    random.seed(0)
+    chemin = os.path.join(tempfile.mkdtemp(), FICHIER_JOURNAL)
+    distante = TableLocale()
+
+    def pousser_instable(fiches):
+        if random.random() < 0.4:
+            raise ConnectionError("réseau indisponible")
+        distante.pousser(fiches)
+        if random.random() < 0.2:
+            # Écrit côté serveur mais réponse perdue : le lot sera rejoué
+            raise TimeoutError("réponse perdue")
+
+    synchro = SynchroJournal(chemin, pousser_instable, intervalle=0.01)
+    attendues = 0
+    with closing(connecter(chemin)) as conn:
+        for s in range(60):
+            seance = {"promotion": "L1MCIL", "matiere": f"Module {s % 5}", "enseignant": f"Dr ENSEIGNANT {s % 7}",
+                      "date_seance": f"2026-03-{1 + s % 28:02d}", "categorie_seance": "Charge Normale",
+                      "groupe": f"G{s % 3}", "sous_groupe": "SG1", "observations": "Charge Normale | Cours"}
+            absents = [f"ETUDIANT {i}" for i in range(random.randrange(1, 40))]
+            if s == 10:
+                absents.insert(len(absents) // 2, "")   # refusée à chaque essai, ne doit rien bloquer
+            fiches = fiches_seance(seance, absents, "Absence non justifiée")
+            attendues += journaliser(conn, fiches)
+            journaliser(conn, fiches)   # double clic
+            synchro.reveiller()
+        limite = time.monotonic() + 30
+        while compteurs(conn)[EN_ATTENTE] and time.monotonic() < limite:
+            synchro.reveiller()
+            time.sleep(0.05)
+        etat = compteurs(conn)
+    synchro.arreter()
+    ok = etat[EN_ATTENTE] == 0 and etat[EN_ERREUR] == 1 and len(distante) == attendues - 1
+    print(f"{attendues} fiches journalisées, {etat[SYNCHRONISE]} synchronisées, {etat[EN_ERREUR]} écartée(s), "
+          f"{len(distante)} dans la table distante : {'OK' if ok else 'ÉCHEC'}")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,234 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from chargement_edt import normalize
+
+# --- MODÈLE COMPACT DES SÉANCES ---
+# Chaque séance (ligne de l'EDT) est codée par des entiers : jour, créneau canonique
+# (intervalle en minutes), salle, promotion et enseignant(s). Les chaînes ne sont
+# normalisées qu'une fois par valeur distincte ; vues et vérificateurs comparent
+# ensuite des tableaux NumPy au lieu de re-normaliser du texte à chaque rerun.
+# Code -1 : valeur absente ou non interprétable.
+
+JOURS = ["Dimanche", "Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi"]
+
+# Valeurs de remplissage qui ne désignent pas une vraie ressource
+VALEURS_VIDES = {"", "nan", "none", "non défini", "nd", "-", "a distance"}
+
+MINUTES_JOUR = 24 * 60
+
+_re_heure = re.compile(r"(\d{1,2})\s*[hH:]\s*(\d{2})?")
+_re_separateurs = re.compile(r"\s*(?:&|/|,|;|\+|\bet\b)\s*", re.IGNORECASE)
+_re_hors_cle = re.compile(r"[^A-Z0-9]")
+
+
+def intervalle_horaire(horaire):
+    """'8h - 9h30', '14h00-15h30', '13h30 – 15h30' → (480, 570) ; (-1, -1) si illisible
+    ou hors d'une journée (ex. faute de frappe '35h - 36h')."""
+    bornes = _re_heure.findall(str(horaire))
+    if len(bornes) < 2:
+        return (-1, -1)
+    (h1, m1), (h2, m2) = bornes[:2]
+    if int(m1 or 0) >= 60 or int(m2 or 0) >= 60:
+        return (-1, -1)
+    debut = int(h1) * 60 + int(m1 or 0)
+    fin = int(h2) * 60 + int(m2 or 0)
+    return (debut, fin) if debut < fin <= MINUTES_JOUR else (-1, -1)
+
+
+def libelle_intervalle(debut, fin):
+    def fmt(m):
+        return f"{m // 60}h{m % 60:02d}" if m % 60 else f"{m // 60}h"
+    return f"{fmt(debut)} - {fmt(fin)}" if debut >= 0 else "Non défini"
+
+
+def separer_enseignants(cellule):
+    """'A & B / C' → ['A', 'B', 'C'] (sans les valeurs de remplissage)."""
+    noms = [n.strip().upper() for n in _re_separateurs.split(str(cellule))]
+    return [n for n in noms if n.lower() not in VALEURS_VIDES]
+
+
+def cle_enseignant(nom):
+    """Identifiant canonique d'un nom : majuscules, sans accents, espaces ni ponctuation
+    ('Tabet-Derraz', 'TABET DERRAZ' → 'TABETDERRAZ' ; 'FETHI.M' → 'FETHIM')."""
+    nom = unicodedata.normalize("NFKD", str(nom)).encode("ascii", "ignore").decode()
+    return _re_hors_cle.sub("", nom.upper())
+
+
+def noms_enseignants(cellule):
+    """[(clé canonique, nom affiché), ...] d'une cellule, sans doublon."""
+    noms = {}
+    for nom in separer_enseignants(cellule):
+        cle = cle_enseignant(nom)
+        if cle and cle.lower() not in VALEURS_VIDES:
+            noms.setdefault(cle, nom)
+    return list(noms.items())
+
+
+def _coder(serie, transformer=None, vides=VALEURS_VIDES, vocabulaire=()):
+    # Factorisation puis traduction une seule fois par valeur distincte
+    codes, valeurs = pd.factorize(serie.astype(str), use_na_sentinel=True)
+    vocabulaire = list(vocabulaire)
+    positions = {v: i for i, v in enumerate(vocabulaire)}
+    traduction = np.full(len(valeurs) + 1, -1, dtype=np.int32)  # dernière case : NaN
+    for i, valeur in enumerate(valeurs):
+        cle = transformer(valeur) if transformer else valeur.strip()
+        if cle is None or str(cle).strip().lower() in vides:
+            continue
+        if cle not in positions:
+            positions[cle] = len(vocabulaire)
+            vocabulaire.append(cle)
+        traduction[i] = positions[cle]
+    return traduction[codes], vocabulaire
+
+
+def _inverser(codes, taille):
+    # code → positions des lignes, en un seul tri stable
+    ordre = np.argsort(codes, kind="stable")
+    bornes = np.searchsorted(codes[ordre], np.arange(taille + 1))
+    return [ordre[bornes[i]:bornes[i + 1]] for i in range(taille)]
+
+
+_AUCUNE = np.empty(0, dtype=np.int64)
+
+
+# --- INDEX INVERSÉ DES ENSEIGNANTS ---
+# Les cellules co-animées ("A & B / C") sont découpées une fois par valeur distincte en
+# identifiants canoniques ; chaque enseignant pointe ensuite vers ses lignes. Une
+# recherche est exacte (MILOUD ne ramène plus MILOUDI, ni MASSOUM les séances de
+# MASSOUM.S) et ne coûte que le nombre de séances trouvées, au lieu d'un
+# str.contains sur toute la colonne.
+
+class IndexEnseignants:
+    def __init__(self, serie):
+        cellules = serie.astype(str).to_numpy()
+        decoupe = {c: noms_enseignants(c) for c in pd.unique(cellules)}
+
+        affiches = {}
+        for noms in decoupe.values():
+            for cle, nom in noms:
+                affiches.setdefault(cle, nom)
+        # Identifiants rangés par nom affiché
+        self.cles = sorted(affiches, key=lambda c: (affiches[c], c))
+        self.noms = [affiches[c] for c in self.cles]
+        self._codes = {c: i for i, c in enumerate(self.cles)}
+
+        # Couples (séance, enseignant) stockés à plat
+        ids_cellule = {c: [self._codes[cle] for cle, _ in noms] for c, noms in decoupe.items()}
+        par_ligne = [ids_cellule[c] for c in cellules]
+        longueurs = np.fromiter((len(l) for l in par_ligne), dtype=np.int64, count=len(cellules))
+        self.seance = np.repeat(np.arange(len(cellules)), longueurs)
+        self.ens_id = np.fromiter(
+            (i for l in par_ligne for i in l), dtype=np.int32, count=int(longueurs.sum())
+        )
+        ordre = _inverser(self.ens_id, len(self.cles))
+        self._positions = [self.seance[o] for o in ordre]
+
+    def __len__(self):
+        return len(self.cles)
+
+    def __contains__(self, nom):
+        return self.code(nom) >= 0
+
+    def codes(self, cellule):
+        """Identifiants des enseignants d'une cellule (-1 pour un nom inconnu)."""
+        return [self._codes.get(cle, -1) for cle, _ in noms_enseignants(cellule)]
+
+    def code(self, nom):
+        codes = self.codes(nom)
+        return codes[0] if len(codes) == 1 else -1
+
+    def positions(self, nom):
+        """Positions (croissantes, pour df.iloc) des séances où figurent tous les
+        enseignants de `nom` ("A" ou "A & B")."""
+        codes = self.codes(nom)
+        if not codes or min(codes) < 0:
+            return _AUCUNE
+        positions = self._positions[codes[0]]
+        for code in codes[1:]:
+            positions = np.intersect1d(positions, self._positions[code], assume_unique=True)
+        return positions
+
+    def lignes(self, df, nom):
+        return df.iloc[self.positions(nom)]
+
+
+class ModeleEDT:
+    def __init__(self, df):
+        self.df = df
+        self.n = len(df)
+
+        # Jours : vocabulaire fixe dans l'ordre de la semaine, puis valeurs inconnues
+        jours_norm = {normalize(j): j for j in JOURS}
+        self.jour, self.jours = _coder(
+            df["Jours"], lambda j: jours_norm.get(normalize(j), normalize(j)),
+            vides=VALEURS_VIDES | {"vide"}, vocabulaire=JOURS
+        )
+
+        # Créneaux : intervalle canonique (début, fin) en minutes
+        intervalles = {h: intervalle_horaire(h) for h in df["Horaire"].astype(str).unique()}
+        self.creneau, self.creneaux = _coder(
+            df["Horaire"], lambda h: intervalles[h] if intervalles[h][0] >= 0 else None
+        )
+        bornes = np.array(self.creneaux + [(-1, -1)], dtype=np.int32).reshape(-1, 2)
+        self.debut = bornes[self.creneau, 0]
+        self.fin = bornes[self.creneau, 1]
+
+        self.salle, self.salles = _coder(df["Lieu"])
+        self.promo, self.promotions = _coder(df["Promotion"])
+        self.matiere, self.matieres = _coder(df["Enseignements"])
+        # Cellule "Enseignants" brute : distingue deux équipes dans une même salle
+        self.equipe, _ = _coder(df["Enseignants"])
+
+        # Enseignants : une séance peut en compter plusieurs (co-enseignement)
+        # → couples (séance, enseignant) de l'index inversé
+        self.index_enseignants = IndexEnseignants(df["Enseignants"])
+        self.enseignants = self.index_enseignants.noms
+        self.ens_seance = self.index_enseignants.seance
+        self.ens_id = self.index_enseignants.ens_id
+
+        self._par_salle = _inverser(self.salle, len(self.salles))
+        self._par_promo = _inverser(self.promo, len(self.promotions))
+
+        self._codes_jour = {normalize(j): i for i, j in enumerate(self.jours)}
+        self._codes_creneau = {c: i for i, c in enumerate(self.creneaux)}
+        self._codes_salle = {s: i for i, s in enumerate(self.salles)}
+        self._codes_promo = {p: i for i, p in enumerate(self.promotions)}
+
+    # --- CODES (-1 si inconnu) ---
+    def code_jour(self, jour):
+        return self._codes_jour.get(normalize(jour), -1)
+
+    def code_creneau(self, horaire):
+        return self._codes_creneau.get(intervalle_horaire(horaire), -1)
+
+    def code_salle(self, salle):
+        return self._codes_salle.get(str(salle).strip(), -1)
+
+    def code_promotion(self, promo):
+        return self._codes_promo.get(str(promo).strip(), -1)
+
+    def code_enseignant(self, nom):
+        return self.index_enseignants.code(nom)
+
+    # --- SÉLECTIONS (positions de lignes, utilisables avec df.iloc) ---
+    def seances_salle(self, salle):
+        code = self.code_salle(salle)
+        return self._par_salle[code] if code >= 0 else _AUCUNE
+
+    def seances_promotion(self, promo):
+        code = self.code_promotion(promo)
+        return self._par_promo[code] if code >= 0 else _AUCUNE
+
+    def seances_enseignant(self, nom):
+        return self.index_enseignants.positions(nom)
+
+    def enseignants_seance(self, position):
+        debut, fin = np.searchsorted(self.ens_seance, [position, position + 1])
+        return self.ens_id[debut:fin]
+
+    def lignes(self, positions):
+        return self.df.iloc[np.sort(positions)]
@@ -0,0 +1,137 @@
+import os
+import pickle
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from chargement_edt import charger_edt, derive_edt, version_edt
+from envoi_mails import COLONNES_MAIL, classeur_edt, corps_edt
+from modele_creneaux import IndexEnseignants
+
+# --- PIÈCES JOINTES DES COURRIELS (CORPS HTML + CLASSEUR EXCEL) ---
+# Toutes les pièces d'une version de l'EDT sont produites d'un coup : les lignes de
+# chaque enseignant sont tirées d'un seul tableau (index inversé → positions), puis
+# le rendu (HTML + xlsx) est réparti par lots sur les cœurs disponibles. Le résultat
+# est gardé par (enseignant, version) en mémoire (derive_edt) et sur disque
+# (<classeur>.pieces.pkl) : un renvoi ou un envoi individuel réutilise les octets.
+
+FORMAT_PIECES = 1
+SEUIL_PARALLELE = 24    # en dessous, le démarrage des processus coûte plus que le rendu
+LOTS_PAR_PROCESSUS = 4
+
+_verrou = threading.Lock()
+
+
+def chemin_pieces(chemin):
+    return f"{os.path.splitext(chemin)[0]}.pieces.pkl"
+
+
+def _cle(nom):
+    return str(nom).strip()
+
+
+def lignes_enseignants(df, index, noms):
+    """{nom: [lignes]} : séances de chaque enseignant (tuples dans l'ordre de COLONNES_MAIL)."""
+    valeurs = df[COLONNES_MAIL].astype(str).to_numpy(dtype=object)
+    return {nom: [tuple(v) for v in valeurs[index.positions(nom)]] for nom in noms}
+
+
+def _rendre(lot):
+    return [(nom, corps_edt(nom, lignes), classeur_edt(lignes)) for nom, lignes in lot]
+
+
+def rendre_pieces(lignes, nb_processus=None):
+    """{nom: (corps, classeur)} ; rendu réparti sur `nb_processus` processus."""
+    elements = list(lignes.items())
+    nb_processus = nb_processus or os.cpu_count() or 1
+    if nb_processus <= 1 or len(elements) < SEUIL_PARALLELE:
+        rendus = _rendre(elements)
+    else:
+        lots = [elements[i::nb_processus * LOTS_PAR_PROCESSUS] for i in range(nb_processus * LOTS_PAR_PROCESSUS)]
+        with ProcessPoolExecutor(max_workers=nb_processus) as executeur:
+            rendus = [r for rendu in executeur.map(_rendre, [l for l in lots if l]) for r in rendu]
+    return {nom: (corps, classeur) for nom, corps, classeur in rendus}
+
+
+class PiecesJointes:
+    def __init__(self, df, index, version, pieces, chemin_pkl=None):
+        self.df = df
+        self.index = index
+        self.version = version
+        self.pieces = pieces
+        self.chemin_pkl = chemin_pkl
+
+    def __contains__(self, nom):
+        return _cle(nom) in self.pieces
+
+    def completer(self, noms):
+        """Rend (en parallèle) les pièces des noms absents, ex. un nom officiel écrit
+        autrement que dans l'EDT, et met à jour le fichier disque."""
+        manquants = sorted({_cle(n) for n in noms} - set(self.pieces))
+        if not manquants:
+            return
+        nouvelles = rendre_pieces(lignes_enseignants(self.df, self.index, manquants))
+        with _verrou:
+            self.pieces.update(nouvelles)
+            if self.chemin_pkl:
+                _ecrire_disque(self.chemin_pkl, self.version, self.pieces)
+
+    def pieces_de(self, nom):
+        """(corps HTML, classeur xlsx) de l'enseignant pour cette version de l'EDT."""
+        if _cle(nom) not in self.pieces:
+            self.completer([nom])
+        return self.pieces[_cle(nom)]
+
+
+def construire(df, index, nb_processus=None):
+    """Pièces de tous les enseignants de l'EDT : noms individuels et cellules distinctes."""
+    noms = sorted(set(index.noms) | {_cle(c) for c in df["Enseignants"].astype(str).unique()})
+    return rendre_pieces(lignes_enseignants(df, index, noms), nb_processus)
+
+
+def _lire_disque(chemin_pkl, version):
+    try:
+        with open(chemin_pkl, "rb") as f:
+            contenu = pickle.load(f)
+        if contenu.get("format") != FORMAT_PIECES or contenu.get("version") != version:
+            return None
+        return contenu["pieces"]
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+        return None
+
+
+def _ecrire_disque(chemin_pkl, version, pieces):
+    try:
+        temporaire = f"{chemin_pkl}.{os.getpid()}.tmp"
+        with open(temporaire, "wb") as f:
+            pickle.dump({"format": FORMAT_PIECES, "version": version, "pieces": pieces}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaire, chemin_pkl)
+    except OSError:
+        # Disque en lecture seule : les pièces restent disponibles en mémoire
+        pass
+
+
+def pieces_jointes(chemin, index=None):
+    """PiecesJointes de la version courante du classeur (mémoire, sinon disque, sinon rendu)."""
+    def fabrique(df):
+        version = version_edt(chemin)
+        idx = index if index is not None else IndexEnseignants(df["Enseignants"])
+        pieces = _lire_disque(chemin_pieces(chemin), version)
+        if pieces is None:
+            pieces = construire(df, idx)
+            _ecrire_disque(chemin_pieces(chemin), version, pieces)
+        return PiecesJointes(df, idx, version, pieces, chemin_pieces(chemin))
+
+    return derive_edt(chemin, "pieces_jointes", fabrique)
+
+
+if __name__ == "__main__":
+    import time
+
+    chemin = sys.argv[1] if len(sys.argv) > 1 else "dataEDT-ELT-S2-2026.xlsx"
+    t0 = time.perf_counter()
+    df = charger_edt(chemin)
+    pieces = construire(df, IndexEnseignants(df["Enseignants"]))
+    _ecrire_disque(chemin_pieces(chemin), version_edt(chemin), pieces)
+    print(f"{len(pieces)} pièces jointes rendues en {time.perf_counter() - t0:.2f} s "
+          f"sur {os.cpu_count()} cœur(s) → {chemin_pieces(chemin)}")
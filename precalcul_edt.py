@@ -0,0 +1,145 @@
+import os
+import pickle
+import sys
+import threading
+
+import numpy as np
+
+from charge_horaire import compter_seances
+from chargement_edt import charger_edt, derive_edt, version_edt
+from grille_edt import grilles_html
+from modele_creneaux import IndexEnseignants, ModeleEDT
+
+# --- PRÉCALCUL DES EMPLOIS DU TEMPS (ENSEIGNANTS, PROMOTIONS, SALLES) ---
+# Après chaque enregistrement (ou via : python precalcul_edt.py [fichier.xlsx]), toutes
+# les cibles sont traitées en un seul passage groupé : lignes concernées, compteurs
+# Cours/TD/TP et grille HTML. Le résultat est gardé en mémoire (derive_edt) et sur
+# disque à côté du classeur (<classeur>.precalcul.pkl, marqué par l'empreinte du
+# contenu) : un redémarrage ne refait pas le calcul et chaque page n'est plus qu'une
+# lecture dans un dictionnaire.
+# Enseignants : les séances d'une cible viennent de l'index inversé (recherche exacte
+# par nom canonique) ; on précalcule chaque nom individuel ("A & B" → "A", "B") et
+# chaque cellule distincte (séances où figurent tous ses enseignants).
+
+# Incrémenté quand le contenu des artefacts change : les anciens fichiers sont ignorés
+FORMAT_PRECALCUL = 2
+
+_verrou = threading.Lock()
+
+
+def chemin_precalcul(chemin):
+    return f"{os.path.splitext(chemin)[0]}.precalcul.pkl"
+
+
+def _cibles_enseignants(df, index):
+    cibles = sorted(set(index.noms) | set(df["Enseignants"].astype(str).unique()))
+    return {cible: index.positions(cible) for cible in cibles}
+
+
+def _artefacts(df, vue, cibles, avec_compteurs=False):
+    noms = list(cibles)
+    entites = np.repeat(np.arange(len(noms)), [len(cibles[n]) for n in noms])
+    positions = np.concatenate([cibles[n] for n in noms]) if noms else np.empty(0, dtype=np.int64)
+    positions = positions.astype(np.int64)
+    grilles = grilles_html(df, vue, entites, positions, nb_entites=len(noms))
+    # Compteurs Cours / TD / TP du bilan horaire (voir charge_horaire)
+    comptes = compter_seances(df, entites, positions, len(noms)) if avec_compteurs else None
+
+    artefacts = {}
+    for i, nom in enumerate(noms):
+        artefact = {"positions": cibles[nom], "html": grilles[i]}
+        if avec_compteurs:
+            artefact["nb_cours"], artefact["nb_td"], artefact["nb_tp"] = (int(x) for x in comptes[i])
+        artefacts[nom] = artefact
+    return artefacts
+
+
+def construire(df, modele=None):
+    """Artefacts de toutes les cibles : {"Enseignant"|"Promotion"|"Salle": {cible: artefact}}."""
+    m = modele or ModeleEDT(df)
+    return {
+        "Enseignant": _artefacts(df, "Enseignant", _cibles_enseignants(df, m.index_enseignants), avec_compteurs=True),
+        "Promotion": _artefacts(df, "Promotion", {p: np.sort(m.seances_promotion(p)) for p in m.promotions}),
+        "Salle": _artefacts(df, "Salle", {s: np.sort(m.seances_salle(s)) for s in m.salles}),
+    }
+
+
+class PrecalculEDT:
+    def __init__(self, df, artefacts, index_enseignants=None):
+        self.df = df
+        self.artefacts = artefacts
+        self._index_enseignants = index_enseignants
+
+    @property
+    def index_enseignants(self):
+        # Construit au premier besoin quand le précalcul vient du disque
+        if self._index_enseignants is None:
+            self._index_enseignants = IndexEnseignants(self.df["Enseignants"])
+        return self._index_enseignants
+
+    def enseignant(self, cible):
+        """Artefact d'un enseignant ; calculé à la demande (et mémorisé) pour un nom
+        absent du précalcul, ex. un nom officiel écrit autrement que dans l'EDT."""
+        artefacts = self.artefacts["Enseignant"]
+        if cible not in artefacts:
+            positions = self.index_enseignants.positions(cible)
+            with _verrou:
+                artefacts.update(_artefacts(self.df, "Enseignant", {cible: positions}, avec_compteurs=True))
+        return artefacts[cible]
+
+    def promotion(self, promo):
+        return self.artefacts["Promotion"].get(promo)
+
+    def salle(self, salle):
+        return self.artefacts["Salle"].get(salle)
+
+    def lignes(self, artefact):
+        return self.df.iloc[artefact["positions"]]
+
+
+def _lire_disque(chemin_pkl, version):
+    try:
+        with open(chemin_pkl, "rb") as f:
+            contenu = pickle.load(f)
+        if contenu.get("format") != FORMAT_PRECALCUL or contenu.get("version") != version:
+            return None
+        return contenu["artefacts"]
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+        return None
+
+
+def _ecrire_disque(chemin_pkl, version, artefacts):
+    try:
+        temporaire = f"{chemin_pkl}.{os.getpid()}.tmp"
+        with open(temporaire, "wb") as f:
+            pickle.dump({"format": FORMAT_PRECALCUL, "version": version, "artefacts": artefacts}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaire, chemin_pkl)
+    except OSError:
+        # Disque en lecture seule : le précalcul reste disponible en mémoire
+        pass
+
+
+def precalcul_edt(chemin, modele=None):
+    """PrecalculEDT de la version courante du classeur (mémoire, sinon disque, sinon calcul)."""
+    def fabrique(df):
+        version = version_edt(chemin)
+        artefacts = _lire_disque(chemin_precalcul(chemin), version)
+        if artefacts is None:
+            artefacts = construire(df, modele)
+            _ecrire_disque(chemin_precalcul(chemin), version, artefacts)
+        return PrecalculEDT(df, artefacts, modele.index_enseignants if modele is not None else None)
+
+    return derive_edt(chemin, "precalcul", fabrique)
+
+
+if __name__ == "__main__":
+    import time
+
+    chemin = sys.argv[1] if len(sys.argv) > 1 else "dataEDT-ELT-S2-2026.xlsx"
+    t0 = time.perf_counter()
+    df = charger_edt(chemin)
+    artefacts = construire(df)
+    _ecrire_disque(chemin_precalcul(chemin), version_edt(chemin), artefacts)
+    print(f"{len(artefacts['Enseignant'])} enseignants, {len(artefacts['Promotion'])} promotions, "
+          f"{len(artefacts['Salle'])} salles précalculés en {time.perf_counter() - t0:.2f} s "
+          f"→ {chemin_precalcul(chemin)}")
@@ -0,0 +1,233 @@
+import hashlib
+import sqlite3
+import sys
+import warnings
+from contextlib import closing
+
+import pandas as pd
+from postgrest.exceptions import APIError
+
+# --- REGISTRE DES ABSENCES ET ÉVALUATIONS (archives_absences) ---
+# Requêtes côté serveur pour le Panneau Admin : colonnes choisies, filtres (promotion,
+# période, matière, enseignant) appliqués par PostgREST, et pagination par curseur
+# (keyset) sur (date_seance, id) décroissants : chaque page coûte le même prix quelle
+# que soit sa profondeur, et le total vient d'un count côté serveur.
+# Index conseillés : voir sql/registre_absences.sql.
+# Le cumul des absences est agrégé par la base (fonction cumul_absences, voir
+# sql/cumul_absences.sql) : seuls les totaux par (étudiant, promotion, matière)
+# transitent. Tant que la fonction n'est pas installée, la même requête tourne
+# localement sur une copie SQLite des seules absences.
+# Une séance validée est archivée en une seule insertion groupée (une instruction,
+# donc tout ou rien). Chaque fiche porte la clé de sa séance (cle_seance) ; avec
+# l'index unique de sql/archives_cle_seance.sql, un double clic ne crée aucun doublon.
+# Sans cet index, archiver() revient à une insertion simple (avec un avertissement),
+# sauf pour le journal local (exiger_cle=True) : un lot rejoué y serait dupliqué.
+
+TABLE = "archives_absences"
+COLONNES_REGISTRE = ["id", "etudiant_nom", "promotion", "groupe", "matiere", "note_evaluation", "date_seance", "enseignant"]
+LIBELLES_REGISTRE = ["Étudiant", "Promotion", "Groupe", "Matière", "Nature/Note", "Date", "Enseignant"]
+TAILLE_PAGE = 50
+TAILLE_EXPORT = 1000    # limite par défaut d'une réponse PostgREST
+
+COLONNES_CUMUL = ["etudiant_nom", "promotion", "matiere", "nb_absences"]
+COLONNES_ABSENCE = ["id", "etudiant_nom", "promotion", "matiere", "note_evaluation"]
+# Même SELECT que la fonction SQL cumul_absences()
+REQUETE_CUMUL = """
+    SELECT etudiant_nom, promotion, matiere, COUNT(*) AS nb_absences
+    FROM archives_absences
+    WHERE note_evaluation LIKE '%Absence%'
+    GROUP BY etudiant_nom, promotion, matiere
+    ORDER BY nb_absences DESC, etudiant_nom, promotion, matiere
+"""
+# Fonction inconnue de PostgREST (PGRST202) ou de PostgreSQL (42883)
+CODES_FONCTION_ABSENTE = {"PGRST202", "42883"}
+
+# Doublons ignorés grâce à l'index unique (cle_seance, etudiant_nom, note_evaluation)
+CONFLIT_SEANCE = "cle_seance,etudiant_nom,note_evaluation"
+# Colonne ou index de sql/archives_cle_seance.sql pas encore installés
+CODES_MIGRATION_ABSENTE = {"PGRST204", "42703", "42P10"}
+
+_rpc_absente = False
+
+
+class MigrationAbsente(RuntimeError):
+    """sql/archives_cle_seance.sql n'est pas installé : l'archivage n'est pas idempotent."""
+
+
+def _filtrer(requete, promotion=None, debut=None, fin=None, matiere=None, enseignant=None, nature=None):
+    if promotion:
+        requete = requete.eq("promotion", promotion)
+    if debut:
+        requete = requete.gte("date_seance", str(debut))
+    if fin:
+        requete = requete.lte("date_seance", str(fin))
+    if matiere:
+        requete = requete.eq("matiere", matiere)
+    if enseignant:
+        # Enregistré sous la forme "Grade NOM" : recherche partielle, sans casse
+        requete = requete.ilike("enseignant", f"%{enseignant}%")
+    if nature:
+        # ex. "Absence" : même test que note_evaluation.str.contains (sensible à la casse)
+        requete = requete.like("note_evaluation", f"%{nature}%")
+    return requete
+
+
+def compter(client, **filtres):
+    """Nombre de fiches correspondant aux filtres (count côté serveur, aucune ligne transférée)."""
+    res = _filtrer(client.table(TABLE).select("id", count="exact", head=True), **filtres).execute()
+    return res.count or 0
+
+
+def page(client, curseur=None, taille=TAILLE_PAGE, colonnes=COLONNES_REGISTRE, **filtres):
+    """(lignes, curseur de la page suivante ou None), des fiches les plus récentes aux
+    plus anciennes. `curseur` : (date_seance, id) de la dernière ligne de la page précédente."""
+    requete = _filtrer(client.table(TABLE).select(",".join(colonnes)), **filtres)
+    if curseur is not None:
+        date, ident = curseur
+        requete = requete.or_(f"date_seance.lt.{date},and(date_seance.eq.{date},id.lt.{ident})")
+    # Une ligne de plus que demandé : indique s'il reste une page
+    lignes = requete.order("date_seance", desc=True).order("id", desc=True).limit(taille + 1).execute().data or []
+    if len(lignes) <= taille:
+        return lignes, None
+    lignes = lignes[:taille]
+    return lignes, (lignes[-1]["date_seance"], lignes[-1]["id"])
+
+
+def toutes(client, colonnes=COLONNES_REGISTRE, **filtres):
+    """Itère sur toutes les fiches filtrées, page par page (export)."""
+    curseur = None
+    while True:
+        lignes, curseur = page(client, curseur, TAILLE_EXPORT, colonnes, **filtres)
+        yield from lignes
+        if curseur is None:
+            return
+
+
+def tableau_registre(lignes):
+    """DataFrame affiché / exporté : colonnes du registre renommées, sans l'id."""
+    df = pd.DataFrame(lignes, columns=COLONNES_REGISTRE)
+    df = df[COLONNES_REGISTRE[1:]]
+    df.columns = LIBELLES_REGISTRE
+    return df
+
+
+def base_sqlite(lignes):
+    """Copie SQLite en mémoire de fiches archives_absences (colonnes de COLONNES_ABSENCE)."""
+    conn = sqlite3.connect(":memory:")
+    # LIKE sensible à la casse, comme dans PostgreSQL
+    conn.execute("PRAGMA case_sensitive_like = ON")
+    conn.execute(f"CREATE TABLE archives_absences ({', '.join(c + ' TEXT' for c in COLONNES_ABSENCE)})")
+    conn.executemany(f"INSERT INTO archives_absences VALUES ({', '.join('?' * len(COLONNES_ABSENCE))})",
+                     ([l.get(c) for c in COLONNES_ABSENCE] for l in lignes))
+    return conn
+
+
+def cumul_sqlite(conn):
+    return [dict(zip(COLONNES_CUMUL, l)) for l in conn.execute(REQUETE_CUMUL)]
+
+
+def _cumul_rpc(client):
+    # Page par page : PostgREST tronque sans erreur au-delà de max-rows (1000 par défaut).
+    # Ordre total (les clés du regroupement sont uniques) : les pages ne se décalent pas.
+    debut = 0
+    while True:
+        requete = client.rpc("cumul_absences").order("nb_absences", desc=True)
+        for colonne in COLONNES_CUMUL[:-1]:
+            requete = requete.order(colonne)
+        lignes = requete.range(debut, debut + TAILLE_EXPORT - 1).execute().data or []
+        yield from lignes
+        if len(lignes) < TAILLE_EXPORT:
+            return
+        debut += TAILLE_EXPORT
+
+
+def cumul_absences(client):
+    """Nombre d'absences par (étudiant, promotion, matière), du plus grand au plus petit."""
+    global _rpc_absente
+    if not _rpc_absente:
+        try:
+            return list(_cumul_rpc(client))
+        except APIError as e:
+            if str(e.code) not in CODES_FONCTION_ABSENTE:
+                raise
+            # Fonction pas encore installée : agrégat local jusqu'au redémarrage
+            _rpc_absente = True
+    with closing(base_sqlite(toutes(client, colonnes=COLONNES_ABSENCE, nature="Absence"))) as conn:
+        return cumul_sqlite(conn)
+
+
+def cle_seance(enseignant, date_seance, matiere, groupe):
+    """Clé d'idempotence d'une séance : (enseignant, date, matière, groupe)."""
+    brut = "|".join(str(v).strip().upper() for v in (enseignant, date_seance, matiere, groupe))
+    return hashlib.sha256(brut.encode("utf-8")).hexdigest()[:32]
+
+
+def fiches_seance(seance, absents, nature_absence, note=None):
+    """Fiches archives_absences d'une séance : une par absent, plus la note éventuelle.
+
+    `seance` : promotion, matiere, enseignant, date_seance, groupe, sous_groupe,
+    categorie_seance et observations (absences) ; `note` : (étudiant, évaluation,
+    observations) ou None.
+    """
+    commun = {
+        "promotion": seance["promotion"],
+        "matiere": seance["matiere"],
+        "enseignant": seance["enseignant"],
+        "date_seance": str(seance["date_seance"]),
+        "categorie_seance": seance["categorie_seance"],
+        "groupe": seance["groupe"],
+        "sous_groupe": seance["sous_groupe"],
+        "cle_seance": cle_seance(seance["enseignant"], seance["date_seance"], seance["matiere"], seance["groupe"]),
+    }
+    fiches = [{**commun, "etudiant_nom": nom, "note_evaluation": nature_absence,
+               "observations": seance["observations"]} for nom in absents]
+    if note is not None:
+        etudiant, evaluation, observations = note
+        fiches.append({**commun, "etudiant_nom": etudiant, "note_evaluation": evaluation, "observations": observations})
+    return fiches
+
+
+def archiver(client, fiches, exiger_cle=False):
+    """Insère les fiches en une requête (tout ou rien) ; les fiches déjà archivées
+    sous la même clé de séance sont ignorées. Retourne le nombre de fiches nouvelles.
+
+    Base non migrée : insertion simple, ou MigrationAbsente si `exiger_cle`.
+    """
+    if not fiches:
+        return 0
+    try:
+        res = client.table(TABLE).upsert(fiches, on_conflict=CONFLIT_SEANCE, ignore_duplicates=True).execute()
+    except APIError as e:
+        if str(e.code) not in CODES_MIGRATION_ABSENTE:
+            raise
+        if exiger_cle:
+            raise MigrationAbsente("exécutez sql/archives_cle_seance.sql : sans l'index unique, "
+                                   "un lot rejoué serait archivé deux fois") from e
+        # Insertion groupée simple, sans la clé de séance : un second envoi crée des doublons
+        warnings.warn("archives_absences sans cle_seance (sql/archives_cle_seance.sql) : "
+                      "archivage sans protection contre les doublons", RuntimeWarning, stacklevel=2)
+        res = client.table(TABLE).insert([{k: v for k, v in f.items() if k != "cle_seance"} for f in fiches]).execute()
+    return len(res.data or [])
+
+
+if __name__ == "__main__":
+    # Vérification hors ligne de REQUETE_CUMUL face à l'ancien regroupement pandas
+    import random
+
+    random.seed(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    natures = ["Absence non justifiée", "Absence justifiée", "Exclusion", "Test: 12", "absence"]
+    lignes = [
+        {"id": i, "etudiant_nom": f"ETUDIANT {random.randrange(40)}", "promotion": random.choice(["L1", "L2", "M1"]),
+         "matiere": random.choice(["Electronique", "Machines", "Réseaux"]), "note_evaluation": random.choice(natures)}
+        for i in range(5000)
+    ]
+    with closing(base_sqlite(lignes)) as conn:
+        cumul = pd.DataFrame(cumul_sqlite(conn), columns=COLONNES_CUMUL)
+
+    df_all = pd.DataFrame(lignes)
+    df_abs_only = df_all[df_all['note_evaluation'].str.contains("Absence", na=False)]
+    attendu = df_abs_only.groupby(['etudiant_nom', 'promotion', 'matiere']).size().reset_index(name='nb_absences')
+    cles = ["etudiant_nom", "promotion", "matiere"]
+    identiques = cumul.sort_values(cles, ignore_index=True).equals(attendu.sort_values(cles, ignore_index=True))
+    print(f"{len(lignes)} fiches, {len(cumul)} totaux : {'identiques' if identiques else 'DIFFÉRENTS'} au regroupement pandas")
+    sys.exit(0 if identiques else 1)
@@ -0,0 +1,239 @@
+import random
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from assistant_resolution import TOUS_HORAIRES, est_compatible, profil_lieu
+from chargement_edt import preparer_edt
+from conflits_edt import IndexConflits
+from modele_creneaux import JOURS, VALEURS_VIDES, intervalle_horaire
+
+# --- RÉPARATION AUTOMATIQUE DE L'EMPLOI DU TEMPS ---
+# Recherche locale (min-conflicts) sur l'index incrémental de conflits_edt : on choisit
+# une séance en conflit et on lui applique le déplacement le moins coûteux qui réduit
+# ses conflits, en essayant d'abord de changer de salle, puis de créneau, puis de jour.
+# Une marche aléatoire avec liste taboue fait sortir des minima locaux ; la meilleure
+# solution rencontrée est conservée.
+# Les salles proposées respectent le genre du lieu d'origine (LABO/TP, AMPHI, SALLE)
+# et les créneaux conservent la durée de la séance. Chaque évaluation ne parcourt que
+# les séances de la même ressource le même jour : le moteur travaille hors ligne sur
+# des milliers de séances, dans un budget de temps fixé. Dans l'application, la
+# recherche tourne dans un thread (ReparationFond) dont le script lit l'avancement.
+# Usage : python reparation_edt.py [budget_secondes] [sortie.xlsx]
+
+FICHIER_EDT = "dataEDT-ELT-S2-2026.xlsx"
+
+JOURS_OUVRES = JOURS[:5]
+
+# Coût d'un déplacement par rapport à la séance d'origine
+COUT_SALLE = 1
+COUT_CRENEAU = 2
+COUT_JOUR = 4
+
+# Probabilité d'accepter un déplacement qui n'améliore pas (sortie des minima locaux)
+MARCHE_ALEATOIRE = 0.2
+
+
+class ResultatReparation:
+    def __init__(self, df, deplacements, conflits_avant, conflits_apres, duree):
+        self.df = df                        # EDT corrigé (mêmes étiquettes d'index)
+        self.deplacements = deplacements    # DataFrame : une ligne par séance déplacée
+        self.conflits_avant = conflits_avant
+        self.conflits_apres = conflits_apres
+        self.duree = duree
+
+
+def _cout(origine, ligne):
+    return (COUT_SALLE * (ligne["Lieu"] != origine["Lieu"])
+            + COUT_CRENEAU * (ligne["Horaire"] != origine["Horaire"])
+            + COUT_JOUR * (ligne["Jours"] != origine["Jours"]))
+
+
+def _horaires_par_duree(df):
+    # Un libellé par intervalle, regroupés par durée : les créneaux standards d'abord
+    par_duree = {}
+    vus = set()
+    for horaire in TOUS_HORAIRES + sorted(df["Horaire"].astype(str).unique()):
+        debut, fin = intervalle_horaire(horaire)
+        if debut < 0 or (debut, fin) in vus:
+            continue
+        vus.add((debut, fin))
+        par_duree.setdefault(fin - debut, []).append(horaire)
+    return par_duree
+
+
+class Reparateur:
+    def __init__(self, df, graine=2026):
+        self.df = df.copy()
+        self.origine = df
+        self.index = IndexConflits(self.df)
+        self.hasard = random.Random(graine)
+        self.lieux = sorted(l for l in self.df["Lieu"].astype(str).unique()
+                            if l.strip().lower() not in VALEURS_VIDES)
+        self._salles_profil = {}
+        self._horaires = _horaires_par_duree(self.df)
+        colonnes = ["Jours", "Horaire", "Lieu"]
+        self._origines = dict(zip(df.index, df[colonnes].to_dict("records")))
+
+    def _salles(self, lieu):
+        profil = profil_lieu(lieu)
+        if profil not in self._salles_profil:
+            self._salles_profil[profil] = [l for l in self.lieux if est_compatible(l, profil)]
+        return self._salles_profil[profil]
+
+    def _paliers(self, label):
+        """Déplacements de la séance, par paliers de coût croissant : salle, créneau,
+        créneau + salle, jour, etc. (coût mesuré par rapport à la position actuelle)."""
+        ligne = self.df.loc[label]
+        jour, horaire, lieu = ligne["Jours"], ligne["Horaire"], ligne["Lieu"]
+        debut, fin = intervalle_horaire(horaire)
+        a_distance = str(lieu).strip().lower() in VALEURS_VIDES
+
+        autres_jours = [j for j in JOURS_OUVRES if j != jour]
+        autres_horaires = [h for h in self._horaires.get(fin - debut, []) if h != horaire] if debut >= 0 else []
+        autres_salles = [] if a_distance else [s for s in self._salles(self._origines[label]["Lieu"]) if s != lieu]
+
+        changements = [(j, h, s) for j in (False, True) for h in (False, True) for s in (False, True)][1:]
+        changements.sort(key=lambda c: COUT_JOUR * c[0] + COUT_CRENEAU * c[1] + COUT_SALLE * c[2])
+        for changer_jour, changer_horaire, changer_salle in changements:
+            yield [
+                {"Jours": j, "Horaire": h, "Lieu": s}
+                for j in (autres_jours if changer_jour else [jour])
+                for h in (autres_horaires if changer_horaire else [horaire])
+                for s in (autres_salles if changer_salle else [lieu])
+            ]
+
+    def _meilleur_deplacement(self, label, echeance):
+        ligne = self.df.loc[label].to_dict()
+        origine = self._origines[label]
+        meilleur, score = None, (float("inf"), 0)
+        for palier in self._paliers(label):
+            for candidat in palier:
+                essai = {**ligne, **candidat}
+                conflits = self.index.evaluer(essai, label)
+                cout = _cout(origine, candidat)
+                if (conflits, cout) < score:
+                    meilleur, score = essai, (conflits, cout)
+            # Un palier a suffi à supprimer tous les conflits de la séance : changement minimal
+            if score[0] == 0 or time.perf_counter() > echeance:
+                break
+        return meilleur, score[0]
+
+    def _deplacer(self, label, ligne):
+        self.df.loc[label, ["Jours", "Horaire", "Lieu"]] = [ligne["Jours"], ligne["Horaire"], ligne["Lieu"]]
+        self.index.ajouter(label, ligne)
+
+    def resoudre(self, budget=30.0, progression=None, arret=None):
+        """Recherche locale dans la limite de `budget` secondes.
+
+        `progression(fraction, message)` est appelée après chaque déplacement ;
+        `arret` (threading.Event) interrompt la recherche avant la fin du budget.
+        """
+        t0 = time.perf_counter()
+        echeance = t0 + budget
+        colonnes = ["Jours", "Horaire", "Lieu"]
+        avant = meilleur = self.index.nb_paires
+        solution = self.df[colonnes].copy()
+        tabou = {}
+        iteration = 0
+
+        while self.index.nb_paires and time.perf_counter() < echeance and not (arret and arret.is_set()):
+            iteration += 1
+            en_conflit = {l for t in ("Enseignants", "Lieu", "Promotion") for l in self.index.lignes_en_conflit(t)}
+            # Séance non taboue la plus conflictuelle (départage aléatoire)
+            libres = [l for l in en_conflit if tabou.get(l, 0) < iteration] or list(en_conflit)
+            label = max(libres, key=lambda l: (self.index.nb_conflits(l), self.hasard.random()))
+
+            ligne, conflits = self._meilleur_deplacement(label, echeance)
+            ameliore = ligne is not None and conflits < self.index.nb_conflits(label)
+            if not ameliore and (ligne is None or self.hasard.random() > MARCHE_ALEATOIRE):
+                tabou[label] = iteration + 5
+                continue
+            self._deplacer(label, ligne)
+            tabou[label] = iteration + (2 if ameliore else 10)
+
+            if self.index.nb_paires < meilleur:
+                meilleur = self.index.nb_paires
+                solution = self.df[colonnes].copy()
+            if progression:
+                progression(min(max((avant - meilleur) / avant, 0.0), 1.0) if avant else 1.0,
+                            f"{meilleur} conflit(s) restant(s)")
+
+        # Retour à la meilleure solution rencontrée ; h_norm / j_norm recalculés
+        # d'après les nouveaux jours et horaires
+        self.df[colonnes] = solution
+        self.df = preparer_edt(self.df)
+        return ResultatReparation(
+            self.df, self.deplacements(), avant, meilleur, time.perf_counter() - t0
+        )
+
+    def deplacements(self):
+        colonnes = ["Jours", "Horaire", "Lieu"]
+        differe = (self.df[colonnes].astype(str) != self.origine[colonnes].astype(str)).any(axis=1)
+        avant = self.origine.loc[differe]
+        apres = self.df.loc[differe]
+        return pd.DataFrame({
+            "Enseignements": avant["Enseignements"],
+            "Enseignants": avant["Enseignants"],
+            "Promotion": avant["Promotion"],
+            "Jour initial": avant["Jours"], "Horaire initial": avant["Horaire"], "Lieu initial": avant["Lieu"],
+            "Nouveau jour": apres["Jours"], "Nouvel horaire": apres["Horaire"], "Nouveau lieu": apres["Lieu"],
+        })
+
+
+def reparer_edt(df, budget=30.0, progression=None, graine=2026, arret=None):
+    """EDT corrigé (ResultatReparation) avec un minimum de déplacements."""
+    return Reparateur(df, graine).resoudre(budget, progression, arret)
+
+
+class ReparationFond:
+    """reparer_edt dans un thread d'arrière-plan : avancement (fraction, message),
+    puis resultat ou erreur une fois terminé."""
+
+    def __init__(self, df, budget=30.0, graine=2026, version=None):
+        self.version = version
+        self.fraction = 0.0
+        self.message = "Recherche en cours…"
+        self.resultat = None
+        self.erreur = None
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._executer, args=(df, budget, graine),
+                                        name="reparation-edt", daemon=True)
+        self._thread.start()
+
+    def _progression(self, fraction, message):
+        self.fraction, self.message = fraction, message
+
+    def _executer(self, df, budget, graine):
+        try:
+            self.resultat = reparer_edt(df, budget, self._progression, graine, self._arret)
+        except Exception as e:
+            self.erreur = e
+
+    def arreter(self):
+        """Termine la recherche au prochain déplacement (meilleure solution conservée)."""
+        self._arret.set()
+
+    def termine(self):
+        return not self._thread.is_alive()
+
+
+if __name__ == "__main__":
+    from chargement_edt import charger_edt
+
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 60.0
+    sortie = sys.argv[2] if len(sys.argv) > 2 else "EDT_repare_2026.xlsx"
+
+    resultat = reparer_edt(
+        charger_edt(FICHIER_EDT), budget,
+        lambda fraction, message: print(f"\r{fraction:6.1%}  {message}    ", end="", flush=True)
+    )
+    print()
+    print(f"Conflits : {resultat.conflits_avant} → {resultat.conflits_apres} "
+          f"({len(resultat.deplacements)} séance(s) déplacée(s), {resultat.duree:.1f} s)")
+    with pd.ExcelWriter(sortie, engine="xlsxwriter") as writer:
+        resultat.df.to_excel(writer, sheet_name="Emploi du Temps", index=False)
+        resultat.deplacements.to_excel(writer, sheet_name="Déplacements", index=False)
+    print(f"EDT corrigé écrit dans {sortie}")
@@ -0,0 +1,10 @@
+-- Cle de seance des fiches archives_absences (voir registre_absences.archiver).
+-- A executer une fois dans l'editeur SQL de Supabase. Les fiches anciennes gardent
+-- cle_seance a NULL : elles ne se heurtent jamais a l'index unique.
+
+alter table archives_absences add column if not exists cle_seance text;
+
+-- Une fiche par (seance, etudiant, nature/note) : le second envoi d'une meme
+-- seance (double clic, rerun) est ignore par l'upsert "ignore-duplicates"
+create unique index if not exists archives_absences_cle_seance
+    on archives_absences (cle_seance, etudiant_nom, note_evaluation);
@@ -0,0 +1,13 @@
+-- Email unique des comptes (voir base_donnees.CacheComptes.enregistrer).
+-- A executer une fois dans l'editeur SQL de Supabase. L'upsert on_conflict=email
+-- exige une contrainte ou un index unique sur email ; sans lui, l'application
+-- revient a l'ancienne lecture puis insertion / mise a jour.
+-- Si la creation echoue, des doublons existent deja ; pour les lister :
+--   select email, count(*) from enseignants_auth group by email having count(*) > 1;
+--   select email, count(*) from etudiants_auth group by email having count(*) > 1;
+
+create unique index if not exists enseignants_auth_email
+    on enseignants_auth (email);
+
+create unique index if not exists etudiants_auth_email
+    on etudiants_auth (email);
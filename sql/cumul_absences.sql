@@ -0,0 +1,28 @@
+-- Cumul des absences par etudiant, promotion et matiere (Panneau Admin, onglet
+-- "Cumul des Absences"). Appele par registre_absences.cumul_absences via
+-- supabase.rpc("cumul_absences") : seuls les totaux regroupes sont transferes,
+-- par pages de 1000 lignes (limite max-rows de PostgREST).
+-- A executer une fois dans l'editeur SQL de Supabase. Le SELECT est le meme que
+-- REQUETE_CUMUL (registre_absences.py), verifie hors ligne sur SQLite :
+--     python registre_absences.py
+
+create or replace function cumul_absences()
+returns table (etudiant_nom text, promotion text, matiere text, nb_absences bigint)
+language sql
+stable
+as $$
+    select etudiant_nom::text, promotion::text, matiere::text, count(*) as nb_absences
+    from archives_absences
+    where note_evaluation like '%Absence%'
+    group by etudiant_nom, promotion, matiere
+    -- Ordre total (cles du regroupement uniques) : les pages demandees par
+    -- range() / max-rows ne se chevauchent pas et n'omettent aucune ligne
+    order by nb_absences desc, etudiant_nom, promotion, matiere;
+$$;
+
+-- Filtre de l'agregat
+create index if not exists archives_absences_absences
+    on archives_absences (etudiant_nom, promotion, matiere)
+    where note_evaluation like '%Absence%';
+
+grant execute on function cumul_absences() to anon, authenticated;
@@ -0,0 +1,14 @@
+-- Index du registre archives_absences (Panneau Admin, voir registre_absences.py).
+-- A executer une fois dans l'editeur SQL de Supabase.
+
+-- Pagination par curseur : ORDER BY date_seance DESC, id DESC
+create index if not exists archives_absences_date_id
+    on archives_absences (date_seance desc, id desc);
+
+-- Filtres du registre combines a l'ordre de pagination
+create index if not exists archives_absences_promotion_date
+    on archives_absences (promotion, date_seance desc, id desc);
+create index if not exists archives_absences_matiere_date
+    on archives_absences (matiere, date_seance desc, id desc);
+create index if not exists archives_absences_etudiant
+    on archives_absences (etudiant_nom);